@@ -0,0 +1,67 @@
+"""
+Benchmark of the handler lock contention with many threads logging at once.
+
+Compares the file handler of TidyLogger, which formats and writes the records while holding the handler lock, against the
+handler created with `format_outside_lock=True`, which formats on the caller's thread and only holds the lock while writing.
+Each case is measured at 1, 4, 16 and 64 threads, with short messages and with exception details.
+
+Usage: python benchmarks/bench_contention.py [--calls N] [--repeat R] [--threads 1,4,16,64] [--output results.json]
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from harness import print_results, run_benchmark, save_results  # noqa: E402
+
+from tidy_logger import TidyLogger  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20_000, help="Number of calls per run, split between the threads.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs of each case.")
+    parser.add_argument("--threads", default="1,4,16,64", help="Comma-separated numbers of threads.")
+    parser.add_argument("--output", type=Path, default=None, help="Save the results as JSON to this file.")
+    args = parser.parse_args()
+
+    try:
+        raise ValueError("benchmark exception")
+    except ValueError as ex:
+        exception: ValueError = ex
+
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory() as log_file_directory:
+        for format_outside_lock in (False, True):
+            tidy_logger = TidyLogger(
+                app_name=f"BenchmarkContention{format_outside_lock}",
+                log_file_directory=log_file_directory,
+                print_log_file_path=False,
+                console_level=logging.CRITICAL,
+                file_level=logging.INFO,
+                format_outside_lock=format_outside_lock,
+            )
+            mode: str = "format outside lock" if format_outside_lock else "format under lock"
+            for num_threads in (int(n) for n in args.threads.split(",")):
+                results.append(run_benchmark(f"info(), {mode}", lambda num_calls: lambda i: tidy_logger.info("Request %d", i), args.calls, args.repeat, num_threads, False))
+                results.append(
+                    run_benchmark(
+                        f"info_exception(), {mode}", lambda num_calls: lambda i: tidy_logger.info_exception(exception, "Failed"), args.calls, args.repeat, num_threads, False
+                    )
+                )
+            tidy_logger.close()
+
+    results.sort(key=lambda result: (result["name"].split(",")[0], result["threads"], result["name"]))
+    print_results(results)
+    if args.output is not None:
+        save_results(args.output, results)
+        print("\nResults saved to", args.output)
+
+
+if __name__ == "__main__":
+    main()
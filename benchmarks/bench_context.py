@@ -0,0 +1,71 @@
+"""
+Benchmark of logging records with per-request fields (request id, tenant and user) to a file.
+
+Compares passing the fields as an `extra` dictionary on every call (written by the text format through a format string with the
+fields, and by the JSON format as the 'extra' object) with a bound logger (`TidyLogger.bind`), whose fields are rendered once
+and appended to each record as a fragment, and with the fields bound to the current context (`TidyLogger.bind_context`).
+
+Usage: python benchmarks/bench_context.py [--records N]
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from formatters import IndentedMessageFormatter  # noqa: E402
+
+from tidy_logger import TidyLogger  # noqa: E402
+
+FIELDS: dict[str, str] = {"request_id": "7f3a9c2e-51b4-4c8e-9d0a-2b6f1e8c4d7a", "tenant": "acme-corporation", "user": "bob"}
+
+# The text format of the `extra` fields, the same header line as the fragment of the bound context
+EXTRA_FIELDS_FORMAT: str = IndentedMessageFormatter.default_logging_format.replace("]:\n", "] {request_id=%(request_id)s, tenant=%(tenant)s, user=%(user)s}:\n")
+
+
+def measure(log_file_directory: str, file_format: str, case: str, num_records: int) -> float:
+    """Return the microseconds per record of a case: 'extra', 'bind' or 'bind_context'."""
+    tidy_logger = TidyLogger(
+        app_name="BenchmarkContext_{}_{}".format(file_format, case),
+        log_file_directory=log_file_directory,
+        print_log_file_path=False,
+        console_level=logging.CRITICAL,
+        file_format=file_format,
+    )
+    if case == "extra" and file_format == "text":
+        tidy_logger.file_handler.setFormatter(IndentedMessageFormatter(fmt=EXTRA_FIELDS_FORMAT))
+    start: float = time.perf_counter()
+    if case == "extra":
+        for i in range(num_records):
+            tidy_logger.info("Handled item %d", i, extra=dict(FIELDS))
+    elif case == "bind":
+        bound_logger = tidy_logger.bind(**FIELDS)
+        for i in range(num_records):
+            bound_logger.info("Handled item %d", i)
+    else:
+        with tidy_logger.bind_context(**FIELDS):
+            for i in range(num_records):
+                tidy_logger.info("Handled item %d", i)
+    elapsed: float = time.perf_counter() - start
+    tidy_logger.close()
+    return elapsed / num_records * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=50000, help="Number of records logged per case.")
+    args = parser.parse_args()
+
+    print("{:<30} {:>12}".format("case", "us/record"))
+    with tempfile.TemporaryDirectory() as log_file_directory:
+        for file_format in ("text", "ndjson"):
+            for case in ("extra", "bind", "bind_context"):
+                print("{:<30} {:>12.2f}".format(f"{file_format}, {case}", measure(log_file_directory, file_format, case, args.records)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark of the event loop lag caused by logging from asyncio coroutines.
+
+Many concurrent "requests" log records while a monitor task measures how late its periodic wake-ups are, i.e. how long the event
+loop was blocked. Compares TidyLogger, which writes each record to the file and the console on the event loop, with AsyncTidyLogger,
+which only enqueues the records (fire-and-forget `info`), and with AsyncTidyLogger awaiting each record (`ainfo`).
+The console is a stream whose writes take `--write-delay` seconds, like a slow pipe or disk.
+
+Usage: python benchmarks/bench_event_loop_lag.py [--requests N] [--records R] [--write-delay SECONDS] [--interval SECONDS]
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from asyncio_logging import AsyncTidyLogger  # noqa: E402
+from harness import percentile  # noqa: E402
+
+from tidy_logger import TidyLogger  # noqa: E402
+
+
+class SlowStream(io.StringIO):
+    """A stream whose writes take a fixed time."""
+
+    def __init__(self, write_delay: float):
+        super().__init__()
+        self.write_delay = write_delay
+
+    def write(self, text: str) -> int:
+        time.sleep(self.write_delay)
+        return len(text)
+
+
+async def measure_lag(tidy_logger: TidyLogger, num_requests: int, records_per_request: int, await_records: bool, interval: float) -> dict:
+    """Run the requests while measuring the event loop lag, return the lag percentiles in microseconds and the records/sec."""
+    lags_us: list[float] = []
+    done = asyncio.Event()
+
+    async def monitor() -> None:
+        loop = asyncio.get_running_loop()
+        while not done.is_set():
+            start: float = loop.time()
+            await asyncio.sleep(interval)
+            lags_us.append(max(0.0, loop.time() - start - interval) * 1e6)
+
+    async def handle_request(request: int) -> None:
+        for i in range(records_per_request):
+            if await_records:
+                await tidy_logger.ainfo("Request %d step %d", request, i)
+            else:
+                tidy_logger.info("Request %d step %d", request, i)
+            await asyncio.sleep(0)
+
+    monitor_task = asyncio.create_task(monitor())
+    start: float = time.perf_counter()
+    await asyncio.gather(*(handle_request(request) for request in range(num_requests)))
+    if isinstance(tidy_logger, AsyncTidyLogger):
+        await tidy_logger.aflush()
+    elapsed: float = time.perf_counter() - start
+    done.set()
+    await monitor_task
+
+    lags_us.sort()
+    return {
+        "records_per_second": num_requests * records_per_request / elapsed,
+        "p50_lag_us": percentile(lags_us, 0.5),
+        "p99_lag_us": percentile(lags_us, 0.99),
+        "max_lag_us": lags_us[-1] if lags_us else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="Number of concurrent requests.")
+    parser.add_argument("--records", type=int, default=50, help="Number of records logged per request.")
+    parser.add_argument("--write-delay", type=float, default=0.0001, help="Seconds each console write takes.")
+    parser.add_argument("--interval", type=float, default=0.001, help="Seconds between the wake-ups of the lag monitor.")
+    args = parser.parse_args()
+
+    cases: list[tuple[str, type[TidyLogger], bool]] = [
+        ("TidyLogger info()", TidyLogger, False),
+        ("AsyncTidyLogger info()", AsyncTidyLogger, False),
+        ("AsyncTidyLogger await ainfo()", AsyncTidyLogger, True),
+    ]
+    print("{:<32} {:>14} {:>14} {:>14} {:>14}".format("case", "records/sec", "p50 lag us", "p99 lag us", "max lag us"))
+    with tempfile.TemporaryDirectory() as log_file_directory:
+        for case_index, (name, logger_class, await_records) in enumerate(cases):
+            tidy_logger = logger_class(
+                app_name=f"BenchmarkEventLoopLag{case_index}",
+                log_file_directory=log_file_directory,
+                print_log_file_path=False,
+                console_level=logging.INFO,
+                file_level=logging.INFO,
+                queue_size=args.requests * args.records,
+            )
+            tidy_logger.console_handler.setStream(SlowStream(args.write_delay))
+            result: dict = asyncio.run(measure_lag(tidy_logger, args.requests, args.records, await_records, args.interval))
+            tidy_logger.close()
+            print("{:<32} {:>14,.0f} {:>14,.0f} {:>14,.0f} {:>14,.0f}".format(name, result["records_per_second"], result["p50_lag_us"], result["p99_lag_us"], result["max_lag_us"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark of the header rendering of `IndentedMessageFormatter` with the default format.
+
+Compares the compiled header template (with the per-second time cache) against the generic `logging.Formatter` machinery
+(%-interpolation with the record's dictionary and a `time.strftime` call for every record).
+
+Usage: python benchmarks/bench_formatters.py [--records N] [--repeat R]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from formatters import IndentedMessageFormatter  # noqa: E402
+
+
+class GenericHeaderIndentedMessageFormatter(IndentedMessageFormatter):
+    """The indented message formatter with the header rendered through the generic `logging.Formatter` machinery (the behaviour before compiled templates)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.message = self.get_indented_message(record)
+        if self.usesTime():
+            record.asctime = logging.Formatter.formatTime(self, record, self.datefmt)
+        return logging.Formatter.formatMessage(self, record)
+
+
+def create_records(num_records: int, records_per_second: int = 1000) -> list[logging.LogRecord]:
+    """Create records spread over several seconds, with the same attributes as records created by `TidyLogger`."""
+    start: float = time.time()
+    records: list[logging.LogRecord] = []
+    for i in range(num_records):
+        record = logging.LogRecord("BenchmarkApp", logging.INFO, __file__, 42, "Processed request %d in %.2f ms", (i, 1.5), None, func="handle_request")
+        record.created = start + i / records_per_second
+        records.append(record)
+    return records
+
+
+def measure(formatter: logging.Formatter, num_records: int, repeat: int) -> float:
+    """Return the best records/sec of `repeat` runs."""
+    best: float = 0.0
+    for _ in range(repeat):
+        # Fresh records for each run, as the indented message is cached on the record
+        records = create_records(num_records)
+        start: float = time.perf_counter()
+        for record in records:
+            formatter.format(record)
+        elapsed: float = time.perf_counter() - start
+        best = max(best, num_records / elapsed)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100_000, help="Number of records formatted per run.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs (the best run is reported).")
+    args = parser.parse_args()
+
+    before: float = measure(GenericHeaderIndentedMessageFormatter(), args.records, args.repeat)
+    after: float = measure(IndentedMessageFormatter(), args.records, args.repeat)
+
+    print("Default format, {} records, best of {} runs:".format(args.records, args.repeat))
+    print("  generic logging.Formatter header: {:>12,.0f} records/sec".format(before))
+    print("  compiled header template:         {:>12,.0f} records/sec".format(after))
+    print("  speed-up:                         {:>12.2f}x".format(after / before))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark of logging very large multi-line messages (e.g. request bodies, SQL, dataframes) to a file.
+
+Compares the regular file handler, which formats the whole record (indented message, header and terminator) before writing it,
+with the streaming file handler (`streaming_threshold`), which writes the indented message in chunks, and with a size cap
+(`max_message_size`) that truncates the message to a head and tail excerpt. Reports the time per record and the peak memory
+allocated while logging a record, measured with tracemalloc in a separate run.
+
+Usage: python benchmarks/bench_large_messages.py [--size MEGABYTES] [--records N]
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from formatters import IndentedMessageFormatter, MessageSizeLimit  # noqa: E402
+from streaming import streaming_handler_class  # noqa: E402
+
+
+def create_payload(size: int) -> str:
+    """Return a multi-line text of about `size` characters, like a dump of table rows."""
+    line: str = "{:>8} | 2026-01-01 10:00:00 | some value of the row | 12345.678 | another column\n"
+    return "".join(line.format(i) for i in range(size // len(line.format(0)) + 1))
+
+
+def log_records(handler: logging.Handler, payload: str, num_records: int) -> None:
+    for _ in range(num_records):
+        record = logging.LogRecord("BenchmarkApp", logging.INFO, __file__, 42, "Response body:\n%s", (payload,), None, func="handle_request")
+        handler.handle(record)
+
+
+def measure(create_handler, payload: str, num_records: int) -> tuple[float, float]:
+    """Return the milliseconds per record and the peak megabytes allocated while logging a record."""
+    handler: logging.Handler = create_handler()
+    start: float = time.perf_counter()
+    log_records(handler, payload, num_records)
+    elapsed: float = time.perf_counter() - start
+    handler.close()
+
+    handler = create_handler()
+    tracemalloc.start()
+    log_records(handler, payload, 1)
+    peak_bytes: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    handler.close()
+    return elapsed / num_records * 1000, peak_bytes / 1024 / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=float, default=8, help="Size of the logged message in megabytes.")
+    parser.add_argument("--records", type=int, default=20, help="Number of records logged per case.")
+    args = parser.parse_args()
+
+    payload: str = create_payload(int(args.size * 1024 * 1024))
+    print("message of {:,} characters".format(len(payload)))
+    print("{:<40} {:>12} {:>14}".format("case", "ms/record", "peak MB/record"))
+    with tempfile.TemporaryDirectory() as log_file_directory:
+        file_path: Path = Path(log_file_directory) / "large.log"
+
+        def file_handler(handler_class: type = logging.FileHandler, message_limit: MessageSizeLimit | None = None, **kwargs):
+            def create_handler() -> logging.Handler:
+                handler = handler_class(file_path, mode="w", **kwargs)
+                handler.setFormatter(IndentedMessageFormatter(message_limit=message_limit))
+                return handler
+
+            return create_handler
+
+        cases = [
+            ("FileHandler", file_handler()),
+            ("streaming FileHandler", file_handler(streaming_handler_class(logging.FileHandler), streaming_threshold=1024 * 1024)),
+            ("FileHandler, max_message_size 64 KiB", file_handler(message_limit=MessageSizeLimit(64 * 1024))),
+        ]
+        for name, create_handler in cases:
+            milliseconds, peak_megabytes = measure(create_handler, payload, args.records)
+            print("{:<40} {:>12.1f} {:>14.1f}".format(name, milliseconds, peak_megabytes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Microbenchmark of the `TidyLogger` logging methods.
+
+Measures calls at a disabled level (the TidyLogger methods against the methods of the underlying `logging.Logger`),
+calls at an enabled level with each caller lookup (the standard `Logger.findCaller`, the memoized lookup and no lookup),
+and the `*_exception` variants. The records are written to a log file in a temporary directory.
+
+Usage: python benchmarks/bench_level_methods.py [--calls N] [--repeat R]
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from tidy_logger import TidyLogger  # noqa: E402
+
+
+def measure(function: Callable[[], None], num_calls: int, repeat: int) -> float:
+    """Return the best time per call in nanoseconds of `repeat` runs."""
+    best: float = float("inf")
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        for _ in range(num_calls):
+            function()
+        elapsed: float = time.perf_counter() - start
+        best = min(best, elapsed / num_calls * 1e9)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100_000, help="Number of calls per run.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs (the best run is reported).")
+    args = parser.parse_args()
+
+    try:
+        raise ValueError("benchmark exception")
+    except ValueError as ex:
+        exception: ValueError = ex
+
+    with tempfile.TemporaryDirectory() as log_file_directory:
+        tidy_logger = TidyLogger(app_name="BenchmarkApp", log_file_directory=log_file_directory, print_log_file_path=False, console_level=logging.CRITICAL, file_level=logging.INFO)
+        standard_find_caller = logging.Logger.findCaller.__get__(tidy_logger.logger)
+        memoized_find_caller = tidy_logger.logger.findCaller
+
+        results: list[tuple[str, float]] = [
+            ("disabled debug(), logging.Logger", measure(lambda: tidy_logger.logger.debug("Request %d", 1), args.calls, args.repeat)),
+            ("disabled debug(), TidyLogger", measure(lambda: tidy_logger.debug("Request %d", 1), args.calls, args.repeat)),
+            ("disabled debug_exception(), TidyLogger", measure(lambda: tidy_logger.debug_exception(exception, "Failed"), args.calls, args.repeat)),
+        ]
+
+        # Enabled calls format and write the records, so fewer calls are made
+        num_enabled_calls: int = max(1, args.calls // 10)
+        for caller_lookup_name, find_caller in (("standard caller lookup", standard_find_caller), ("memoized caller lookup", memoized_find_caller), ("no caller lookup", None)):
+            if find_caller is None:
+                tidy_logger._set_caller_lookup("never")
+            else:
+                tidy_logger.logger.findCaller = find_caller
+            results.append((f"enabled info(), {caller_lookup_name}", measure(lambda: tidy_logger.info("Request %d", 1), num_enabled_calls, args.repeat)))
+            results.append((f"enabled info_exception(), {caller_lookup_name}", measure(lambda: tidy_logger.info_exception(exception, "Failed"), num_enabled_calls, args.repeat)))
+
+        tidy_logger.close()
+
+    print("Best of {} runs:".format(args.repeat))
+    for name, nanoseconds in results:
+        print("  {:<50} {:>10,.0f} ns/call".format(name, nanoseconds))
+
+
+if __name__ == "__main__":
+    main()
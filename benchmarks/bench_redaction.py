@@ -0,0 +1,101 @@
+"""
+Benchmark of the redaction of secrets in log messages.
+
+Compares a chain of `re.sub` calls (one per pattern and key, as a logging wrapper would do) with the `Redactor`, which combines them
+into one expression, skips the messages without any string the patterns require (prefilter), and caches the repeated messages.
+Each case redacts a mix of messages: mostly plain ones, some repeated with secrets, and some unique with secrets. Also reports the
+time per record of a file handler with and without redaction.
+
+Usage: python benchmarks/bench_redaction.py [--messages N] [--secret-ratio R]
+"""
+
+import argparse
+import logging
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from formatters import IndentedMessageFormatter  # noqa: E402
+from redaction import Redactor  # noqa: E402
+
+
+def create_messages(num_messages: int, secret_ratio: float) -> list[str]:
+    """Return plain messages, and a `secret_ratio` of messages with secrets (half of them repeated)."""
+    random.seed(0)
+    messages: list[str] = []
+    for i in range(num_messages):
+        if random.random() >= secret_ratio:
+            messages.append("Request {} handled in {:.1f} ms by worker {}".format(i, random.uniform(1, 50), i % 8))
+        elif i % 2:
+            messages.append("Login of bob@example.com with password=hunter2")
+        else:
+            messages.append("Calling https://api.example.com/v1?api_key={:x} for user {}@example.com".format(random.getrandbits(64), i))
+    return messages
+
+
+def chained_substitutions(patterns: tuple[str, ...], keys: tuple[str, ...]):
+    """Return a function applying one `re.sub` per pattern and key."""
+    substitutions: list[tuple[re.Pattern, str]] = [(re.compile(pattern), Redactor.DEFAULT_REPLACEMENT) for pattern in patterns]
+    for key in keys:
+        substitutions.append((re.compile(r"(?i)({}[\"']?\s*[:=]\s*)[^\s\"',;&]+".format(re.escape(key))), r"\g<1>" + Redactor.DEFAULT_REPLACEMENT))
+
+    def redact(text: str) -> str:
+        for regex, replacement in substitutions:
+            text = regex.sub(replacement, text)
+        return text
+
+    return redact
+
+
+def measure(redact, messages: list[str]) -> float:
+    """Return the microseconds per message."""
+    start: float = time.perf_counter()
+    for message in messages:
+        redact(message)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def measure_handler(redactor: Redactor | None, messages: list[str]) -> float:
+    """Return the microseconds per record of a file handler."""
+    with tempfile.TemporaryDirectory() as log_file_directory:
+        handler = logging.FileHandler(Path(log_file_directory) / "redaction.log")
+        handler.setFormatter(IndentedMessageFormatter(redactor=redactor))
+        records: list[logging.LogRecord] = [logging.LogRecord("BenchmarkApp", logging.INFO, __file__, 42, message, None, None, func="handle") for message in messages]
+        start: float = time.perf_counter()
+        for record in records:
+            handler.handle(record)
+        elapsed: float = time.perf_counter() - start
+        handler.close()
+    return elapsed / len(messages) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100000, help="Number of redacted messages per case.")
+    parser.add_argument("--secret-ratio", type=float, default=0.1, help="Ratio of the messages containing secrets.")
+    args = parser.parse_args()
+
+    messages: list[str] = create_messages(args.messages, args.secret_ratio)
+    patterns, keys = Redactor.DEFAULT_PATTERNS, Redactor.DEFAULT_KEYS
+    print("{:<40} {:>12}".format("case", "us/message"))
+    cases = [
+        ("chained re.sub", chained_substitutions(patterns, keys)),
+        ("Redactor, combined expression only", Redactor(patterns, keys, cache_size=0).regex.sub),
+        ("Redactor", Redactor(patterns, keys).redact),
+    ]
+    for name, redact in cases:
+        if name.endswith("only"):
+            # The combined expression without the prefilter and the cache
+            redact = (lambda sub: lambda text: sub(Redactor.DEFAULT_REPLACEMENT, text))(redact)
+        print("{:<40} {:>12.2f}".format(name, measure(redact, messages)))
+    print("{:<40} {:>12.2f}".format("FileHandler", measure_handler(None, messages)))
+    print("{:<40} {:>12.2f}".format("FileHandler with Redactor", measure_handler(Redactor(patterns, keys), messages)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark of shipping records to a remote collector with the ShippingHandler, against a local stand-in collector.
+
+Reports, for each batch size, the time spent by the caller per logged record (formatting and queueing, as the records are sent by
+the sender thread), the end-to-end throughput until the collector received all the records, and the p50, p99 and maximum send times
+of a batch. The last case logs the same records while the collector is unreachable, so they are spooled to disk.
+
+Usage: python benchmarks/bench_shipping.py [--records N] [--framing ndjson|length_prefixed]
+"""
+
+import argparse
+import logging
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from shipping import ShippingHandler  # noqa: E402
+
+
+class CountingCollector:
+    """A local collector that only counts the received bytes."""
+
+    def __init__(self):
+        self._server = socket.create_server(("127.0.0.1", 0))
+        self.address = self._server.getsockname()
+        self.byte_count: int = 0
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._receive, args=(connection,), daemon=True).start()
+
+    def _receive(self, connection: socket.socket) -> None:
+        while data := connection.recv(1024 * 1024):
+            self.byte_count += len(data)
+
+    def close(self) -> None:
+        self._server.close()
+
+
+def log_records(handler: ShippingHandler, num_records: int) -> float:
+    """Log the records and return the time spent by the caller in seconds."""
+    elapsed: float = 0.0
+    for i in range(num_records):
+        record = logging.LogRecord("BenchmarkApp", logging.INFO, __file__, 42, "Request %d handled in %.1f ms", (i, 12.5), None, func="handle_request")
+        start: float = time.perf_counter()
+        handler.handle(record)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=50000, help="Number of records logged per case.")
+    parser.add_argument("--framing", choices=ShippingHandler.FRAMINGS, default="ndjson", help="Framing of the shipped records.")
+    args = parser.parse_args()
+
+    print("{:<28} {:>12} {:>14} {:>10} {:>10} {:>10}".format("case", "caller us", "records/s", "p50 ms", "p99 ms", "max ms"))
+    for batch_size in (1, 10, 100, 500):
+        collector = CountingCollector()
+        handler = ShippingHandler(collector.address, framing=args.framing, batch_size=batch_size, queue_size=args.records)
+        start: float = time.perf_counter()
+        caller_time: float = log_records(handler, args.records)
+        handler.flush(timeout=60)
+        elapsed: float = time.perf_counter() - start
+        stats: dict = handler.stats()
+        handler.close()
+        collector.close()
+        print(
+            "{:<28} {:>12.2f} {:>14,.0f} {:>10.3f} {:>10.3f} {:>10.3f}".format(
+                f"batch_size {batch_size}",
+                caller_time / args.records * 1e6,
+                stats["sent_records"] / elapsed,
+                stats["batch_latency_p50"] * 1000,
+                stats["batch_latency_p99"] * 1000,
+                stats["batch_latency_max"] * 1000,
+            )
+        )
+
+    with tempfile.TemporaryDirectory() as spool_directory:
+        # Nothing listens on this address
+        unreachable_server = socket.create_server(("127.0.0.1", 0))
+        address = unreachable_server.getsockname()
+        unreachable_server.close()
+        handler = ShippingHandler(address, framing=args.framing, queue_size=args.records, spool_directory=spool_directory)
+        start = time.perf_counter()
+        caller_time = log_records(handler, args.records)
+        handler.flush(timeout=60)
+        elapsed = time.perf_counter() - start
+        stats = handler.stats()
+        handler.close()
+        print("{:<28} {:>12.2f} {:>14,.0f} {:>10} {:>10} {:>10}".format("unreachable, spooled", caller_time / args.records * 1e6, stats["spool_records"] / elapsed, "-", "-", "-"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark of the startup cost of TidyLogger: importing the package and constructing a logger.
+
+Each import case runs in a fresh interpreter (`--runs` times, the median is reported), timing the import and the first
+construction of a TidyLogger inside the interpreter, so the interpreter startup is not included. The construction cases
+are then repeated in this process with new logger names, with the log file created on initialization and with
+`delay_file_creation` (the file and its directory are created by the first record, which these loggers never log).
+Run with `python -X importtime -c "import tidy_logger"` (and `PYTHONPATH=src`) to see the cost of each imported module.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--constructions C]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SOURCE_DIRECTORY: Path = Path(__file__).resolve().parents[1] / "src"
+
+sys.path.insert(0, str(SOURCE_DIRECTORY / "tidy_logger"))
+
+from tidy_logger import TidyLogger  # noqa: E402
+
+# Timed in a fresh interpreter: the statements of each case, then the construction of a TidyLogger (if any)
+IMPORT_CASES: list[tuple[str, str, str | None]] = [
+    ("import logging", "import logging", None),
+    ("import tidy_logger", "import tidy_logger", None),
+    ("import AsyncTidyLogger", "from tidy_logger import AsyncTidyLogger", None),
+    (
+        "TidyLogger(log_file_directory=...)",
+        "from tidy_logger import TidyLogger",
+        "TidyLogger(app_name='Startup', log_file_directory=log_file_directory, print_log_file_path=False)",
+    ),
+    (
+        "TidyLogger(app_name, app_author)",
+        "from tidy_logger import TidyLogger",
+        "TidyLogger(app_name='Startup', app_author='Benchmark', log_file_name='startup', print_log_file_path=False, delay_file_creation=True)",
+    ),
+]
+
+TIMING_CODE: str = """
+import sys, time
+log_file_directory = sys.argv[1]
+start = time.perf_counter()
+{statements}
+imported = time.perf_counter()
+{construction}
+constructed = time.perf_counter()
+print(imported - start, constructed - imported)
+"""
+
+
+def measure_fresh_interpreter(statements: str, construction: str | None, log_file_directory: str, runs: int) -> tuple[float, float]:
+    """Return the median import and construction times in milliseconds of `runs` fresh interpreters."""
+    code: str = TIMING_CODE.format(statements=statements, construction=construction or "pass")
+    environment: dict[str, str] = dict(os.environ, PYTHONPATH=str(SOURCE_DIRECTORY))
+    import_times: list[float] = []
+    construction_times: list[float] = []
+    for _ in range(runs):
+        output: str = subprocess.run([sys.executable, "-c", code, log_file_directory], env=environment, capture_output=True, text=True, check=True).stdout
+        import_time, construction_time = map(float, output.split())
+        import_times.append(import_time * 1000)
+        construction_times.append(construction_time * 1000)
+    return statistics.median(import_times), statistics.median(construction_times)
+
+
+def measure_construction(log_file_directory: str, num_constructions: int, **kwargs) -> float:
+    """Return the average time in microseconds of constructing (and closing) a TidyLogger with a new name."""
+    elapsed: float = 0.0
+    for i in range(num_constructions):
+        start: float = time.perf_counter()
+        tidy_logger = TidyLogger(app_name="BenchmarkStartup{}_{}".format(len(kwargs), i), log_file_directory=log_file_directory, print_log_file_path=False, **kwargs)
+        elapsed += time.perf_counter() - start
+        tidy_logger.close()
+    return elapsed / num_constructions * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Number of fresh interpreters per import case.")
+    parser.add_argument("--constructions", type=int, default=500, help="Number of loggers constructed per construction case.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as log_file_directory:
+        print("{:<40} {:>12} {:>16}".format("fresh interpreter", "import ms", "construction ms"))
+        for name, statements, construction in IMPORT_CASES:
+            import_time, construction_time = measure_fresh_interpreter(statements, construction, log_file_directory, args.runs)
+            print("{:<40} {:>12.2f} {:>16}".format(name, import_time, "{:.2f}".format(construction_time) if construction else "-"))
+
+        print()
+        print("{:<40} {:>12}".format("construction", "us/logger"))
+        construction_cases: list[tuple[str, dict]] = [
+            ("file created on initialization", {}),
+            ("delay_file_creation", {"delay_file_creation": True}),
+            ("delay_file_creation, async_mode", {"delay_file_creation": True, "async_mode": True}),
+        ]
+        for name, kwargs in construction_cases:
+            print("{:<40} {:>12.1f}".format(name, measure_construction(log_file_directory, args.constructions, **kwargs)))
+
+
+if __name__ == "__main__":
+    main()
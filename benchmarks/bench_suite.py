@@ -0,0 +1,157 @@
+"""
+Benchmark suite of the logging hot paths of tidy_logger.
+
+Cases:
+  - formatting of short and multi-line messages with IndentedMessageFormatter and ColoredIndentedMessageFormatter
+  - rendering of deep exception chains and large ExceptionGroups (`TidyLogger._log_exception`)
+  - TidyLogger calls at disabled and enabled levels, with the file and console write paths, with and without file rotation and metrics, and with the binary file format
+  - enabled TidyLogger calls from several threads (lock contention)
+
+Each case reports records/sec (best run), p50/p99 per-call latency (all runs) and the peak and retained allocations per call (tracemalloc, separate run).
+The results can be saved as JSON and compared with the results of another version:
+
+Usage:
+  python benchmarks/bench_suite.py [--calls N] [--repeat R] [--filter TEXT] [--no-allocations] [--output results.json]
+  python benchmarks/bench_suite.py --compare baseline.json [--threshold 0.1]
+"""
+
+import argparse
+import io
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from formatters import ColoredIndentedMessageFormatter, IndentedMessageFormatter  # noqa: E402
+from harness import FunctionFactory, compare_results, load_results, print_results, run_benchmark, save_results  # noqa: E402
+
+from tidy_logger import TidyLogger  # noqa: E402
+
+SHORT_MESSAGE: str = "Processed request %d in %.2f ms"
+MULTI_LINE_MESSAGE: str = "Processed request %d in %.2f ms\n" + "\n".join(f"  step {i}: ok" for i in range(20))
+
+
+def create_exception_chain(depth: int) -> BaseException:
+    """Create an exception with `depth` exceptions chained with `raise ... from ...`, each with a traceback."""
+    exception: BaseException | None = None
+    for i in range(depth):
+        try:
+            if exception is None:
+                raise ValueError(f"root cause {i}")
+            raise RuntimeError(f"wrapped {i}") from exception
+        except Exception as ex:
+            exception = ex
+    return exception
+
+
+def create_exception_group(size: int) -> BaseException:
+    """Create an ExceptionGroup of `size` exceptions, each with a traceback."""
+    exceptions: list[Exception] = []
+    for i in range(size):
+        try:
+            raise KeyError(f"key {i}")
+        except KeyError as ex:
+            exceptions.append(ex)
+    try:
+        raise ExceptionGroup("many failures", exceptions)
+    except ExceptionGroup as ex:
+        return ex
+
+
+def formatter_case(formatter: logging.Formatter, message: str) -> FunctionFactory:
+    """Format fresh records (the indented message is cached on the record)."""
+
+    def factory(num_calls: int) -> Callable[[int], object]:
+        records: list[logging.LogRecord] = [logging.LogRecord("BenchmarkApp", logging.INFO, __file__, 42, message, (i, 1.5), None, func="handle_request") for i in range(num_calls)]
+        return lambda i: formatter.format(records[i])
+
+    return factory
+
+
+def create_tidy_logger(log_file_directory: str, name: str, **kwargs) -> TidyLogger:
+    """Create a TidyLogger writing to a file in `log_file_directory` and to the null device instead of the console."""
+    tidy_logger = TidyLogger(app_name=name, log_file_directory=log_file_directory, print_log_file_path=False, **kwargs)
+    if tidy_logger.console_handler is not None:
+        tidy_logger.console_handler.setStream(open(os.devnull, "w"))
+    return tidy_logger
+
+
+def get_cases(log_file_directory: str) -> tuple[list[tuple[str, FunctionFactory, int]], list[TidyLogger]]:
+    """Return the cases (name, function factory, number of threads) and the loggers to close after the benchmark."""
+    exception_chain: BaseException = create_exception_chain(50)
+    exception_group: BaseException = create_exception_group(50)
+
+    file_logger: TidyLogger = create_tidy_logger(log_file_directory, "BenchmarkFile", console_level=logging.CRITICAL, file_level=logging.INFO)
+    console_logger: TidyLogger = create_tidy_logger(log_file_directory, "BenchmarkConsole", console_level=logging.INFO, file_level=logging.CRITICAL)
+    rotating_logger: TidyLogger = create_tidy_logger(
+        log_file_directory, "BenchmarkRotation", console_level=logging.CRITICAL, file_level=logging.INFO, use_file_rotation=True, max_bytes=1024 * 1024, backup_count=2
+    )
+    metrics_logger: TidyLogger = create_tidy_logger(log_file_directory, "BenchmarkMetrics", console_level=logging.CRITICAL, file_level=logging.INFO, collect_metrics=True)
+    binary_logger: TidyLogger = create_tidy_logger(log_file_directory, "BenchmarkBinary", console_level=logging.CRITICAL, file_level=logging.INFO, file_format="binary")
+    loggers: list[TidyLogger] = [file_logger, console_logger, rotating_logger, metrics_logger, binary_logger]
+
+    cases: list[tuple[str, FunctionFactory, int]] = [
+        ("format short message", formatter_case(IndentedMessageFormatter(), SHORT_MESSAGE), 1),
+        ("format multi-line message", formatter_case(IndentedMessageFormatter(), MULTI_LINE_MESSAGE), 1),
+        ("format colored short message", formatter_case(ColoredIndentedMessageFormatter(), SHORT_MESSAGE), 1),
+        ("format colored multi-line message", formatter_case(ColoredIndentedMessageFormatter(), MULTI_LINE_MESSAGE), 1),
+        ("render exception chain (depth 50)", lambda num_calls: lambda i: file_logger._log_exception(exception_chain), 1),
+        ("render ExceptionGroup (50 exceptions)", lambda num_calls: lambda i: file_logger._log_exception(exception_group), 1),
+        ("disabled debug()", lambda num_calls: lambda i: file_logger.debug(SHORT_MESSAGE, i, 1.5), 1),
+        ("disabled debug_exception()", lambda num_calls: lambda i: file_logger.debug_exception(exception_chain, "Failed"), 1),
+        ("file info() short message", lambda num_calls: lambda i: file_logger.info(SHORT_MESSAGE, i, 1.5), 1),
+        ("file info() multi-line message", lambda num_calls: lambda i: file_logger.info(MULTI_LINE_MESSAGE, i, 1.5), 1),
+        ("file info_exception() chain (depth 50)", lambda num_calls: lambda i: file_logger.info_exception(exception_chain, "Failed"), 1),
+        ("console info() short message", lambda num_calls: lambda i: console_logger.info(SHORT_MESSAGE, i, 1.5), 1),
+        ("file info() with rotation", lambda num_calls: lambda i: rotating_logger.info(MULTI_LINE_MESSAGE, i, 1.5), 1),
+        ("file info() short message with metrics", lambda num_calls: lambda i: metrics_logger.info(SHORT_MESSAGE, i, 1.5), 1),
+        ("binary file info() short message", lambda num_calls: lambda i: binary_logger.info(SHORT_MESSAGE, i, 1.5), 1),
+        ("binary file info() multi-line message", lambda num_calls: lambda i: binary_logger.info(MULTI_LINE_MESSAGE, i, 1.5), 1),
+    ]
+    for num_threads in (4, 16):
+        cases.append(("file info() short message", lambda num_calls: lambda i: file_logger.info(SHORT_MESSAGE, i, 1.5), num_threads))
+    return cases, loggers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20_000, help="Number of calls per run of each case.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs of each case.")
+    parser.add_argument("--filter", default=None, help="Only run the cases whose name contains this text.")
+    parser.add_argument("--no-allocations", action="store_true", help="Do not measure the allocations with tracemalloc.")
+    parser.add_argument("--output", type=Path, default=None, help="Save the results as JSON to this file.")
+    parser.add_argument("--compare", type=Path, default=None, help="Compare the results with the results saved in this file.")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative throughput decrease reported as a regression (with --compare).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as log_file_directory:
+        cases, loggers = get_cases(log_file_directory)
+        results: list[dict] = []
+        for name, function_factory, num_threads in cases:
+            if args.filter is not None and args.filter not in name:
+                continue
+            results.append(run_benchmark(name, function_factory, args.calls, args.repeat, num_threads=num_threads, trace_allocations=not args.no_allocations))
+        for tidy_logger in loggers:
+            console_stream: io.TextIOBase | None = tidy_logger.console_handler.stream if tidy_logger.console_handler is not None else None
+            tidy_logger.close()
+            if console_stream is not None:
+                console_stream.close()
+
+    print_results(results)
+    if args.output is not None:
+        save_results(args.output, results)
+        print("\nResults saved to", args.output)
+    if args.compare is not None:
+        print()
+        regressions: list[str] = compare_results(load_results(args.compare), results, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
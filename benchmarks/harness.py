@@ -0,0 +1,190 @@
+"""
+Shared measurement helpers of the benchmarks: throughput, per-call latency percentiles, allocations, JSON results and comparisons.
+"""
+
+import json
+import math
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+# Creates the function of a run, which is called with the index of the call (so fresh inputs can be prepared for each run)
+FunctionFactory = Callable[[int], Callable[[int], object]]
+
+
+def percentile(sorted_values: list[int], fraction: float) -> int:
+    """Return the value at the given fraction (between 0 and 1) of sorted values, with the nearest-rank method."""
+    if not sorted_values:
+        return 0
+    index: int = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _run(function_factory: FunctionFactory, num_calls: int, num_threads: int) -> tuple[float, list[int]]:
+    """Run `num_calls` calls split between `num_threads` threads, return the elapsed time in seconds and the latencies in nanoseconds of the calls."""
+    calls_per_thread: int = max(1, num_calls // num_threads)
+    functions: list[Callable[[int], object]] = [function_factory(calls_per_thread) for _ in range(num_threads)]
+    latencies: list[list[int]] = [[] for _ in range(num_threads)]
+    barrier = threading.Barrier(num_threads + 1)
+
+    def run_thread(thread_index: int) -> None:
+        function = functions[thread_index]
+        thread_latencies: list[int] = latencies[thread_index]
+        perf_counter_ns = time.perf_counter_ns
+        barrier.wait()
+        for i in range(calls_per_thread):
+            start: int = perf_counter_ns()
+            function(i)
+            thread_latencies.append(perf_counter_ns() - start)
+
+    if num_threads == 1:
+        function = functions[0]
+        perf_counter_ns = time.perf_counter_ns
+        start: float = time.perf_counter()
+        for i in range(calls_per_thread):
+            call_start: int = perf_counter_ns()
+            function(i)
+            latencies[0].append(perf_counter_ns() - call_start)
+        return time.perf_counter() - start, latencies[0]
+
+    threads: list[threading.Thread] = [threading.Thread(target=run_thread, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start: float = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed: float = time.perf_counter() - start
+    return elapsed, [latency for thread_latencies in latencies for latency in thread_latencies]
+
+
+def _measure_allocations(function_factory: FunctionFactory, num_calls: int) -> tuple[float, float]:
+    """
+    Measure the allocations of `num_calls` calls with tracemalloc (in a separate run, as tracing slows the calls down).
+    :return: The average peak of the memory allocated during a call, and the average memory still allocated after a call (e.g. cached), in bytes.
+    """
+    function = function_factory(num_calls)
+    peak_bytes: int = 0
+    tracemalloc.start()
+    try:
+        start_size, _ = tracemalloc.get_traced_memory()
+        for i in range(num_calls):
+            call_start_size, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            function(i)
+            peak_bytes += tracemalloc.get_traced_memory()[1] - call_start_size
+        end_size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak_bytes / num_calls, max(0, end_size - start_size) / num_calls
+
+
+def run_benchmark(name: str, function_factory: FunctionFactory, num_calls: int, repeat: int, num_threads: int = 1, trace_allocations: bool = True) -> dict:
+    """
+    Measure a benchmark case.
+    :param name: The name of the case.
+    :param function_factory: Creates the function of a run from the number of calls of the run. The function is called with the index of each call.
+    :param num_calls: Number of calls per run (split between the threads).
+    :param repeat: Number of runs, the best throughput is reported, and the latencies of all the runs are combined.
+    :param num_threads: Number of threads calling the function concurrently.
+    :param trace_allocations: Whether to measure the allocations with tracemalloc (in a separate run).
+    :return: A dictionary with the name, the number of threads, the records/sec, the p50/p99 latencies in nanoseconds, and the peak and retained allocations per call in bytes.
+    """
+    best_records_per_second: float = 0.0
+    all_latencies: list[int] = []
+    for _ in range(repeat):
+        elapsed, latencies = _run(function_factory, num_calls, num_threads)
+        best_records_per_second = max(best_records_per_second, len(latencies) / elapsed)
+        all_latencies.extend(latencies)
+    all_latencies.sort()
+
+    result: dict = {
+        "name": name,
+        "threads": num_threads,
+        "calls": num_calls,
+        "records_per_second": best_records_per_second,
+        "p50_ns": percentile(all_latencies, 0.5),
+        "p99_ns": percentile(all_latencies, 0.99),
+    }
+    if trace_allocations:
+        peak_bytes_per_call, retained_bytes_per_call = _measure_allocations(function_factory, max(1, num_calls // 10))
+        result["peak_bytes_per_call"] = peak_bytes_per_call
+        result["retained_bytes_per_call"] = retained_bytes_per_call
+    return result
+
+
+def get_environment() -> dict:
+    """Return the environment of the results: the time, the Python version, the platform and the git commit (if available)."""
+    try:
+        commit: str | None = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).resolve().parent, capture_output=True, text=True, timeout=10, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "commit": commit,
+    }
+
+
+def save_results(file_path: str | Path, results: list[dict]) -> None:
+    """Save the results and the environment as JSON."""
+    Path(file_path).write_text(json.dumps({"environment": get_environment(), "results": results}, indent=2) + "\n")
+
+
+def load_results(file_path: str | Path) -> list[dict]:
+    """Load the results saved by `save_results`."""
+    return json.loads(Path(file_path).read_text())["results"]
+
+
+def print_results(results: list[dict]) -> None:
+    print("{:<45} {:>7} {:>14} {:>10} {:>10} {:>12}".format("case", "threads", "records/sec", "p50 ns", "p99 ns", "peak B/call"))
+    for result in results:
+        peak_bytes_per_call = result.get("peak_bytes_per_call")
+        print(
+            "{:<45} {:>7} {:>14,.0f} {:>10,} {:>10,} {:>12}".format(
+                result["name"],
+                result["threads"],
+                result["records_per_second"],
+                result["p50_ns"],
+                result["p99_ns"],
+                "-" if peak_bytes_per_call is None else "{:,.0f}".format(peak_bytes_per_call),
+            )
+        )
+
+
+def compare_results(baseline_results: list[dict], results: list[dict], threshold: float) -> list[str]:
+    """
+    Print the throughput changes of the cases of both results, and return the names of the regressed cases.
+    :param baseline_results: The results of the baseline version.
+    :param results: The results of the current version.
+    :param threshold: The relative throughput decrease (e.g. 0.1 for 10%) above which a case is regressed.
+    :return: The names of the cases whose throughput decreased by more than `threshold`.
+    """
+    baseline_by_name: dict[str, dict] = {(result["name"], result["threads"]): result for result in baseline_results}
+    regressions: list[str] = []
+    print("{:<45} {:>7} {:>14} {:>14} {:>10}".format("case", "threads", "baseline r/s", "current r/s", "change"))
+    for result in results:
+        baseline = baseline_by_name.get((result["name"], result["threads"]))
+        if baseline is None:
+            continue
+        change: float = result["records_per_second"] / baseline["records_per_second"] - 1
+        regressed: bool = change < -threshold
+        if regressed:
+            regressions.append(result["name"])
+        print(
+            "{:<45} {:>7} {:>14,.0f} {:>14,.0f} {:>+9.1%}{}".format(
+                result["name"], result["threads"], baseline["records_per_second"], result["records_per_second"], change, "  REGRESSION" if regressed else ""
+            )
+        )
+    return regressions
@@ -1 +1,19 @@
-from .tidy_logger import TidyLogger
+import importlib
+
+__all__ = ["AsyncTidyLogger", "TidyLogger"]
+
+# The module of each exported class, imported on first access (PEP 562), so `import tidy_logger` does not import asyncio
+_exported_modules: dict[str, str] = {"AsyncTidyLogger": ".asyncio_logging", "TidyLogger": ".tidy_logger"}
+
+
+def __getattr__(name: str):
+    module_name: str | None = _exported_modules.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import queue
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Iterable
+
+try:
+    from .messages import LazyExceptionMessage
+    from .queueing import BoundedQueueHandler, QueueBarrier
+    from .tidy_logger import TidyLogger
+except ImportError:
+    from messages import LazyExceptionMessage
+    from queueing import BoundedQueueHandler, QueueBarrier
+
+    from tidy_logger import TidyLogger
+
+
+def _set_future_done(future: asyncio.Future) -> None:
+    """Mark a future as done, unless it was cancelled (scheduled on the event loop of the future)."""
+    if not future.done():
+        future.set_result(None)
+
+
+class ContextVarsFilter(logging.Filter):
+    """A logger filter that adds the name of the current asyncio task and the values of context variables (e.g. a request id) to each record."""
+
+    def __init__(self, context_variables: Iterable[ContextVar] = ()):
+        """
+        Initialize the ContextVarsFilter.
+        :param context_variables: The context variables whose values are added to the records, as attributes named after the variables. Unset variables are skipped.
+        """
+        super().__init__()
+        self.context_variables: tuple[ContextVar, ...] = tuple(context_variables)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record_fields: dict = record.__dict__
+        if record_fields.get("taskName") is None:
+            # Same attribute as Python 3.12+ records
+            try:
+                task: asyncio.Task | None = asyncio.current_task()
+            except RuntimeError:
+                task = None
+            record_fields["taskName"] = None if task is None else task.get_name()
+        for context_variable in self.context_variables:
+            # Fields passed with `extra` take precedence
+            if context_variable.name not in record_fields:
+                value = context_variable.get(self)
+                if value is not self:
+                    record_fields[context_variable.name] = value
+        return True
+
+
+class AsyncTidyLogger(TidyLogger):
+    """
+    A TidyLogger for asyncio applications, which never writes to the log file or the console on the event loop.
+
+    The records are created on the caller's thread (with the current task name and context variables), and put into the queue of a
+    background thread that formats and writes them, as in the `async_mode` of TidyLogger. The usual methods (`info`, `error_exception`, ...)
+    only enqueue the record and return. Their awaitable variants (`ainfo`, `aerror_exception`, ...) also wait, without blocking the event
+    loop, until the record has been written, and `aclose` writes the queued records and closes the handlers on an executor thread.
+    """
+
+    def __init__(self, *args, context_variables: Iterable[ContextVar] = (), **kwargs):
+        """
+        Initialize the AsyncTidyLogger. Takes the same arguments as TidyLogger, with `async_mode` always enabled and 'drop_oldest' as the default `queue_full_policy`.
+        :param context_variables: Context variables (e.g. the id of the current request) whose values are added to each record, as fields named after the variables.
+        :raises ValueError: If `async_mode` is False, or for the invalid arguments of TidyLogger.
+        """
+        if not kwargs.setdefault("async_mode", True):
+            raise ValueError("`async_mode` cannot be disabled for an AsyncTidyLogger.")
+        # Blocking on a full queue would block the event loop
+        kwargs.setdefault("queue_full_policy", BoundedQueueHandler.DROP_OLDEST)
+        super().__init__(*args, **kwargs)
+        self._context_filter: ContextVarsFilter | None = None
+        if self._queue_handler is not None:
+            # First, so sampling can use the context variables as `sample_key`
+            self._context_filter = ContextVarsFilter(context_variables)
+            self.logger.filters.insert(0, self._context_filter)
+
+    async def aflush(self) -> None:
+        """Wait, without blocking the event loop, until every record logged before the call has been written (or dropped because the queue was full)."""
+        if self._queue_handler is None or self._queue_listener is None:
+            return
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+
+        def release() -> None:
+            # Called on the listener thread
+            try:
+                loop.call_soon_threadsafe(_set_future_done, future)
+            except RuntimeError:
+                # The event loop is closed
+                pass
+
+        barrier = QueueBarrier(release)
+        record_queue: queue.Queue = self._queue_handler.queue
+        try:
+            record_queue.put_nowait(barrier)
+        except queue.Full:
+            await loop.run_in_executor(None, record_queue.put, barrier)
+        await future
+
+    async def aclose(self) -> None:
+        """Write the queued records and close all the handlers, on an executor thread."""
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def close(self) -> None:
+        if self._context_filter is not None:
+            self.logger.removeFilter(self._context_filter)
+            self._context_filter = None
+        super().close()
+
+    async def adebug(self, message: str, *args, **kwargs) -> None:
+        """Log a debug message, and wait until it is written."""
+        if self.logger.isEnabledFor(logging.DEBUG):
+            kwargs.setdefault("stacklevel", 2)
+            self.logger.debug(message, *args, **kwargs)
+            await self.aflush()
+
+    async def ainfo(self, message: str, *args, **kwargs) -> None:
+        """Log an info message, and wait until it is written."""
+        if self.logger.isEnabledFor(logging.INFO):
+            kwargs.setdefault("stacklevel", 2)
+            self.logger.info(message, *args, **kwargs)
+            await self.aflush()
+
+    async def awarning(self, message: str, *args, **kwargs) -> None:
+        """Log a warning message, and wait until it is written."""
+        if self.logger.isEnabledFor(logging.WARNING):
+            kwargs.setdefault("stacklevel", 2)
+            self.logger.warning(message, *args, **kwargs)
+            await self.aflush()
+
+    async def aerror(self, message: str, *args, **kwargs) -> None:
+        """Log an error message, and wait until it is written."""
+        if self.logger.isEnabledFor(logging.ERROR):
+            kwargs.setdefault("stacklevel", 2)
+            self.logger.error(message, *args, **kwargs)
+            await self.aflush()
+
+    async def acritical(self, message: str, *args, **kwargs) -> None:
+        """Log a critical message, and wait until it is written."""
+        if self.logger.isEnabledFor(logging.CRITICAL):
+            kwargs.setdefault("stacklevel", 2)
+            self.logger.critical(message, *args, **kwargs)
+            await self.aflush()
+
+    async def adebug_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
+        """Log a debug message with exception details, and wait until it is written."""
+        if self.logger.isEnabledFor(logging.DEBUG):
+            kwargs.setdefault("stacklevel", 2)
+            debug_full_message: LazyExceptionMessage = self._get_lazy_full_message(message=message, ex=ex)
+            self.logger.debug(debug_full_message, *args, **kwargs)
+            await self.aflush()
+
+    async def ainfo_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
+        """Log an info message with exception details, and wait until it is written."""
+        if self.logger.isEnabledFor(logging.INFO):
+            kwargs.setdefault("stacklevel", 2)
+            info_full_message: LazyExceptionMessage = self._get_lazy_full_message(message=message, ex=ex)
+            self.logger.info(info_full_message, *args, **kwargs)
+            await self.aflush()
+
+    async def awarning_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
+        """Log a warning message with exception details, and wait until it is written."""
+        if self.logger.isEnabledFor(logging.WARNING):
+            kwargs.setdefault("stacklevel", 2)
+            warning_full_message: LazyExceptionMessage = self._get_lazy_full_message(message=message, ex=ex)
+            self.logger.warning(warning_full_message, *args, **kwargs)
+            await self.aflush()
+
+    async def aerror_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
+        """Log an error message with exception details, and wait until it is written."""
+        if self.logger.isEnabledFor(logging.ERROR):
+            kwargs.setdefault("stacklevel", 2)
+            error_full_message: LazyExceptionMessage = self._get_lazy_full_message(message=message, ex=ex)
+            self.logger.error(error_full_message, *args, **kwargs)
+            await self.aflush()
+
+    async def acritical_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
+        """Log a critical message with exception details, and wait until it and the ring buffer dump (if any) are written."""
+        if self.logger.isEnabledFor(logging.CRITICAL):
+            kwargs.setdefault("stacklevel", 2)
+            critical_full_message: LazyExceptionMessage = self._get_lazy_full_message(message=message, ex=ex)
+            self.logger.critical(critical_full_message, *args, **kwargs)
+            await self.aflush()
+            if self.ring_buffer_handler is not None:
+                await self.adump_ring_buffer()
+
+    async def adump_ring_buffer(self, file_path: str | Path | None = None) -> Path | None:
+        """Same as `dump_ring_buffer`, on an executor thread."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.dump_ring_buffer, file_path)
@@ -0,0 +1,527 @@
+"""
+Compact binary log format of TidyLogger (`file_format="binary"`), and the `tidy-logger-decode` command line tool.
+
+Records are written without interpolating or indenting their messages: each record references its format string (template), logger name,
+level name and call site by id, and contains its creation time and serialized arguments. The strings and call sites are interned per file,
+and their definitions are written just before the first record that uses them. The files are rendered offline to the text of
+`IndentedMessageFormatter`, or to the JSON of `JsonLinesFormatter`.
+
+Layout: the file header (`FILE_MAGIC` and the format version), then frames of `<length: u32><crc32: u32><type: u8><payload>`, where
+length and crc32 cover the type and the payload. Each time the file is opened, a session frame (containing `SYNC_MARKER`) resets the
+interning tables. A truncated or corrupted frame (e.g. after a crash) is skipped up to the next session frame.
+Version 2 adds the bound context of the records (see `context.BoundContext`), interned as the members of its JSON object.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, TextIO
+
+try:
+    from .caller import UNKNOWN_CALLER
+    from .formatters import IndentedMessageFormatter, JsonLinesFormatter
+except ImportError:
+    from caller import UNKNOWN_CALLER
+    from formatters import IndentedMessageFormatter, JsonLinesFormatter
+
+if TYPE_CHECKING:
+    from .context import BoundContext
+
+FILE_MAGIC: bytes = b"TIDYBIN\n"
+FORMAT_VERSION: int = 2
+SYNC_MARKER: bytes = b"\xfeTIDY-SESSION\x00\xff\xfe"
+
+FRAME_SESSION: int = 1
+FRAME_STRING: int = 2
+FRAME_CALL_SITE: int = 3
+FRAME_RECORD: int = 4
+
+# Record flags
+_HAS_EXCEPTION_TEXT: int = 1
+_HAS_STACK_INFO: int = 2
+# Followed by the id of the interned JSON members of the bound context
+_HAS_CONTEXT: int = 4
+
+# Argument types
+_ARGUMENT_NONE: int = 0
+_ARGUMENT_FALSE: int = 1
+_ARGUMENT_TRUE: int = 2
+_ARGUMENT_INT: int = 3
+_ARGUMENT_FLOAT: int = 4
+_ARGUMENT_STR: int = 5
+_ARGUMENT_BYTES: int = 6
+
+_FILE_HEADER: struct.Struct = struct.Struct("<8sH")
+_FRAME_HEADER: struct.Struct = struct.Struct("<II")
+_SESSION: struct.Struct = struct.Struct("<B16sHd")
+_STRING_ID: struct.Struct = struct.Struct("<BI")
+_CALL_SITE: struct.Struct = struct.Struct("<BIIII")
+# Type, created, msecs, levelno, level name id, logger name id, call site id, template id (0 if the message follows), flags, number of arguments
+_RECORD: struct.Struct = struct.Struct("<BdHHIIIIBH")
+_LENGTH: struct.Struct = struct.Struct("<I")
+_INT: struct.Struct = struct.Struct("<Bq")
+_FLOAT: struct.Struct = struct.Struct("<Bd")
+_TYPE_AND_LENGTH: struct.Struct = struct.Struct("<BI")
+
+_INT_MIN: int = -(2**63)
+_INT_MAX: int = 2**63 - 1
+
+
+def _frame(body: bytes) -> bytes:
+    """Prefix a frame body (type and payload) with its length and checksum."""
+    return _FRAME_HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+class BinaryRecordFormatter(logging.Formatter):
+    """
+    Encodes records into the frames of the binary format, see the module documentation. `format` returns bytes, and must be called by a single
+    thread at a time in the order the frames are written (i.e. under the handler lock), as the interning tables are shared by the records of a file.
+
+    Records whose message is not a str, whose arguments are a mapping, or whose arguments are not None, bool, int, float, str or bytes (e.g. the
+    exception details of TidyLogger) are written with their interpolated message, so they are rendered the same way.
+    """
+
+    # The call site of each record is written
+    uses_caller_fields: bool = True
+
+    def __init__(self):
+        super().__init__()
+        self._string_ids: dict[str, int] = {}
+        self._call_site_ids: dict[tuple[str, str, int], int] = {}
+
+    def reset(self) -> None:
+        """Forget the interned strings and call sites, when a new file (or session) is started."""
+        self._string_ids = {}
+        self._call_site_ids = {}
+
+    def file_header(self) -> bytes:
+        """Return the header written at the start of a file."""
+        return _FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION)
+
+    def session_frame(self, created: float) -> bytes:
+        """Reset the interning tables, and return the session frame written each time a file is opened."""
+        self.reset()
+        return _frame(_SESSION.pack(FRAME_SESSION, SYNC_MARKER, FORMAT_VERSION, created))
+
+    def _intern(self, text: str, definitions: list[bytes]) -> int:
+        """Return the id of a string, and append its definition frame if it is new."""
+        string_id: int = len(self._string_ids) + 1
+        self._string_ids[text] = string_id
+        definitions.append(_frame(_STRING_ID.pack(FRAME_STRING, string_id) + text.encode("utf-8", "surrogatepass")))
+        return string_id
+
+    def format(self, record: logging.LogRecord) -> bytes:
+        definitions: list[bytes] = []
+        string_ids: dict[str, int] = self._string_ids
+
+        call_site_key: tuple[str, str, int] = (record.pathname, record.funcName, record.lineno)
+        call_site_id: int | None = self._call_site_ids.get(call_site_key)
+        if call_site_id is None:
+            # `funcName` is None for records not created by a logger, rendered as 'None' by the text formatters
+            function_name: str = str(record.funcName)
+            pathname_id: int = string_ids.get(record.pathname) or self._intern(record.pathname, definitions)
+            function_id: int = string_ids.get(function_name) or self._intern(function_name, definitions)
+            call_site_id = self._call_site_ids[call_site_key] = len(self._call_site_ids) + 1
+            definitions.append(_frame(_CALL_SITE.pack(FRAME_CALL_SITE, call_site_id, pathname_id, function_id, record.lineno)))
+        level_name_id: int = string_ids.get(record.levelname) or self._intern(record.levelname, definitions)
+        logger_name_id: int = string_ids.get(record.name) or self._intern(record.name, definitions)
+
+        msg = record.msg
+        args = record.args
+        encoded_arguments: list[bytes] | None = None
+        if type(msg) is str:
+            encoded_arguments = self._encode_arguments(args) if args else []
+        flags: int = 0
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            flags |= _HAS_EXCEPTION_TEXT
+        if record.stack_info:
+            flags |= _HAS_STACK_INFO
+        context = record.__dict__.get("_tidy_context")
+        context_id: int = 0
+        if context is not None and context.json_fragment:
+            flags |= _HAS_CONTEXT
+            # The context of a bound logger or a request is shared by many records
+            context_id = string_ids.get(context.json_items) or self._intern(context.json_items, definitions)
+
+        template_id: int = 0
+        if encoded_arguments is not None:
+            template_id = string_ids.get(msg) or self._intern(msg, definitions)
+            parts: list[bytes] = [
+                _RECORD.pack(
+                    FRAME_RECORD, record.created, int(record.msecs), record.levelno, level_name_id, logger_name_id, call_site_id, template_id, flags, len(encoded_arguments)
+                )
+            ]
+        else:
+            # Interpolated once and shared with the other handlers, see `IndentedMessageFormatter.get_message`
+            message: bytes = IndentedMessageFormatter.get_message(record).encode("utf-8", "surrogatepass")
+            parts = [
+                _RECORD.pack(FRAME_RECORD, record.created, int(record.msecs), record.levelno, level_name_id, logger_name_id, call_site_id, 0, flags, 0),
+                _LENGTH.pack(len(message)),
+                message,
+            ]
+        if flags & _HAS_EXCEPTION_TEXT:
+            exception_text: bytes = record.exc_text.encode("utf-8", "surrogatepass")
+            parts.append(_LENGTH.pack(len(exception_text)))
+            parts.append(exception_text)
+        if flags & _HAS_STACK_INFO:
+            stack_info: bytes = record.stack_info.encode("utf-8", "surrogatepass")
+            parts.append(_LENGTH.pack(len(stack_info)))
+            parts.append(stack_info)
+        if flags & _HAS_CONTEXT:
+            parts.append(_LENGTH.pack(context_id))
+        if encoded_arguments:
+            parts.extend(encoded_arguments)
+
+        body: bytes = b"".join(parts)
+        frame: bytes = _FRAME_HEADER.pack(len(body), zlib.crc32(body)) + body
+        if definitions:
+            definitions.append(frame)
+            return b"".join(definitions)
+        return frame
+
+    @staticmethod
+    def _encode_arguments(args) -> list[bytes] | None:
+        """Encode the arguments of a record, or return None if they cannot be encoded (a mapping, or an unsupported type)."""
+        if type(args) is not tuple:
+            return None
+        encoded_arguments: list[bytes] = []
+        for argument in args:
+            argument_type = type(argument)
+            if argument_type is str:
+                encoded: bytes = argument.encode("utf-8", "surrogatepass")
+                encoded_arguments.append(_TYPE_AND_LENGTH.pack(_ARGUMENT_STR, len(encoded)) + encoded)
+            elif argument_type is int:
+                if not _INT_MIN <= argument <= _INT_MAX:
+                    return None
+                encoded_arguments.append(_INT.pack(_ARGUMENT_INT, argument))
+            elif argument_type is float:
+                encoded_arguments.append(_FLOAT.pack(_ARGUMENT_FLOAT, argument))
+            elif argument is None:
+                encoded_arguments.append(b"\x00")
+            elif argument_type is bool:
+                encoded_arguments.append(b"\x02" if argument else b"\x01")
+            elif argument_type is bytes:
+                encoded_arguments.append(_TYPE_AND_LENGTH.pack(_ARGUMENT_BYTES, len(argument)) + argument)
+            else:
+                return None
+        return encoded_arguments
+
+
+class BinaryFileWriteMixin:
+    """A mixin for file handlers that writes the records in the binary format: the file is opened in binary mode, starts with the file header, and each opening starts a new session."""
+
+    terminator: str = ""
+
+    def _open(self):
+        stream = super()._open()
+        formatter: BinaryRecordFormatter = self.formatter
+        if stream.tell() == 0:
+            stream.write(formatter.file_header())
+        stream.write(formatter.session_frame(time.time()))
+        return stream
+
+    def _should_rollover_binary(self, data_size: int) -> bool:
+        """Return whether the file should be rolled over before writing a frame of `data_size` bytes. Handlers without rotation never roll over."""
+        return False
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            data: bytes = self.format(record)
+            if self._should_rollover_binary(len(data)):
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+                # The definitions of the interned strings are written again to the new file
+                data = self.format(record)
+            self.stream.write(data)
+            self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class BinaryFileHandler(BinaryFileWriteMixin, logging.FileHandler):
+    """A file handler writing the records in the binary format."""
+
+    def __init__(self, filename: str | Path, mode: str = "a", delay: bool = False):
+        """
+        Initialize the BinaryFileHandler.
+        :param filename: The path of the log file.
+        :param mode: 'a' to append a new session to an existing file, or 'w' to overwrite it.
+        :param delay: Whether to open the file when the first record is written.
+        """
+        super().__init__(filename, mode=mode + "b", delay=True)
+        self.setFormatter(BinaryRecordFormatter())
+        if not delay:
+            self.stream = self._open()
+
+
+class BinaryRotatingFileHandler(BinaryFileWriteMixin, RotatingFileHandler):
+    """A file handler writing the records in the binary format, rotating the log file when it reaches a maximum size (like RotatingFileHandler)."""
+
+    def __init__(self, filename: str | Path, mode: str = "a", maxBytes: int = 0, backupCount: int = 0, delay: bool = False):
+        """
+        Initialize the BinaryRotatingFileHandler.
+        :param filename: The path of the log file.
+        :param mode: 'a' to append a new session to an existing file, or 'w' to overwrite it.
+        :param maxBytes: Maximum size in bytes of the log file before rotation. If 0, the file is not rotated.
+        :param backupCount: Number of backup files to keep.
+        :param delay: Whether to open the file when the first record is written.
+        """
+        super().__init__(filename, mode=mode + "b", maxBytes=maxBytes, backupCount=backupCount, delay=True)
+        # RotatingFileHandler replaces the mode with 'a' (text) when rotating
+        self.mode = ("a" if maxBytes > 0 else mode) + "b"
+        self.encoding = None
+        self.setFormatter(BinaryRecordFormatter())
+        if not delay:
+            self.stream = self._open()
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        # Decided in `emit`, with the size of the encoded record
+        return False
+
+    def _should_rollover_binary(self, data_size: int) -> bool:
+        if self.maxBytes <= 0 or not os.path.isfile(self.baseFilename):
+            return False
+        position: int = self.stream.tell()
+        # A file with only its header and session frame is not rotated, even for a record larger than `maxBytes`
+        return position + data_size >= self.maxBytes and position > _FILE_HEADER.size + _FRAME_HEADER.size + _SESSION.size
+
+
+class BinaryLogReader:
+    """
+    Decodes a binary log file into LogRecords (memory-mapped). Truncated and corrupted frames are skipped up to the next session, and counted in
+    `truncated_byte_count` (an incomplete frame at the end of the file) and `corrupted_byte_count`.
+    """
+
+    def __init__(self, file_path: str | Path):
+        """
+        Initialize the BinaryLogReader.
+        :param file_path: The path of the binary log file.
+        :raises ValueError: If the file is not a binary log file, or was written with a newer version of the format.
+        """
+        self.file_path = Path(file_path)
+        self.truncated_byte_count: int = 0
+        self.corrupted_byte_count: int = 0
+        self._mmap: mmap.mmap | None = None
+        with open(self.file_path, "rb") as file:
+            header: bytes = file.read(_FILE_HEADER.size)
+            if len(header) < _FILE_HEADER.size or header[: len(FILE_MAGIC)] != FILE_MAGIC:
+                raise ValueError("`{}` is not a binary TidyLogger log file.".format(self.file_path))
+            magic, self.version = _FILE_HEADER.unpack(header)
+            if self.version > FORMAT_VERSION:
+                raise ValueError("`{}` has version {} of the binary log format, the newest supported version is {}.".format(self.file_path, self.version, FORMAT_VERSION))
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self) -> "BinaryLogReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def _resynchronize(self, position: int) -> int | None:
+        """Return the position of the next session frame after `position`, or None if there is none."""
+        marker_position: int = self._mmap.find(SYNC_MARKER, position + 1)
+        if marker_position < 0:
+            return None
+        # The marker follows the frame header and the frame type
+        return marker_position - _FRAME_HEADER.size - 1
+
+    def records(self) -> Iterator[logging.LogRecord]:
+        """Iterate over the records of the file, in the order they were written."""
+        data: mmap.mmap = self._mmap
+        size: int = len(data)
+        strings: dict[int, str] = {}
+        call_sites: dict[int, tuple[str, str, int]] = {}
+        # The bound contexts decoded from the interned strings, per string id
+        contexts: dict[int, BoundContext] = {}
+        position: int = _FILE_HEADER.size
+        while position < size:
+            if position + _FRAME_HEADER.size > size:
+                self.truncated_byte_count += size - position
+                return
+            length, checksum = _FRAME_HEADER.unpack_from(data, position)
+            start: int = position + _FRAME_HEADER.size
+            end: int = start + length
+            if end > size or length == 0 or zlib.crc32(data[start:end]) != checksum:
+                next_position: int | None = self._resynchronize(position)
+                if next_position is None:
+                    if end > size:
+                        self.truncated_byte_count += size - position
+                    else:
+                        self.corrupted_byte_count += size - position
+                    return
+                self.corrupted_byte_count += next_position - position
+                position = next_position
+                continue
+
+            frame_type: int = data[start]
+            if frame_type == FRAME_RECORD:
+                yield self._decode_record(data, start, end, strings, call_sites, contexts)
+            elif frame_type == FRAME_STRING:
+                _, string_id = _STRING_ID.unpack_from(data, start)
+                text_start: int = start + _STRING_ID.size
+                strings[string_id] = data[text_start:end].decode("utf-8", "surrogatepass")
+            elif frame_type == FRAME_CALL_SITE:
+                _, call_site_id, pathname_id, function_id, line_number = _CALL_SITE.unpack_from(data, start)
+                call_sites[call_site_id] = (strings.get(pathname_id, UNKNOWN_CALLER[0]), strings.get(function_id, UNKNOWN_CALLER[2]), line_number)
+            elif frame_type == FRAME_SESSION:
+                strings = {}
+                call_sites = {}
+                contexts = {}
+            # Unknown frame types (of a newer minor version) are skipped
+            position = end
+
+    @staticmethod
+    def _decode_record(
+        data: mmap.mmap, start: int, end: int, strings: dict[int, str], call_sites: dict[int, tuple[str, str, int]], contexts: dict[int, "BoundContext"]
+    ) -> logging.LogRecord:
+        _, created, msecs, levelno, level_name_id, logger_name_id, call_site_id, template_id, flags, argument_count = _RECORD.unpack_from(data, start)
+        position: int = start + _RECORD.size
+
+        def read_string() -> str:
+            nonlocal position
+            (length,) = _LENGTH.unpack_from(data, position)
+            string_start: int = position + _LENGTH.size
+            position = string_start + length
+            return data[string_start:position].decode("utf-8", "surrogatepass")
+
+        message: str = strings.get(template_id, "(unknown message)") if template_id else read_string()
+        exception_text: str | None = read_string() if flags & _HAS_EXCEPTION_TEXT else None
+        stack_info: str | None = read_string() if flags & _HAS_STACK_INFO else None
+        context_id: int = 0
+        if flags & _HAS_CONTEXT:
+            (context_id,) = _LENGTH.unpack_from(data, position)
+            position += _LENGTH.size
+
+        args: list = []
+        for _ in range(argument_count):
+            argument_type: int = data[position]
+            if argument_type == _ARGUMENT_STR:
+                position += 1
+                args.append(read_string())
+            elif argument_type == _ARGUMENT_INT:
+                args.append(_INT.unpack_from(data, position)[1])
+                position += _INT.size
+            elif argument_type == _ARGUMENT_FLOAT:
+                args.append(_FLOAT.unpack_from(data, position)[1])
+                position += _FLOAT.size
+            elif argument_type == _ARGUMENT_BYTES:
+                position += 1
+                (length,) = _LENGTH.unpack_from(data, position)
+                bytes_start: int = position + _LENGTH.size
+                position = bytes_start + length
+                args.append(data[bytes_start:position])
+            else:
+                args.append(None if argument_type == _ARGUMENT_NONE else argument_type == _ARGUMENT_TRUE)
+                position += 1
+
+        if args:
+            try:
+                message % tuple(args)
+            except (TypeError, ValueError) as ex:
+                # The text handlers would have reported the error instead of writing the record, keep the template and the arguments
+                message, args = "{} % {!r} (formatting error: {})".format(message, tuple(args), ex), []
+
+        pathname, function_name, line_number = call_sites.get(call_site_id, UNKNOWN_CALLER[:3])
+        record: logging.LogRecord = logging.makeLogRecord(
+            {
+                "name": strings.get(logger_name_id, "(unknown logger)"),
+                "msg": message,
+                "args": tuple(args),
+                "levelno": levelno,
+                "levelname": strings.get(level_name_id, logging.getLevelName(levelno)),
+                "pathname": pathname,
+                "funcName": function_name,
+                "lineno": line_number,
+                "exc_text": exception_text,
+                "stack_info": stack_info,
+            }
+        )
+        record.created = created
+        record.msecs = float(msecs)
+        record.filename = os.path.basename(pathname)
+        record.module = os.path.splitext(record.filename)[0]
+        if context_id in strings:
+            context: BoundContext | None = contexts.get(context_id)
+            if context is None:
+                try:
+                    from .context import BoundContext
+                except ImportError:
+                    from context import BoundContext
+                context = contexts[context_id] = BoundContext.from_json_items(strings[context_id])
+            record._tidy_context = context
+        return record
+
+
+def render_binary_log(file_path: str | Path, output: TextIO, output_format: str = "text") -> BinaryLogReader:
+    """
+    Render a binary log file as the text or ndjson file handlers of TidyLogger would have written it.
+    :param file_path: The path of the binary log file.
+    :param output: The stream the rendered records are written to.
+    :param output_format: 'text' for the indented messages of `IndentedMessageFormatter`, or 'ndjson' for the JSON objects of `JsonLinesFormatter`.
+    :return: The (closed) reader, with the numbers of truncated and corrupted bytes.
+    :raises ValueError: If `output_format` is not supported, or the file is not a binary log file.
+    """
+    if output_format not in ("text", "ndjson"):
+        raise ValueError("`output_format` should be one of 'text', 'ndjson'.")
+    formatter: logging.Formatter = IndentedMessageFormatter() if output_format == "text" else JsonLinesFormatter()
+    with BinaryLogReader(file_path) as reader:
+        for record in reader.records():
+            output.write(formatter.format(record))
+            output.write("\n")
+    return reader
+
+
+def main(arguments: list[str] | None = None) -> int:
+    """The `tidy-logger-decode` command: render binary TidyLogger log files as text or JSON."""
+    # Only imported by the command, not by the handlers
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="tidy-logger-decode", description="Render binary TidyLogger log files (file_format='binary') as text or JSON lines.")
+    parser.add_argument("files", nargs="+", type=Path, help="The binary log files, rendered in the given order.")
+    parser.add_argument("--format", choices=("text", "ndjson"), default="text", help="The output format (default: text, as written by the text file handler).")
+    parser.add_argument("--output", type=Path, default=None, help="The output file (default: stdout).")
+    args = parser.parse_args(arguments)
+
+    exit_code: int = 0
+    output: TextIO = open(args.output, "w", encoding="utf-8") if args.output is not None else sys.stdout
+    try:
+        for file_path in args.files:
+            try:
+                reader: BinaryLogReader = render_binary_log(file_path, output, args.format)
+            except (OSError, ValueError) as ex:
+                print("tidy-logger-decode: {}".format(ex), file=sys.stderr)
+                exit_code = 1
+                continue
+            if reader.truncated_byte_count or reader.corrupted_byte_count:
+                print(
+                    "tidy-logger-decode: {}: skipped {} truncated and {} corrupted bytes.".format(file_path, reader.truncated_byte_count, reader.corrupted_byte_count),
+                    file=sys.stderr,
+                )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import io
+import logging
+import os
+import sys
+import traceback
+
+UNKNOWN_CALLER: tuple[str, int, str, None] = ("(unknown file)", 0, "(unknown function)", None)
+
+# Record fields filled by the caller lookup
+CALLER_FIELDS: tuple[str, ...] = ("pathname", "filename", "module", "funcName", "lineno")
+
+# Whether the frames of a source file are internal to logging (and skipped by `stacklevel`), per file name
+_internal_files: dict[str, bool] = {}
+
+
+def _is_internal_file(filename: str) -> bool:
+    """Same as `logging._is_internal_frame`, memoized per file name, so `os.path.normcase` is not called for every frame of every record."""
+    is_internal = _internal_files.get(filename)
+    if is_internal is None:
+        normalized_filename: str = os.path.normcase(filename)
+        is_internal = _internal_files[filename] = normalized_filename == logging._srcfile or ("importlib" in normalized_filename and "_bootstrap" in normalized_filename)
+    return is_internal
+
+
+def find_caller(stack_info: bool = False, stacklevel: int = 1) -> tuple[str, int, str, str | None]:
+    """
+    Find the source file name, line number and function name of the caller, like `logging.Logger.findCaller`, with memoized internal frame checks.
+    Meant to replace the `findCaller` method of a logger instance (`Logger._log` calls it with the same arguments).
+
+    :param stack_info: Whether to also return the formatted stack of the caller.
+    :param stacklevel: Number of non-logging frames to go up, see `logging.Logger.findCaller`.
+    :return: The file name, line number, function name and stack (or None) of the caller.
+    """
+    f = sys._getframe(0)
+    while stacklevel > 0:
+        next_f = f.f_back
+        if next_f is None:
+            break
+        f = next_f
+        if not _is_internal_file(f.f_code.co_filename):
+            stacklevel -= 1
+    co = f.f_code
+    sinfo = None
+    if stack_info:
+        with io.StringIO() as sio:
+            sio.write("Stack (most recent call last):\n")
+            traceback.print_stack(f, file=sio)
+            sinfo = sio.getvalue()
+            if sinfo[-1] == "\n":
+                sinfo = sinfo[:-1]
+    return co.co_filename, f.f_lineno, co.co_name, sinfo
+
+
+def skip_caller(stack_info: bool = False, stacklevel: int = 1) -> tuple[str, int, str, str | None]:
+    """A `findCaller` replacement that does not walk the stack (unless the stack is requested), for handlers whose formats do not use the caller fields."""
+    if stack_info:
+        return find_caller(stack_info, stacklevel + 1)
+    return UNKNOWN_CALLER
+
+
+def format_uses_caller_fields(fmt: str) -> bool:
+    """Return whether a %-style format string references a caller field (file name, line number, function name)."""
+    return any("%({})".format(field) in fmt for field in CALLER_FIELDS)
+
+
+def formatter_uses_caller_fields(formatter: logging.Formatter | None) -> bool:
+    """
+    Return whether a formatter may use the caller fields of the records.
+    :param formatter: The formatter of a handler. If None, the default formatter of logging (which does not use them) is assumed.
+    :return: The `uses_caller_fields` attribute of the formatter if it has one, otherwise whether its %-style format references a caller field.
+        True for formatters that cannot be inspected (other format styles, or a custom `format` method).
+    """
+    if formatter is None:
+        return False
+    uses_caller_fields: bool | None = getattr(formatter, "uses_caller_fields", None)
+    if uses_caller_fields is not None:
+        return uses_caller_fields
+    if type(formatter).format is not logging.Formatter.format or type(formatter._style) is not logging.PercentStyle:
+        return True
+    return format_uses_caller_fields(formatter._fmt)
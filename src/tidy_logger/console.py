@@ -0,0 +1,142 @@
+import logging
+import os
+import threading
+import weakref
+from typing import TextIO
+
+
+def stream_supports_color(stream: TextIO) -> bool:
+    """
+    Return whether color escape codes should be written to a stream: only if it is a terminal, and the NO_COLOR environment variable (https://no-color.org) is not set.
+    :param stream: The stream, e.g. `sys.stderr`.
+    :return: True if the stream is a terminal and NO_COLOR is not set or empty.
+    """
+    if os.environ.get("NO_COLOR"):
+        return False
+    isatty = getattr(stream, "isatty", None)
+    if isatty is None:
+        return False
+    try:
+        return bool(isatty())
+    except (OSError, ValueError):
+        return False
+
+
+class NonBlockingConsoleHandler(logging.StreamHandler):
+    """A console handler whose writes never block the logging thread, e.g. when stderr is a slow pipe (a container log driver or ssh).
+
+    The formatted records are appended to a bounded buffer, and a background thread writes all the buffered records with a single
+    write and flush. When the buffer is full, new records are dropped and counted, and the number of dropped records is written
+    to the stream with the next records. The writer thread is restarted in the child process after `fork()`.
+    """
+
+    _handlers: "weakref.WeakSet[NonBlockingConsoleHandler]" = weakref.WeakSet()
+
+    def __init__(self, stream: TextIO | None = None, buffer_size: int = 1024 * 1024, flush_timeout: float = 1.0):
+        """
+        Initialize the NonBlockingConsoleHandler.
+        :param stream: The stream to write to. If None, `sys.stderr` is used.
+        :param buffer_size: Maximum number of characters waiting to be written. Records that do not fit are dropped.
+        :param flush_timeout: Maximum number of seconds `flush` and `close` wait for the buffered records to be written.
+        :raises ValueError: If `buffer_size` is not positive.
+        """
+        if buffer_size <= 0:
+            raise ValueError("`buffer_size` should be a positive integer.")
+        super().__init__(stream)
+        self.buffer_size = buffer_size
+        self.flush_timeout = flush_timeout
+        self.dropped_record_count: int = 0
+        self.write_error_count: int = 0
+        self._pending_texts: list[str] = []
+        self._pending_size: int = 0
+        self._unreported_dropped_record_count: int = 0
+        self._is_writing: bool = False
+        self._is_closing: bool = False
+        self._condition = threading.Condition(threading.Lock())
+        self._start_writer_thread()
+        self._handlers.add(self)
+
+    def _start_writer_thread(self) -> None:
+        self._writer_thread = threading.Thread(target=self._write_pending_texts, name="{}-writer".format(type(self).__name__), daemon=True)
+        self._writer_thread.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            text: str = self.format(record) + self.terminator
+            with self._condition:
+                if self._is_closing or self._pending_size + len(text) > self.buffer_size:
+                    self.dropped_record_count += 1
+                    self._unreported_dropped_record_count += 1
+                    self._condition.notify()
+                    return
+                self._pending_texts.append(text)
+                self._pending_size += len(text)
+                if len(self._pending_texts) == 1:
+                    self._condition.notify()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def _write_pending_texts(self) -> None:
+        condition = self._condition
+        while True:
+            with condition:
+                while not self._pending_texts and not self._unreported_dropped_record_count and not self._is_closing:
+                    condition.wait()
+                if not self._pending_texts and not self._unreported_dropped_record_count:
+                    # Closing, and everything is written
+                    condition.notify_all()
+                    return
+                # Coalesce all the pending records into a single write
+                texts: list[str] = self._pending_texts
+                dropped_record_count: int = self._unreported_dropped_record_count
+                self._pending_texts = []
+                self._pending_size = 0
+                self._unreported_dropped_record_count = 0
+                self._is_writing = True
+
+            if dropped_record_count:
+                texts.append("[{} console log record{} dropped]{}".format(dropped_record_count, "s" if dropped_record_count > 1 else "", self.terminator))
+            try:
+                self.stream.write("".join(texts))
+                self.stream.flush()
+            except Exception:
+                self.write_error_count += 1
+
+            with condition:
+                self._is_writing = False
+                condition.notify_all()
+
+    def flush(self) -> None:
+        """Wait (at most `flush_timeout` seconds) until the buffered records are written."""
+        with self._condition:
+            self._condition.wait_for(lambda: not self._pending_texts and not self._is_writing or not self._writer_thread.is_alive(), timeout=self.flush_timeout)
+
+    def close(self) -> None:
+        with self._condition:
+            self._is_closing = True
+            self._condition.notify_all()
+        if self._writer_thread is not threading.current_thread():
+            self._writer_thread.join(self.flush_timeout)
+        super().close()
+        self._handlers.discard(self)
+
+    def _restart_after_fork(self) -> None:
+        # The buffered records are written by the parent process, and the lock of the condition may have been held by one of its threads
+        self._pending_texts = []
+        self._pending_size = 0
+        self._unreported_dropped_record_count = 0
+        self._is_writing = False
+        self._condition = threading.Condition(threading.Lock())
+        self._start_writer_thread()
+
+    @classmethod
+    def _restart_all_after_fork(cls) -> None:
+        for handler in list(cls._handlers):
+            if not handler._is_closing:
+                handler._restart_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=NonBlockingConsoleHandler._restart_all_after_fork)
@@ -0,0 +1,242 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Iterator
+
+if TYPE_CHECKING:
+    from .tidy_logger import TidyLogger
+
+# The record attribute of the bound context of a record, read by the formatters
+CONTEXT_ATTRIBUTE: str = "_tidy_context"
+
+# The context bound with `bound_context` (or `TidyLogger.bind_context`), inherited by the asyncio tasks and the `contextvars.copy_context()` copies created inside it
+current_context: ContextVar["BoundContext | None"] = ContextVar("tidy_logger_context", default=None)
+
+
+class BoundContext:
+    """Fields (e.g. a request id, a tenant and a user) bound to the records of a `BoundLogger`, or of the code running inside `bound_context`.
+
+    The fields are validated and rendered once, when the context is bound: as the fragment appended to the header line of the text format
+    (' {request_id=abc, tenant=acme}'), and as the 'context' object of the JSON format. A nested context only keeps its own fields and
+    a reference to its parent, and extends the rendered fragments of its parent. The values are rendered when they are bound: later changes
+    of a mutable value are not logged.
+    """
+
+    __slots__ = ("parent", "fields", "header_fragment", "json_fragment", "text_items", "json_items", "_combined")
+
+    def __init__(self, fields: dict[str, Any], parent: "BoundContext | None" = None):
+        """
+        Initialize the BoundContext.
+        :param fields: The fields of the context, added to the fields of `parent`, or replacing them.
+        :param parent: The enclosing context, or None.
+        :raises ValueError: If a field name is not an identifier.
+        """
+        for name in fields:
+            if not isinstance(name, str) or not name.isidentifier():
+                raise ValueError("The names of the context fields should be identifiers, got {!r}.".format(name))
+        self.parent = parent
+        self.fields = fields
+        # The last combination of this context with an ambient context, see `combine`
+        self._combined: tuple[BoundContext, BoundContext] | None = None
+
+        if parent is None or not fields.keys() & parent._all_names():
+            # The fields of the parent are rendered once, when the parent was bound
+            items: dict[str, Any] = fields
+            text_prefix: str = "" if parent is None or not parent.text_items else parent.text_items + ", "
+            json_prefix: str = "" if parent is None or not parent.json_items else parent.json_items + ","
+        else:
+            # A replaced field is only rendered once, with its new value
+            items = self.as_dict()
+            text_prefix = json_prefix = ""
+        self.text_items: str = text_prefix + ", ".join("{}={}".format(name, _render_text_value(value)) for name, value in items.items())
+        self.json_items: str = json_prefix + ",".join("{}:{}".format(_encode_json_string(name), _encode_json_value(value)) for name, value in items.items())
+        self.header_fragment: str = " {{{}}}".format(self.text_items) if self.text_items else ""
+        self.json_fragment: str = ',"context":{{{}}}'.format(self.json_items) if self.json_items else ""
+
+    @classmethod
+    def from_json_items(cls, json_items: str) -> "BoundContext":
+        """Create a context from the members of its JSON object (without the braces), e.g. as stored by the binary format."""
+        import json
+
+        return cls(json.loads("{" + json_items + "}"))
+
+    def _all_names(self) -> set[str]:
+        names: set[str] = set()
+        context: BoundContext | None = self
+        while context is not None:
+            names.update(context.fields)
+            context = context.parent
+        return names
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Return the value of a field, looked up in this context then in its parents, or `default` if it is not bound."""
+        context: BoundContext | None = self
+        while context is not None:
+            value = context.fields.get(name, context)
+            if value is not context:
+                return value
+            context = context.parent
+        return default
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all the fields of the context, including the fields of its parents (the fields of the innermost context take precedence)."""
+        contexts: list[BoundContext] = []
+        context: BoundContext | None = self
+        while context is not None:
+            contexts.append(context)
+            context = context.parent
+        fields: dict[str, Any] = {}
+        for context in reversed(contexts):
+            fields.update(context.fields)
+        return fields
+
+    def bind(self, **fields) -> "BoundContext":
+        """Return a nested context with more fields, sharing the fields of this one."""
+        return BoundContext(fields, parent=self)
+
+    def combine(self, ambient_context: "BoundContext") -> "BoundContext":
+        """
+        Return the fields of this context added to an ambient context (see `current_context`), for a record of a `BoundLogger` logged inside `bound_context`.
+        The last combination is cached, as the records of a request are usually logged within the same ambient context.
+        :param ambient_context: The context of the `current_context` variable.
+        :return: The combined context.
+        """
+        combined: tuple[BoundContext, BoundContext] | None = self._combined
+        if combined is not None and combined[0] is ambient_context:
+            return combined[1]
+        context: BoundContext = BoundContext(self.as_dict(), parent=ambient_context)
+        self._combined = (ambient_context, context)
+        return context
+
+    def __repr__(self) -> str:
+        return "{}({!r})".format(type(self).__name__, self.as_dict())
+
+
+def _render_text_value(value: Any) -> str:
+    """Render a field value for the header line, on a single line."""
+    return str(value).replace("\r", "\\r").replace("\n", "\\n")
+
+
+def _encode_json_string(text: str) -> str:
+    import json.encoder
+
+    return json.encoder.encode_basestring(text)
+
+
+def _encode_json_value(value: Any) -> str:
+    import json
+
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class ContextFilter(logging.Filter):
+    """A logger filter that attaches the context of `current_context` to each record, combined with the context of a `BoundLogger` (if any).
+
+    The filter runs on the thread logging the record (before the queue of async mode), so the context is the one of the caller.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        ambient_context: BoundContext | None = current_context.get()
+        if ambient_context is not None:
+            record_fields: dict = record.__dict__
+            bound_context: BoundContext | None = record_fields.get(CONTEXT_ATTRIBUTE)
+            record_fields[CONTEXT_ATTRIBUTE] = ambient_context if bound_context is None else bound_context.combine(ambient_context)
+        return True
+
+
+@contextmanager
+def bound_context(**fields) -> Iterator[BoundContext]:
+    """
+    Bind fields to the records logged inside the `with` block, including by the asyncio tasks created inside it, which inherit the context (without copying it).
+    Nested blocks add their fields to the enclosing context. The records are only given the context by the TidyLoggers with a `ContextFilter`, see `TidyLogger.bind_context`.
+    :param fields: The fields to bind, e.g. `request_id="abc"`.
+    :return: A context manager, which returns the bound context.
+    :raises ValueError: If a field name is not an identifier.
+    """
+    context: BoundContext = BoundContext(fields, parent=current_context.get())
+    token = current_context.set(context)
+    try:
+        yield context
+    finally:
+        current_context.reset(token)
+
+
+class BoundLogger:
+    """A lightweight view of a TidyLogger that adds bound fields to each record, created by `TidyLogger.bind`.
+
+    The fields are rendered once when they are bound (see `BoundContext`), and each record only references the context, through a
+    dictionary of `extra` fields created once per bound logger, so no dictionary is built or merged per call and the formatters append
+    the rendered fragments as they are.
+    """
+
+    __slots__ = ("tidy_logger", "context", "_extra")
+
+    def __init__(self, tidy_logger: "TidyLogger", context: BoundContext):
+        """
+        Initialize the BoundLogger.
+        :param tidy_logger: The TidyLogger the records are logged with.
+        :param context: The context bound to the records.
+        """
+        self.tidy_logger = tidy_logger
+        self.context = context
+        self._extra: dict[str, BoundContext] = {CONTEXT_ATTRIBUTE: context}
+
+    def bind(self, **fields) -> "BoundLogger":
+        """
+        Return a bound logger with more fields, sharing the fields of this one.
+        :param fields: The fields to bind, e.g. `user="bob"`.
+        :return: The new bound logger.
+        :raises ValueError: If a field name is not an identifier.
+        """
+        return BoundLogger(self.tidy_logger, BoundContext(fields, parent=self.context))
+
+    def _prepare(self, kwargs: dict) -> dict:
+        """Add the context to the `extra` fields and the caller's frame to the keyword arguments of a logging call."""
+        # The caller of the bound logger, not of the TidyLogger method
+        kwargs.setdefault("stacklevel", 3)
+        extra: dict | None = kwargs.get("extra")
+        kwargs["extra"] = self._extra if extra is None else dict(extra, **self._extra)
+        return kwargs
+
+    def debug(self, message: str, *args, **kwargs) -> None:
+        """Log a debug message with the bound fields."""
+        self.tidy_logger.debug(message, *args, **self._prepare(kwargs))
+
+    def info(self, message: str, *args, **kwargs) -> None:
+        """Log an info message with the bound fields."""
+        self.tidy_logger.info(message, *args, **self._prepare(kwargs))
+
+    def warning(self, message: str, *args, **kwargs) -> None:
+        """Log a warning message with the bound fields."""
+        self.tidy_logger.warning(message, *args, **self._prepare(kwargs))
+
+    def error(self, message: str, *args, **kwargs) -> None:
+        """Log an error message with the bound fields."""
+        self.tidy_logger.error(message, *args, **self._prepare(kwargs))
+
+    def critical(self, message: str, *args, **kwargs) -> None:
+        """Log a critical message with the bound fields."""
+        self.tidy_logger.critical(message, *args, **self._prepare(kwargs))
+
+    def debug_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
+        """Log a debug message with exception details and the bound fields."""
+        self.tidy_logger.debug_exception(ex, message, *args, **self._prepare(kwargs))
+
+    def info_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
+        """Log an info message with exception details and the bound fields."""
+        self.tidy_logger.info_exception(ex, message, *args, **self._prepare(kwargs))
+
+    def warning_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
+        """Log a warning message with exception details and the bound fields."""
+        self.tidy_logger.warning_exception(ex, message, *args, **self._prepare(kwargs))
+
+    def error_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
+        """Log an error message with exception details and the bound fields."""
+        self.tidy_logger.error_exception(ex, message, *args, **self._prepare(kwargs))
+
+    def critical_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
+        """Log a critical message with exception details and the bound fields."""
+        self.tidy_logger.critical_exception(ex, message, *args, **self._prepare(kwargs))
+
+    def __repr__(self) -> str:
+        return "{}({!r}, {!r})".format(type(self).__name__, self.tidy_logger.logger.name, self.context.as_dict())
@@ -0,0 +1,28 @@
+import os
+
+try:
+    from .handler_classes import mixin_handler_class
+except ImportError:
+    from handler_classes import mixin_handler_class
+
+
+class DirectoryCreatingHandlerMixin:
+    """A mixin for file handlers opened on the first record (`delay=True`), which creates the directory of the log file when the file is opened.
+
+    With `delay=True`, `logging.FileHandler` only opens the file when the first record is emitted, but the directory still has to exist
+    beforehand. Here the directory is created with the file (and again after a rollover, if it was removed), so a program that logs
+    nothing to the file never touches the file system.
+    """
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+def directory_creating_handler_class(handler_class: type) -> type:
+    """
+    Return a subclass of a file handler class that creates the directory of the log file when the file is opened, see `DirectoryCreatingHandlerMixin`.
+    :param handler_class: The file handler class, e.g. `logging.FileHandler`.
+    :return: The class combining `DirectoryCreatingHandlerMixin` and `handler_class`, created once per handler class.
+    """
+    return mixin_handler_class(DirectoryCreatingHandlerMixin, handler_class)
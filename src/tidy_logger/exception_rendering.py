@@ -0,0 +1,202 @@
+import traceback
+from types import TracebackType
+
+# Same as traceback._RECURSIVE_CUTOFF: identical consecutive frames after this many are summarized
+RECURSIVE_CUTOFF: int = 3
+
+# Formatted frames, keyed by the code object and the position in it (the text of a frame only depends on these)
+_frame_cache: dict[tuple, tuple[str, dict]] = {}
+FRAME_CACHE_SIZE: int = 4096
+
+
+def _format_frame(tb: TracebackType) -> tuple[str, dict]:
+    """Return the text (as `traceback.format_tb` formats it) and the dictionary (for `exception_to_dict`) of the first frame of a traceback, memoized."""
+    key = (tb.tb_frame.f_code, tb.tb_lasti, tb.tb_lineno)
+    formatted_frame = _frame_cache.get(key)
+    if formatted_frame is None:
+        stack_summary: traceback.StackSummary = traceback.extract_tb(tb, limit=1)
+        frame_summary: traceback.FrameSummary = stack_summary[0]
+        frame_text: str = stack_summary.format()[0]
+        frame_dict: dict = {"file": frame_summary.filename, "line": frame_summary.lineno, "function": frame_summary.name, "code": frame_summary.line}
+        if len(_frame_cache) >= FRAME_CACHE_SIZE:
+            _frame_cache.clear()
+        formatted_frame = _frame_cache[key] = (frame_text, frame_dict)
+    return formatted_frame
+
+
+def format_traceback(tb: TracebackType | None) -> str:
+    """
+    Format a traceback like `"".join(traceback.format_tb(tb))`, including the summary of repeated frames, with the text of each frame memoized.
+    :param tb: The traceback to format.
+    :return: The formatted traceback.
+    """
+    lines: list[str] = []
+    last_key: tuple | None = None
+    count: int = 0
+    while tb is not None:
+        key = (tb.tb_frame.f_code, tb.tb_lineno)
+        if key != last_key:
+            if count > RECURSIVE_CUTOFF:
+                count -= RECURSIVE_CUTOFF
+                lines.append(f"  [Previous line repeated {count} more time{'s' if count > 1 else ''}]\n")
+            last_key = key
+            count = 0
+        count += 1
+        if count <= RECURSIVE_CUTOFF:
+            lines.append(_format_frame(tb)[0])
+        tb = tb.tb_next
+    if count > RECURSIVE_CUTOFF:
+        count -= RECURSIVE_CUTOFF
+        lines.append(f"  [Previous line repeated {count} more time{'s' if count > 1 else ''}]\n")
+    return "".join(lines)
+
+
+def _count_chained_exceptions(ex: BaseException, seen: set[int]) -> int:
+    """Count the exceptions in the cause/context chain of an exception (including itself), stopping at already seen exceptions."""
+    count: int = 0
+    visited: set[int] = set()
+    current: BaseException | None = ex
+    while current is not None and id(current) not in seen and id(current) not in visited:
+        visited.add(id(current))
+        count += 1
+        current = current.__cause__ or current.__context__
+    return count
+
+
+class ExceptionRenderer:
+    """Render exception details, including chained exceptions and ExceptionGroup contents, as indented text.
+
+    The exception tree is walked iteratively with an explicit stack, so deep `raise ... from` chains do not hit the recursion limit.
+    Exceptions that were already rendered (e.g. cycles in the chain) are only referenced, the chain depth and the number of rendered
+    exceptions of a group are capped with "... N more" summaries, and the text of the frames is memoized.
+    """
+
+    def __init__(self, indentation: str = "    ", max_depth: int = 64, max_group_exceptions: int = 100):
+        """
+        Initialize the ExceptionRenderer.
+        :param indentation: The string to use for one level of indentation.
+        :param max_depth: Maximum nesting level of chained and grouped exceptions. Deeper exceptions are summarized.
+        :param max_group_exceptions: Maximum number of rendered exceptions of an ExceptionGroup. The remaining exceptions are summarized.
+        """
+        self.indentation = indentation
+        self.max_depth = max_depth
+        self.max_group_exceptions = max_group_exceptions
+
+    def render(self, ex: BaseException, level: int = 0, exception_type_header: str = "Exception", indentation: str | None = None) -> str:
+        """
+        Render the details of an exception.
+        :param ex: The exception to render.
+        :param level: The indentation level of the exception.
+        :param exception_type_header: The header of the exception type line, e.g. 'Exception 2' for the second exception of a group.
+        :param indentation: The string to use for one level of indentation. If None, the indentation of the renderer is used.
+        :return: A formatted string containing the exception details.
+        """
+        if indentation is None:
+            indentation = self.indentation
+
+        message_lines: list[str] = []
+        seen: set[int] = set()
+        # Items are either lines, or (exception, level, exception type header) tuples still to be rendered
+        stack: list[str | tuple[BaseException, int, str]] = [(ex, level, exception_type_header)]
+
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                message_lines.append(item)
+                continue
+
+            current, current_level, header = item
+            indent: str = indentation * current_level
+
+            if id(current) in seen:
+                message_lines.append("{}– {}: {} (already shown above)".format(indent, header, type(current).__name__))
+                continue
+            if current_level - level > self.max_depth:
+                num_exceptions: int = _count_chained_exceptions(current, seen)
+                message_lines.append("{}– ... {} more chained exception{} (maximum depth reached)".format(indent, num_exceptions, "s" if num_exceptions > 1 else ""))
+                continue
+            seen.add(id(current))
+
+            continuation: str = "\n" + indent + " " * (len(header) + 2 + 1)
+            message_lines.append("{}– {}: {}".format(indent, header, type(current).__name__))
+            message_lines.append("{}  {}  {}".format(indent, "Message:".ljust(len(header)), str(current).replace("\n", continuation)))
+            traceback_text: str = format_traceback(current.__traceback__).lstrip().rstrip("\n")
+            message_lines.append("{}  {} {}".format(indent, "Traceback:".ljust(len(header)), traceback_text.replace("\n", continuation)))
+
+            # Pushed in reverse order: the chained exception is rendered before the exceptions of the group
+            if isinstance(current, ExceptionGroup):
+                num_exceptions: int = len(current.exceptions)
+                inner_items: list[str | tuple[BaseException, int, str]] = [f"{indent}  Contains {num_exceptions} exception{'s' if num_exceptions > 1 else ''}:"]
+                for i, inner in enumerate(current.exceptions[: self.max_group_exceptions], start=1):
+                    inner_items.append((inner, current_level + 1, "Exception {}".format(i)))
+                if num_exceptions > self.max_group_exceptions:
+                    num_more: int = num_exceptions - self.max_group_exceptions
+                    inner_items.append("{}– ... {} more exception{}".format(indentation * (current_level + 1), num_more, "s" if num_more > 1 else ""))
+                stack.extend(reversed(inner_items))
+
+            # Explicit chained exception: raise X from Y
+            if current.__cause__:
+                stack.append((current.__cause__, current_level + 1, "Exception"))
+                stack.append(f"{indent}  Caused by:")
+            # Implicit chained exception
+            elif current.__context__:
+                stack.append((current.__context__, current_level + 1, "Exception"))
+                stack.append(f"{indent}  In Context:")
+
+        return "\n".join(message_lines)
+
+
+def exception_to_dict(ex: BaseException, max_depth: int = 64, max_group_exceptions: int = 100) -> dict:
+    """
+    Build a JSON-serializable tree of an exception, including chained exceptions and ExceptionGroup contents.
+    The tree is built iteratively (with an explicit stack), so deep exception chains do not hit the recursion limit.
+    Like `ExceptionRenderer`, an explicit cause (`raise X from Y`) takes precedence over the implicit context, and the depth and the group size are capped.
+
+    :param ex: The exception to convert.
+    :param max_depth: Maximum nesting level of chained and grouped exceptions. Deeper exceptions are summarized with a 'more' count.
+    :param max_group_exceptions: Maximum number of exceptions of an ExceptionGroup in the tree. The number of the remaining exceptions is given as 'more_exceptions'.
+    :return: A dictionary with the keys 'type', 'message' and 'frames', and optionally 'cause', 'context' and 'exceptions'.
+    """
+    root: dict = {}
+    stack: list[tuple[BaseException, dict, int]] = [(ex, root, 0)]
+    seen: set[int] = set()
+
+    while stack:
+        current, node, depth = stack.pop()
+        node["type"] = type(current).__qualname__
+        node["message"] = str(current)
+
+        if id(current) in seen:
+            # Exception chains can contain cycles
+            node["repeated"] = True
+            continue
+        if depth > max_depth:
+            node["more"] = _count_chained_exceptions(current, seen)
+            continue
+        seen.add(id(current))
+
+        frames: list[dict] = []
+        tb: TracebackType | None = current.__traceback__
+        while tb is not None:
+            frames.append(_format_frame(tb)[1])
+            tb = tb.tb_next
+        node["frames"] = frames
+
+        # Explicit chained exception: raise X from Y
+        if current.__cause__:
+            node["cause"] = {}
+            stack.append((current.__cause__, node["cause"], depth + 1))
+        # Implicit chained exception
+        elif current.__context__:
+            node["context"] = {}
+            stack.append((current.__context__, node["context"], depth + 1))
+
+        # Python 3.11+ ExceptionGroup support
+        if isinstance(current, ExceptionGroup):
+            inner_exceptions = current.exceptions[:max_group_exceptions]
+            node["exceptions"] = [{} for _ in inner_exceptions]
+            if len(current.exceptions) > max_group_exceptions:
+                node["more_exceptions"] = len(current.exceptions) - max_group_exceptions
+            stack.extend((inner, inner_node, depth + 1) for inner, inner_node in zip(reversed(inner_exceptions), reversed(node["exceptions"])))
+
+    return root
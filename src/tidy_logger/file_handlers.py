@@ -0,0 +1,407 @@
+import gzip
+import locale
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from logging.handlers import BaseRotatingHandler, RotatingFileHandler
+from pathlib import Path
+from typing import Callable
+
+
+class BatchedWriteMixin:
+    """A mixin for file handlers that accumulates the encoded records in a preallocated buffer instead of writing and flushing the stream for every record.
+
+    The buffer is written to the file with a single `write` call when it is full, when `flush_interval` seconds have passed since the last write,
+    or immediately when a record at `flush_level` or above arrives. It is also written on `flush()` and `close()`, which `logging.shutdown()` calls at interpreter exit.
+    """
+
+    def __init__(self, *args, buffer_size: int = 64 * 1024, flush_interval: float = 1.0, flush_level: int = logging.ERROR, **kwargs):
+        """
+        Initialize the batched write handler. The positional and the other keyword arguments are passed to the file handler.
+        :param buffer_size: Size of the write buffer in bytes.
+        :param flush_interval: Maximum number of seconds a record stays in the buffer. If 0 or negative, the buffer is only written when it is full or on flush-level records.
+        :param flush_level: Records at this level or above are written immediately, together with the buffered records.
+        :raises ValueError: If `buffer_size` is not positive.
+        """
+        if buffer_size <= 0:
+            raise ValueError("`buffer_size` should be a positive integer.")
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.bytes_written: int = 0
+        self.flush_count: int = 0
+        self._buffer = bytearray(buffer_size)
+        self._buffer_view = memoryview(self._buffer)
+        self._buffer_length: int = 0
+        self._last_flush_time: float = time.monotonic()
+        self._stream_size: int = 0
+        super().__init__(*args, **kwargs)
+        encoding: str | None = self.encoding
+        self._byte_encoding: str = locale.getpreferredencoding(False) if encoding in (None, "locale") else encoding
+        self._byte_errors: str = self.errors or "strict"
+
+        self._stop_event = threading.Event()
+        self._flush_thread: threading.Thread | None = None
+        if flush_interval > 0:
+            self._flush_thread = threading.Thread(target=self._flush_periodically, name="{}-flush".format(type(self).__name__), daemon=True)
+            self._flush_thread.start()
+
+    def _open(self):
+        """Open the file in binary mode without Python-level buffering, the handler does its own buffering."""
+        mode: str = self.mode if "b" in self.mode else self.mode + "b"
+        stream = open(self.baseFilename, mode, buffering=0)
+        self._stream_size = stream.seek(0, os.SEEK_END)
+        return stream
+
+    def _flush_periodically(self) -> None:
+        while not self._stop_event.wait(self.flush_interval):
+            with self.lock:
+                if self._buffer_length and time.monotonic() - self._last_flush_time >= self.flush_interval:
+                    self._write_buffer()
+
+    def _write_buffer(self) -> None:
+        """Write the buffered bytes to the file with a single write call. Must be called with the handler lock held."""
+        if self._buffer_length and self.stream is not None:
+            self._write_bytes(self._buffer_view[: self._buffer_length])
+        self._buffer_length = 0
+        self._last_flush_time = time.monotonic()
+
+    def _write_bytes(self, data) -> None:
+        size: int = len(data)
+        written: int = 0
+        while written < size:
+            written += self.stream.write(data[written:])
+        self._stream_size += size
+        self.bytes_written += size
+        self.flush_count += 1
+
+    def _should_rollover_batched(self, record: logging.LogRecord, data_size: int) -> bool:
+        """Return whether the file should be rolled over before writing the record of `data_size` bytes. Batched handlers without rotation never roll over."""
+        return False
+
+    def doRollover(self) -> None:
+        """Write the buffered records to the current file before it is rotated."""
+        self._write_buffer()
+        super().doRollover()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            data: bytes = (self.format(record) + self.terminator).encode(self._byte_encoding, self._byte_errors)
+            if self.stream is None:
+                if self.mode != "w" or not self._closed:
+                    self.stream = self._open()
+                else:
+                    return
+            if self._should_rollover_batched(record, len(data)):
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+
+            data_size: int = len(data)
+            if self._buffer_length + data_size > self.buffer_size:
+                self._write_buffer()
+            if data_size > self.buffer_size:
+                # Larger than the whole buffer: written directly
+                self._write_bytes(data)
+                self._last_flush_time = time.monotonic()
+            else:
+                start: int = self._buffer_length
+                end: int = start + data_size
+                self._buffer[start:end] = data
+                self._buffer_length = end
+
+            if record.levelno >= self.flush_level or (self.flush_interval > 0 and time.monotonic() - self._last_flush_time >= self.flush_interval):
+                self._write_buffer()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        with self.lock:
+            self._write_buffer()
+
+    def close(self) -> None:
+        self._stop_event.set()
+        if self._flush_thread is not None and self._flush_thread is not threading.current_thread():
+            self._flush_thread.join()
+        with self.lock:
+            self._write_buffer()
+        super().close()
+
+
+class BatchedFileHandler(BatchedWriteMixin, logging.FileHandler):
+    """A `logging.FileHandler` that writes the records in batches."""
+
+
+class BatchedRotatingFileHandler(BatchedWriteMixin, RotatingFileHandler):
+    """A `logging.handlers.RotatingFileHandler` that writes the records in batches. The size check includes the buffered bytes, and the records are formatted once."""
+
+    def _should_rollover_batched(self, record: logging.LogRecord, data_size: int) -> bool:
+        if self.maxBytes <= 0:
+            return False
+        pending_size: int = self._stream_size + self._buffer_length
+        if not pending_size:
+            return False
+        if pending_size + data_size >= self.maxBytes:
+            # See RotatingFileHandler.shouldRollover: special files are never rolled over
+            return not (os.path.exists(self.baseFilename) and not os.path.isfile(self.baseFilename))
+        return False
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        return self._should_rollover_batched(record, 0)
+
+
+def zstd_open(file_path: str | Path, mode: str):
+    """Open a zstd-compressed file, using the standard library module (Python 3.14+) or the `zstandard` package. Raises ImportError if neither is available."""
+    try:
+        from compression import zstd
+
+        return zstd.open(file_path, mode)
+    except ImportError:
+        import zstandard
+
+        return zstandard.open(file_path, mode)
+
+
+class TimedSizeRotatingFileHandler(BaseRotatingHandler):
+    """A file handler that rotates the log file hourly or at midnight, when it reaches a maximum size, or on whichever comes first.
+
+    On a time-based rollover, the name of the log file is recomputed (e.g. to get the new date suffix). If the name has not changed,
+    the current file is renamed to a backup with a timestamp suffix, like on a size-based rollover.
+    Rotated files are optionally compressed, and old backups are removed, on a background thread.
+    """
+
+    WHEN_VALUES: tuple[str, ...] = ("hourly", "midnight")
+    COMPRESSION_SUFFIXES: dict[str, str] = {"gzip": ".gz", "zstd": ".zst"}
+
+    def __init__(
+        self,
+        file_name_factory: Callable[[datetime], str | Path],
+        when: str | None = "midnight",
+        max_bytes: int = 0,
+        backup_count: int = 0,
+        compression: str | None = None,
+        mode: str = "a",
+        encoding: str | None = None,
+        delay: bool = False,
+        errors: str | None = None,
+    ):
+        """
+        Initialize the TimedSizeRotatingFileHandler.
+        :param file_name_factory: A callable that returns the path of the log file for a given time. It is called at initialization and on every time-based rollover.
+        :param when: 'hourly' or 'midnight' for time-based rotation, or None for size-based rotation only.
+        :param max_bytes: Maximum size in bytes of the log file before rotation. If 0, the file is not rotated by size.
+        :param backup_count: Number of backup files to keep. If 0, backups are never removed.
+        :param compression: 'gzip' or 'zstd' to compress the rotated files on a background thread, or None to keep them uncompressed.
+        :param mode: Mode to open the log file.
+        :param encoding: Encoding of the log file.
+        :param delay: Whether to open the log file on the first record.
+        :param errors: How encoding errors are handled.
+        :raises ValueError: If `when` or `compression` is not supported, if neither time nor size rotation is enabled, or if zstd compression is requested but not available.
+        """
+        if when is not None and when not in self.WHEN_VALUES:
+            raise ValueError("`when` should be one of {}, or None.".format(", ".join(f"'{w}'" for w in self.WHEN_VALUES)))
+        if when is None and max_bytes <= 0:
+            raise ValueError("Either `when` or a positive `max_bytes` should be specified.")
+        if compression is not None and compression not in self.COMPRESSION_SUFFIXES:
+            raise ValueError("`compression` should be one of {}, or None.".format(", ".join(f"'{c}'" for c in self.COMPRESSION_SUFFIXES)))
+        if compression == "zstd":
+            try:
+                from compression import zstd  # noqa: F401
+            except ImportError:
+                try:
+                    import zstandard  # noqa: F401
+                except ImportError:
+                    raise ValueError("zstd compression requires Python 3.14+ or the 'zstandard' package.")
+
+        self.file_name_factory = file_name_factory
+        self.when = when
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compression = compression
+        self.rollover_count: int = 0
+        self._jobs: queue.Queue | None = None
+        self._worker: threading.Thread | None = None
+
+        now: float = time.time()
+        file_path: Path = Path(file_name_factory(datetime.fromtimestamp(now)))
+        if not delay:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(file_path, mode, encoding=encoding, delay=delay, errors=errors)
+        self.next_rollover_time: float | None = self._compute_next_rollover_time(now)
+        self._backup_name_pattern: re.Pattern | None = self._create_backup_name_pattern() if backup_count > 0 else None
+
+    def _create_backup_name_pattern(self) -> re.Pattern:
+        """
+        Return the pattern of the names of the backups: the rotated files of the current log file name, and the files of the previous periods (e.g. with another date suffix) with their rotated files.
+        The part of the name that depends on the time is found by comparing the names for two times whose fields all differ in their first and last digits.
+        """
+        first_name: str = Path(self.file_name_factory(datetime(1999, 12, 31, 23, 59, 59))).name
+        second_name: str = Path(self.file_name_factory(datetime(2000, 2, 2, 12, 12, 12))).name
+        if first_name == second_name:
+            return re.compile(re.escape(first_name) + r"\..+")
+        prefix_length: int = len(os.path.commonprefix([first_name, second_name]))
+        suffix_length: int = min(len(os.path.commonprefix([first_name[::-1], second_name[::-1]])), len(first_name) - prefix_length, len(second_name) - prefix_length)
+        prefix: str = first_name[:prefix_length]
+        suffix_start: int = len(first_name) - suffix_length
+        suffix: str = first_name[suffix_start:]
+        # Only digits and separators in the time part, so the files of other logs sharing the prefix are not matched
+        return re.compile(r"{}[0-9_-]+{}(?:\..+)?".format(re.escape(prefix), re.escape(suffix)))
+
+    def _compute_next_rollover_time(self, current_time: float) -> float | None:
+        if self.when is None:
+            return None
+        current = datetime.fromtimestamp(current_time)
+        if self.when == "hourly":
+            next_rollover = current.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        else:
+            next_rollover = datetime.combine(current.date() + timedelta(days=1), datetime.min.time())
+        return next_rollover.timestamp()
+
+    def _rollover_due(self, created: float, pending_size: int, data_size: int) -> bool:
+        if self.next_rollover_time is not None and created >= self.next_rollover_time:
+            return True
+        if self.max_bytes > 0 and pending_size and pending_size + data_size >= self.max_bytes:
+            # See RotatingFileHandler.shouldRollover: special files are never rolled over
+            return not (os.path.exists(self.baseFilename) and not os.path.isfile(self.baseFilename))
+        return False
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.next_rollover_time is not None and record.created >= self.next_rollover_time:
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            return self._rollover_due(record.created, self.stream.tell(), len(self.format(record)) + len(self.terminator))
+        return False
+
+    def _backup_file_name(self, now: datetime) -> str:
+        backup_file_name: str = "{}.{}".format(self.baseFilename, now.strftime("%Y%m%d-%H%M%S"))
+        counter: int = 1
+        while any(os.path.exists(backup_file_name + suffix) for suffix in ("", ".gz", ".zst")):
+            backup_file_name = "{}.{}-{}".format(self.baseFilename, now.strftime("%Y%m%d-%H%M%S"), counter)
+            counter += 1
+        return backup_file_name
+
+    def doRollover(self) -> None:
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        current_time: float = time.time()
+        now = datetime.fromtimestamp(current_time)
+        new_file_path: str = os.path.abspath(self.file_name_factory(now))
+        current_file_path: str = self.baseFilename
+
+        if new_file_path == current_file_path:
+            # Same name (e.g. size-based rollover, or no date suffix): the current file becomes a backup
+            rotated_file_path: str = self.rotation_filename(self._backup_file_name(now))
+            self.rotate(current_file_path, rotated_file_path)
+        else:
+            # The name has changed (e.g. new date suffix): the previous file is kept as is
+            rotated_file_path: str = current_file_path
+            Path(new_file_path).parent.mkdir(parents=True, exist_ok=True)
+            self.baseFilename = new_file_path
+
+        if self.when is not None:
+            self.next_rollover_time = self._compute_next_rollover_time(current_time)
+        self.rollover_count += 1
+
+        if self.compression is not None or self.backup_count > 0:
+            self._submit_job(rotated_file_path)
+
+        if not self.delay:
+            self.stream = self._open()
+
+    def _submit_job(self, rotated_file_path: str) -> None:
+        """Compress the rotated file and remove old backups on the background thread, so the logging thread does not wait for them."""
+        if self._worker is None:
+            self._jobs = queue.Queue()
+            self._worker = threading.Thread(target=self._process_jobs, name="{}-compression".format(type(self).__name__), daemon=True)
+            self._worker.start()
+        self._jobs.put((rotated_file_path, self.baseFilename))
+
+    def _process_jobs(self) -> None:
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is None:
+                    break
+                rotated_file_path, current_file_path = job
+                if self.compression is not None and os.path.exists(rotated_file_path):
+                    self.compress_file(rotated_file_path, self.compression)
+                if self.backup_count > 0:
+                    self._remove_old_backups(current_file_path)
+            except Exception:
+                # There is no record to report the error for, see logging.Handler.handleError
+                if logging.raiseExceptions:
+                    import traceback
+
+                    traceback.print_exc()
+            finally:
+                self._jobs.task_done()
+
+    @classmethod
+    def compress_file(cls, file_path: str | Path, compression: str) -> Path:
+        """
+        Compress a file and remove the uncompressed file. The compressed file is written under a temporary name first, so a partially compressed file is never left behind under the final name.
+        :param file_path: The file to compress.
+        :param compression: 'gzip' or 'zstd'.
+        :return: The path of the compressed file.
+        """
+        file_path = Path(file_path)
+        compressed_file_path: Path = file_path.with_name(file_path.name + cls.COMPRESSION_SUFFIXES[compression])
+        temporary_file_path: Path = compressed_file_path.with_name(compressed_file_path.name + ".tmp")
+        opener = gzip.open if compression == "gzip" else zstd_open
+        with open(file_path, "rb") as source, opener(temporary_file_path, "wb") as destination:
+            shutil.copyfileobj(source, destination, 1024 * 1024)
+        os.replace(temporary_file_path, compressed_file_path)
+        file_path.unlink()
+        return compressed_file_path
+
+    def _remove_old_backups(self, current_file_path: str) -> None:
+        """Remove the oldest backups of the current log file, including the files of the previous periods, keeping `backup_count` of them."""
+        current_file = Path(current_file_path)
+        # The log file may have changed again since the job was submitted
+        current_file_names: tuple[str, ...] = (current_file.name, os.path.basename(self.baseFilename))
+        backups: list[Path] = [
+            p
+            for p in current_file.parent.iterdir()
+            if p.name not in current_file_names and self._backup_name_pattern.fullmatch(p.name) is not None and not p.name.endswith((".tmp", ".idx"))
+        ]
+        if len(backups) > self.backup_count:
+            backups.sort(key=lambda p: (p.stat().st_mtime, p.name))
+            for backup in backups[: len(backups) - self.backup_count]:
+                try:
+                    backup.unlink()
+                except OSError:
+                    pass
+
+    def wait_for_background_jobs(self) -> None:
+        """Block until the pending compressions and backup removals are done."""
+        if self._jobs is not None:
+            self._jobs.join()
+
+    def close(self) -> None:
+        super().close()
+        if self._worker is not None:
+            self._jobs.put(None)
+            self._worker.join()
+            self._worker = None
+            self._jobs = None
+
+
+class BatchedTimedSizeRotatingFileHandler(BatchedWriteMixin, TimedSizeRotatingFileHandler):
+    """A `TimedSizeRotatingFileHandler` that writes the records in batches. The size check includes the buffered bytes, and the records are formatted once."""
+
+    def _should_rollover_batched(self, record: logging.LogRecord, data_size: int) -> bool:
+        return self._rollover_due(record.created, self._stream_size + self._buffer_length, data_size)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        return self._should_rollover_batched(record, 0)
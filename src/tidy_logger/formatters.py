@@ -1,4 +1,107 @@
+import itertools
 import logging
+import os
+import re
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+
+try:
+    from .caller import format_uses_caller_fields
+    from .messages import LazyExceptionMessage
+except ImportError:
+    from caller import format_uses_caller_fields
+    from messages import LazyExceptionMessage
+
+if TYPE_CHECKING:
+    from .context import BoundContext
+    from .redaction import Redactor
+
+
+def _utf8_size(text: str) -> int:
+    """Return the size of a text in bytes once encoded in UTF-8, without encoding it if it is ASCII."""
+    return len(text) if text.isascii() else len(text.encode("utf-8", "surrogatepass"))
+
+
+class MessageSizeLimit:
+    """A cap on the size of the interpolated messages, shared by the formatters of a logger.
+
+    An oversized message is replaced by an excerpt of its head and tail with the number of omitted bytes ('truncate'),
+    or by an excerpt of its head and the path of a side file containing the whole message ('spill'). The result is cached
+    on the record, so the formatters of all the handlers write the same text and a message is spilled only once.
+    """
+
+    POLICIES: tuple[str, ...] = ("truncate", "spill")
+
+    def __init__(self, max_size: int, policy: str = "truncate", spill_directory: str | os.PathLike | None = None, excerpt_size: int | None = None):
+        """
+        Initialize the MessageSizeLimit.
+        :param max_size: Maximum number of characters of a message. Longer messages are truncated or spilled.
+        :param policy: 'truncate' to keep the head and the tail of oversized messages, or 'spill' to write them to a side file in `spill_directory`.
+        :param spill_directory: The directory of the side files, created on the first spilled message (only if `policy` is 'spill').
+        :param excerpt_size: Number of characters kept from the head (and from the tail, when truncating). If None, half of `max_size`.
+        :raises ValueError: If `max_size` or `excerpt_size` is not positive, if `policy` is not supported, or if `spill_directory` is missing with the 'spill' policy.
+        """
+        if max_size <= 0:
+            raise ValueError("`max_size` should be a positive integer.")
+        if policy not in self.POLICIES:
+            raise ValueError("`policy` should be one of {}.".format(", ".join(f"'{p}'" for p in self.POLICIES)))
+        if policy == "spill" and spill_directory is None:
+            raise ValueError("`spill_directory` should be specified with the 'spill' policy.")
+        if excerpt_size is not None and excerpt_size <= 0:
+            raise ValueError("`excerpt_size` should be a positive integer.")
+        self.max_size = max_size
+        self.policy = policy
+        self.spill_directory: str | None = None if spill_directory is None else os.fspath(spill_directory)
+        self.excerpt_size: int = max(1, max_size // 2) if excerpt_size is None else excerpt_size
+        self.truncated_count: int = 0
+        self.spilled_count: int = 0
+        self._spill_numbers = itertools.count(1)
+
+    def apply(self, record: logging.LogRecord, message: str) -> str:
+        """
+        Return the message of a record, truncated or spilled if it is longer than `max_size`.
+        :param record: The record, which caches the result.
+        :param message: The interpolated message of the record.
+        :return: The message, or its excerpt.
+        """
+        if len(message) <= self.max_size:
+            return message
+        # Cached per limit and per message: the text formats limit the message with the exception details, the JSON format limits it without them
+        limited_messages: list[tuple[MessageSizeLimit, str, str]] | None = record.__dict__.get("_tidy_limited_messages")
+        if limited_messages is None:
+            limited_messages = record._tidy_limited_messages = []
+        else:
+            for limit, limited_original, limited_result in limited_messages:
+                if limit is self and limited_original is message:
+                    return limited_result
+        limited_message: str | None = None
+        if self.policy == "spill":
+            limited_message = self._spill(record, message)
+        if limited_message is None:
+            excerpt_size: int = self.excerpt_size
+            head: str = message[:excerpt_size]
+            tail: str = message[-excerpt_size:]
+            # Not computed from a slice of the omitted part, which would copy most of the message
+            total_size: int = _utf8_size(message)
+            omitted_size: int = total_size - _utf8_size(head) - _utf8_size(tail)
+            limited_message = "{}\n[... {:,} of {:,} bytes truncated ...]\n{}".format(head, omitted_size, total_size, tail)
+            self.truncated_count += 1
+        limited_messages.append((self, message, limited_message))
+        return limited_message
+
+    def _spill(self, record: logging.LogRecord, message: str) -> str | None:
+        """Write the whole message to a side file, and return its excerpt with the path of the file. Return None if the file cannot be written."""
+        file_name: str = "{}_{}_{}.txt".format(time.strftime("%Y%m%d-%H%M%S", time.localtime(record.created)), record.process, next(self._spill_numbers))
+        spill_file_path: str = os.path.join(self.spill_directory, file_name)
+        try:
+            os.makedirs(self.spill_directory, exist_ok=True)
+            with open(spill_file_path, "w", encoding="utf-8", errors="backslashreplace") as spill_file:
+                spill_file.write(message)
+        except OSError:
+            # Truncated instead, the record is still written
+            return None
+        self.spilled_count += 1
+        return "{}\n[... message of {:,} bytes written to {}]".format(message[: self.excerpt_size], _utf8_size(message), spill_file_path)
 
 
 class IndentedMessageFormatter(logging.Formatter):
@@ -6,7 +109,37 @@ class IndentedMessageFormatter(logging.Formatter):
     default_logging_format: str = "%(asctime)s | %(levelname)s | %(filename)s %(funcName)s() (line: %(lineno)d) [%(name)s]:\n%(message)s"
     default_date_format: str = "%d/%m/%Y %H:%M:%S"
 
-    def __init__(self, fmt: str = None, date_format: str = None, indentation: str = "   "):
+    # The default format compiled by the formatter, with the fragment of the bound context of the record (e.g. ' {request_id=abc, tenant=acme}', or an empty string,
+    # see `context.BoundContext`) at the end of the header line. `default_logging_format` has no `context` field, so it can still be used by `logging.Formatter`
+    _default_context_logging_format: str = default_logging_format.replace("]:\n", "]%(context)s:\n")
+
+    # A '%%' escape, or a '%(field)spec' placeholder (see logging.PercentStyle.validation_pattern)
+    _format_field_pattern: re.Pattern = re.compile(r"%%|%\((?P<field>\w+)\)(?P<spec>[#0+ -]*\d*(?:\.\d+)?[diouxefgcrsa])", re.I)
+
+    # Replaces the message when the format is rendered without it, see `iter_format`
+    _message_placeholder: str = "\x00tidy-message\x00"
+
+    # The functions compiled by `_compile_format`, per format string, so creating a formatter does not call the compiler again
+    _compiled_formats: dict[str, Callable[[logging.LogRecord, str | None, str, str], str]] = {}
+
+    def __init__(
+        self,
+        fmt: str = None,
+        date_format: str = None,
+        indentation: str = "   ",
+        message_limit: MessageSizeLimit | None = None,
+        chunk_size: int = 64 * 1024,
+        redactor: "Redactor | None" = None,
+    ):
+        """
+        Initialize the IndentedMessageFormatter.
+        :param fmt: The %-style format of the records, which can use the `context` field for the bound context of the record. If None, `default_logging_format` is used, with the bound context at the end of the header line.
+        :param date_format: The format of `asctime`. If None, `default_date_format` is used.
+        :param indentation: The prefix of each line of the message.
+        :param message_limit: The cap on the size of the messages, or None to write the messages whole.
+        :param chunk_size: Approximate number of characters of the message in each text returned by `iter_format`.
+        :param redactor: The redaction of the secrets in the messages and exception texts, or None to write them as they are.
+        """
         if fmt is None:
             fmt = self.default_logging_format
         if date_format is None:
@@ -15,35 +148,374 @@ class IndentedMessageFormatter(logging.Formatter):
         if indentation is None:
             indentation = ""
         self.indentation = indentation
+        self.message_limit = message_limit
+        self.chunk_size = chunk_size
+        self.redactor = redactor
+        # Formatters with the same indentation but different limits or redactions must not share the cached indented message
+        self._indented_message_key: str | tuple = indentation if message_limit is None and redactor is None else (indentation, message_limit, redactor)
+        self._render: Callable[[logging.LogRecord, str | None, str, str], str] = self._compile_format(
+            self._default_context_logging_format if self._fmt == self.default_logging_format else self._fmt
+        )
+        self._uses_time: bool = self.usesTime()
+        self.uses_caller_fields: bool = format_uses_caller_fields(self._fmt)
+        self._cached_time: tuple[int, str | None, str] | None = None
 
-    def format(self, record: logging.LogRecord) -> str:
+    @classmethod
+    def _compile_format(cls, fmt: str) -> Callable[[logging.LogRecord, str | None, str, str], str]:
+        """
+        Compile a %-style format string into a function rendering a record, so the format string is not parsed and %-interpolated with the record's dictionary for every record.
+        :param fmt: The %-style format string.
+        :return: A function that takes the record, the formatted time, the (indented) message and the bound context fragment, and returns the formatted record.
+        """
+        render = cls._compiled_formats.get(fmt)
+        if render is not None:
+            return render
+
+        parts: list[str] = []
+        position: int = 0
+        for match in cls._format_field_pattern.finditer(fmt):
+            start: int = match.start()
+            if start > position:
+                parts.append(repr(fmt[position:start]))
+            position = match.end()
+
+            field, spec = match.group("field", "spec")
+            if field is None:
+                parts.append(repr("%"))
+                continue
+
+            value: str = field if field in ("asctime", "message", "context") else f"record.{field}"
+            if spec == "s":
+                parts.append(f"f'{{{value}!s}}'")
+            elif spec == "r":
+                parts.append(f"f'{{{value}!r}}'")
+            else:
+                parts.append(f"f\"{{'%{spec}' % ({value},)}}\"")
+        if position < len(fmt):
+            parts.append(repr(fmt[position:]))
+
+        source: str = "def render(record, asctime, message, context):\n    return {}\n".format(" ".join(parts) if parts else "''")
+        namespace: dict = {}
+        exec(compile(source, "<{} format>".format(cls.__name__), "exec"), namespace)
+        render = cls._compiled_formats[fmt] = namespace["render"]
+        return render
+
+    def formatTime(self, record: logging.LogRecord, datefmt: str | None = None) -> str:
+        """Format the creation time of the record. The result is cached for the current second, because many records share the same second."""
+        if datefmt is None:
+            # The default format contains milliseconds
+            return super().formatTime(record, datefmt)
+        second: int = int(record.created)
+        cached_time = self._cached_time
+        if cached_time is not None and cached_time[0] == second and cached_time[1] == datefmt:
+            return cached_time[2]
+        formatted_time: str = super().formatTime(record, datefmt)
+        self._cached_time = (second, datefmt, formatted_time)
+        return formatted_time
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        try:
+            return self._render(record, record.__dict__.get("asctime"), record.message, self.get_context_fragment(record))
+        except AttributeError as e:
+            raise ValueError("Formatting field not found in record: {}".format(e))
+
+    @staticmethod
+    def get_message(record: logging.LogRecord) -> str:
+        """Return the interpolated message of the record. The message is interpolated only once per record, and is shared by all the handlers."""
+        message = record.__dict__.get("_tidy_message")
+        if message is None:
+            message = record._tidy_message = record.getMessage()
+        return message
+
+    def get_limited_message(self, record: logging.LogRecord) -> str:
+        """Return the interpolated message of the record, redacted by the `redactor` of the formatter, then truncated or spilled if it exceeds its `message_limit`."""
+        message: str = self.get_message(record)
+        if self.redactor is not None:
+            # Before the limit, so a spilled message is redacted as well
+            message = self.redactor.apply(record, message)
+        if self.message_limit is not None:
+            message = self.message_limit.apply(record, message)
+        return message
+
+    def get_context_fragment(self, record: logging.LogRecord) -> str:
+        """Return the fragment of the header line rendered from the bound context of the record (redacted by the `redactor` of the formatter), or an empty string."""
+        context: BoundContext | None = record.__dict__.get("_tidy_context")
+        if context is None:
+            return ""
+        # Rendered when the context was bound, and redacted from the cache of the redactor
+        return context.header_fragment if self.redactor is None else self.redactor.redact(context.header_fragment)
+
+    def get_indented_message(self, record: logging.LogRecord) -> str:
+        """Return the interpolated message of the record with each line indented. The result is cached on the record per indentation, without changing `msg` or `args`."""
+        indented_messages: dict[str, str] | None = record.__dict__.get("_tidy_indented_messages")
+        if indented_messages is None:
+            indented_messages = record._tidy_indented_messages = {}
+        else:
+            indented_message = indented_messages.get(self._indented_message_key)
+            if indented_message is not None:
+                return indented_message
+
+        msg = self.get_limited_message(record)
         # Format the message with indentation
         if record.msg:
-            msg = str(record.getMessage())
-            indented_msg = "\n".join(f"{self.indentation}{line}" for line in msg.splitlines())
-            indented_msg += "\n" if not indented_msg.endswith("\n") else ""
-            record.msg = indented_msg
+            indented_message = "\n".join(f"{self.indentation}{line}" for line in msg.splitlines())
+            indented_message += "\n" if not indented_message.endswith("\n") else ""
+        else:
+            indented_message = msg
+        indented_messages[self._indented_message_key] = indented_message
+        return indented_message
+
+    def _iter_indented_message(self, message: str) -> Iterator[str]:
+        """Yield the indented message (the same text as `get_indented_message`) in chunks of whole lines of about `chunk_size` characters."""
+        indentation: str = self.indentation
+        start: int = 0
+        while True:
+            # A chunk ends after a '\n', so a '\r\n' is never split and `splitlines` gives the same lines as for the whole message
+            end: int = message.find("\n", start + self.chunk_size) + 1
+            if end == 0 or end == len(message):
+                indented_chunk: str = "\n".join(f"{indentation}{line}" for line in (message[start:] if start else message).splitlines())
+                yield indented_chunk if indented_chunk.endswith("\n") else indented_chunk + "\n"
+                return
+            yield "\n".join(f"{indentation}{line}" for line in message[start:end].splitlines()) + "\n"
+            start = end
+
+    def _format_details(self, record: logging.LogRecord, after_newline: bool) -> str:
+        """Return the exception and stack text appended to the formatted record, `after_newline` telling whether the record formatted so far ends with a newline."""
+        details: str = ""
+        if record.exc_info:
+            # Cache the traceback text to avoid converting it multiple times (it's constant anyway)
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            exception_text: str = record.exc_text if self.redactor is None else self.redactor.apply(record, record.exc_text, "_tidy_redacted_exc_text")
+            details = exception_text if after_newline else "\n" + exception_text
+            after_newline = details[-1:] == "\n"
+        if record.stack_info:
+            stack_text: str = self.formatStack(record.stack_info)
+            details = details + stack_text if after_newline else details + "\n" + stack_text
+        return details
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.message = self.get_indented_message(record)
+        if self._uses_time:
+            record.asctime = self.formatTime(record, self.datefmt)
+        s = self.formatMessage(record)
+        if record.exc_info or record.exc_text or record.stack_info:
+            s = s + self._format_details(record, s[-1:] == "\n")
+        return s
+
+    def iter_format(self, record: logging.LogRecord) -> Iterator[str]:
+        """
+        Format a record as successive texts, whose concatenation is the result of `format`, so a large message can be written without building the whole formatted record.
+        The message is indented in chunks of about `chunk_size` characters, and the indented message is not cached on the record.
+        :param record: The record to format.
+        :return: An iterator of the texts, a single one if the message is not larger than `chunk_size`.
+        """
+        message: str = self.get_limited_message(record)
+        if len(message) <= self.chunk_size or not record.msg:
+            return iter((self.format(record),))
+        return self._iter_format_chunks(record, message)
 
-        return super().format(record)
+    def _iter_format_chunks(self, record: logging.LogRecord, message: str) -> Iterator[str]:
+        """Yield the header, the chunks of the indented message, and the footer with the exception and stack details of a record, see `iter_format`."""
+        if self._uses_time:
+            record.asctime = self.formatTime(record, self.datefmt)
+        try:
+            header, placeholder, footer = self._render(record, record.__dict__.get("asctime"), self._message_placeholder, self.get_context_fragment(record)).partition(
+                self._message_placeholder
+            )
+        except AttributeError as e:
+            raise ValueError("Formatting field not found in record: {}".format(e))
+        if not placeholder:
+            # The format does not contain the message
+            yield IndentedMessageFormatter.format(self, record)
+            return
+        if header:
+            yield header
+        yield from self._iter_indented_message(message)
+        # The indented message ends with a newline
+        details: str = self._format_details(record, footer[-1:] == "\n" if footer else True) if record.exc_info or record.exc_text or record.stack_info else ""
+        if footer or details:
+            yield footer + details
 
 
 class ColoredIndentedMessageFormatter(IndentedMessageFormatter):
 
-    def __init__(self, only_apply_on_header: bool = True) -> None:
-        super().__init__()
+    def __init__(self, only_apply_on_header: bool = True, use_colors: bool = True, message_limit: MessageSizeLimit | None = None, redactor: "Redactor | None" = None) -> None:
+        super().__init__(message_limit=message_limit, redactor=redactor)
         self.only_apply_on_header = only_apply_on_header
+        self.use_colors = use_colors
+        # The escape codes written before and after the colored part, per level name
+        self._color_prefixes: dict[str, str] = dict(self.COLORS) if use_colors else {}
+        self._default_color_prefix: str = self.RESET if use_colors else ""
+        self._color_suffix: str = self.RESET if use_colors else ""
 
     COLORS = {"DEBUG": "\033[94m", "INFO": "\033[92m", "WARNING": "\033[93m", "ERROR": "\033[91m", "CRITICAL": "\033[95m"}  # Blue  # Green  # Yellow  # Red  # Magenta
 
     RESET = "\033[0m"
 
     def format(self, record: logging.LogRecord) -> str:
-        color = self.COLORS.get(record.levelname, self.RESET)
         message = super().format(record)
+        if not self.use_colors:
+            return message
+        color = self._color_prefixes.get(record.levelname, self._default_color_prefix)
         if self.only_apply_on_header:
-            lines = message.splitlines(True)
-            if len(lines) > 0:
-                lines[0] = f"{color}{lines[0]}{self.RESET}"
-            return "".join(lines)
+            if not message:
+                return message
+            # Only the header line is colored, the (cached) indented message is appended as is
+            header_end: int = message.find("\n") + 1
+            if header_end == 0:
+                return f"{color}{message}{self._color_suffix}"
+            return f"{color}{message[:header_end]}{self._color_suffix}{message[header_end:]}"
         else:
-            return f"{color}{message}{self.RESET}"
+            return f"{color}{message}{self._color_suffix}"
+
+    def _iter_format_chunks(self, record: logging.LogRecord, message: str) -> Iterator[str]:
+        if not self.use_colors:
+            yield from super()._iter_format_chunks(record, message)
+            return
+        color = self._color_prefixes.get(record.levelname, self._default_color_prefix)
+        # The color is written before the first non-empty text, and reset after the header line (or after the last text), as `format` does
+        is_colored: bool = False
+        for text in super()._iter_format_chunks(record, message):
+            if not text:
+                continue
+            if not is_colored:
+                text = color + text
+                is_colored = True
+            if self.only_apply_on_header and color is not None:
+                header_end: int = text.find("\n") + 1
+                if header_end:
+                    text = f"{text[:header_end]}{self._color_suffix}{text[header_end:]}"
+                    color = None
+            yield text
+        if is_colored and (color is not None or not self.only_apply_on_header):
+            yield self._color_suffix
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format each record as a single-line JSON object (NDJSON), with the exception details as a structured tree instead of indented text.
+
+    The fixed part of the object is assembled from precomputed key fragments, so no intermediate dictionary is built per record.
+    Values of `extra` fields and exception trees are encoded with `orjson` if it is installed, otherwise with the standard `json` module.
+    Both are imported when the formatter is created, and the exception rendering (which imports `traceback`) when the first exception is formatted.
+    The bound context of a record (see `context.BoundContext`) is written as a 'context' object, rendered when the context was bound.
+    """
+
+    # Attributes of every LogRecord, the remaining attributes are the `extra` fields
+    standard_record_attributes: frozenset[str] = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName"}
+
+    # The file, function and line are always written
+    uses_caller_fields: bool = True
+
+    def __init__(
+        self, message_limit: MessageSizeLimit | None = None, redactor: "Redactor | None" = None, max_exception_depth: int = 64, max_exception_group_size: int = 100
+    ) -> None:
+        """
+        Initialize the JsonLinesFormatter.
+        :param message_limit: The cap on the size of the messages, or None to write the messages whole.
+        :param redactor: The redaction of the secrets in the messages, `extra` fields and exception details, or None to write them as they are.
+        :param max_exception_depth: Maximum nesting level of chained and grouped exceptions in the exception tree. Deeper exceptions are summarized.
+        :param max_exception_group_size: Maximum number of exceptions of an ExceptionGroup in the exception tree. The remaining exceptions are summarized.
+        """
+        super().__init__()
+        self.message_limit = message_limit
+        self.redactor = redactor
+        self.max_exception_depth = max_exception_depth
+        self.max_exception_group_size = max_exception_group_size
+        import json.encoder
+
+        self._encode_string: Callable[[str], str] = json.encoder.encode_basestring
+        try:
+            import orjson
+
+            self._encode_value: Callable[[Any], str] = lambda value: orjson.dumps(value, default=str).decode()
+        except ImportError:
+            self._encode_value: Callable[[Any], str] = json.encoder.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str).encode
+        self._exception_to_dict: Callable[[BaseException], dict] | None = None
+        self._cached_time: tuple[int, str] | None = None
+
+    def format_timestamp(self, record: logging.LogRecord) -> str:
+        """Format the creation time of the record as an ISO 8601 UTC timestamp with milliseconds. The part up to the seconds is cached for the current second."""
+        second: int = int(record.created)
+        cached_time = self._cached_time
+        if cached_time is None or cached_time[0] != second:
+            cached_time = self._cached_time = (second, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second)))
+        return "{}.{:03d}Z".format(cached_time[1], int(record.msecs))
+
+    def format(self, record: logging.LogRecord) -> str:
+        encode_string = self._encode_string
+
+        exception: BaseException | None = None
+        if isinstance(record.msg, LazyExceptionMessage):
+            # The exception is serialized as a tree, so the text rendering of the exception details is not needed
+            exception = record.msg.exception
+            # Cached on the record, so the JSON formatters of all the handlers share the limited message
+            message: str | None = record.__dict__.get("_tidy_exception_message")
+            if message is None:
+                message = record._tidy_exception_message = record.msg.message % record.args if record.args else record.msg.message
+        else:
+            message: str = IndentedMessageFormatter.get_message(record)
+        redactor: Redactor | None = self.redactor
+        if redactor is not None:
+            message = redactor.apply(record, message)
+        if self.message_limit is not None:
+            message = self.message_limit.apply(record, message)
+        if exception is None and record.exc_info:
+            exception = record.exc_info[1]
+
+        parts: list[str] = [
+            '{"timestamp":"',
+            self.format_timestamp(record),
+            '","level":',
+            encode_string(record.levelname),
+            ',"logger":',
+            encode_string(record.name),
+            ',"file":',
+            encode_string(record.filename),
+            ',"function":',
+            encode_string(record.funcName) if record.funcName is not None else "null",
+            ',"line":',
+            str(record.lineno),
+            ',"message":',
+            encode_string(message),
+        ]
+
+        task_name: str | None = record.__dict__.get("taskName")
+        if task_name is not None:
+            # Set by Python 3.12+ in asyncio tasks, or by `ContextVarsFilter`
+            parts.append(',"task":')
+            parts.append(encode_string(task_name))
+
+        context: BoundContext | None = record.__dict__.get("_tidy_context")
+        if context is not None:
+            # The ',"context":{...}' member, rendered when the context was bound
+            parts.append(context.json_fragment if redactor is None else redactor.redact(context.json_fragment))
+
+        extra_keys = record.__dict__.keys() - self.standard_record_attributes
+        if extra_keys:
+            extra: dict = {key: record.__dict__[key] for key in sorted(extra_keys) if not key.startswith("_tidy")}
+            if extra:
+                parts.append(',"extra":')
+                parts.append(self._encode_value(extra if redactor is None else redactor.redact_fields(extra)))
+
+        if exception is not None:
+            parts.append(',"exception":')
+            exception_to_dict = self._exception_to_dict
+            if exception_to_dict is None:
+                try:
+                    from .exception_rendering import exception_to_dict
+                except ImportError:
+                    from exception_rendering import exception_to_dict
+                self._exception_to_dict = exception_to_dict
+            exception_tree: dict = exception_to_dict(exception, max_depth=self.max_exception_depth, max_group_exceptions=self.max_exception_group_size)
+            if redactor is not None:
+                redactor.redact_exception_tree(exception_tree)
+            parts.append(self._encode_value(exception_tree))
+
+        if record.stack_info:
+            parts.append(',"stack":')
+            parts.append(encode_string(record.stack_info))
+
+        parts.append("}")
+        return "".join(parts)
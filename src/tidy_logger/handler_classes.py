@@ -0,0 +1,19 @@
+# The classes created by `mixin_handler_class`, per mixin and handler class
+_mixin_handler_classes: dict[tuple[type, type], type] = {}
+
+
+def mixin_handler_class(mixin: type, handler_class: type) -> type:
+    """
+    Return a subclass of a handler class with a mixin (e.g. `PreformattingHandlerMixin`) placed before it, created once per mixin and handler class.
+    The subclass is named after the mixin without its 'HandlerMixin' suffix and the handler class, e.g. 'PreformattingFileHandler', in the module of the mixin.
+    :param mixin: The mixin class, which overrides methods of the handler class.
+    :param handler_class: The handler class, e.g. `logging.FileHandler`.
+    :return: The class combining `mixin` and `handler_class`.
+    """
+    key: tuple[type, type] = (mixin, handler_class)
+    combined_class = _mixin_handler_classes.get(key)
+    if combined_class is None:
+        prefix: str = mixin.__name__.removesuffix("HandlerMixin")
+        combined_class = type("{}{}".format(prefix, handler_class.__name__), (mixin, handler_class), {"__module__": mixin.__module__})
+        _mixin_handler_classes[key] = combined_class
+    return combined_class
@@ -0,0 +1,30 @@
+from typing import Callable
+
+
+class LazyExceptionMessage:
+    """A log message with exception details that are only rendered when the message is converted to a string, i.e. when a handler formats the record.
+
+    The rendered text is cached, so all the handlers of a record share a single rendering.
+    """
+
+    __slots__ = ("message", "exception", "_render", "_text")
+
+    def __init__(self, message: str, exception: BaseException, render: Callable[[str, BaseException], str]):
+        """
+        Initialize the LazyExceptionMessage.
+        :param message: The log message.
+        :param exception: The exception whose details are appended to the message.
+        :param render: A callable that takes the message and the exception, and returns the full message text.
+        """
+        self.message = message
+        self.exception = exception
+        self._render = render
+        self._text: str | None = None
+
+    def __str__(self) -> str:
+        if self._text is None:
+            self._text = self._render(self.message, self.exception)
+        return self._text
+
+    def __repr__(self) -> str:
+        return "{}(message={!r}, exception={!r})".format(type(self).__name__, self.message, self.exception)
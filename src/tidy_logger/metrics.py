@@ -0,0 +1,310 @@
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+# Histogram buckets are powers of two of nanoseconds, from 2^10 ns (about 1 µs) to 2^34 ns (about 17 s)
+BUCKET_MIN_EXPONENT: int = 10
+BUCKET_MAX_EXPONENT: int = 34
+NUM_BUCKETS: int = BUCKET_MAX_EXPONENT - BUCKET_MIN_EXPONENT + 1
+
+COUNTER_NAMES: tuple[str, ...] = ("records_emitted", "records_filtered", "bytes_written", "errors", "rotations")
+HISTOGRAM_NAMES: tuple[str, ...] = ("format_seconds", "write_seconds", "rotation_seconds")
+
+HELP_TEXTS: dict[str, str] = {
+    "records_emitted": "Number of records emitted by the handler.",
+    "records_filtered": "Number of records rejected by the filters of the handler.",
+    "bytes_written": "Number of bytes of the formatted records (UTF-8) written by the handler.",
+    "errors": "Number of records the handler failed to emit.",
+    "rotations": "Number of rotations of the log file.",
+    "format_seconds": "Time spent formatting records.",
+    "write_seconds": "Time spent writing records, excluding formatting.",
+    "rotation_seconds": "Time spent rotating the log file.",
+}
+
+
+# Layout of the values of a handler: the counters, then each histogram as [count, sum in ns, bucket counts...]
+HISTOGRAM_SIZE: int = NUM_BUCKETS + 2
+HISTOGRAM_OFFSETS: dict[str, int] = {name: len(COUNTER_NAMES) + i * HISTOGRAM_SIZE for i, name in enumerate(HISTOGRAM_NAMES)}
+VALUES_SIZE: int = len(COUNTER_NAMES) + len(HISTOGRAM_NAMES) * HISTOGRAM_SIZE
+RECORDS_EMITTED, RECORDS_FILTERED, BYTES_WRITTEN, ERRORS, ROTATIONS = range(len(COUNTER_NAMES))
+FORMAT_SECONDS, WRITE_SECONDS, ROTATION_SECONDS = (HISTOGRAM_OFFSETS[name] for name in HISTOGRAM_NAMES)
+
+# Offset of the bucket in a histogram, per bit length of a duration in nanoseconds (durations are far below 2^64 ns)
+_BUCKET_OFFSETS: tuple[int, ...] = tuple(2 + min(max(bit_length, BUCKET_MIN_EXPONENT), BUCKET_MAX_EXPONENT) - BUCKET_MIN_EXPONENT for bit_length in range(65))
+
+
+def _observe(values: list[int], offset: int, duration_ns: int) -> None:
+    """Add a duration to the histogram at `offset` of the values of a handler."""
+    values[offset] += 1
+    values[offset + 1] += duration_ns
+    values[offset + _BUCKET_OFFSETS[min(duration_ns.bit_length(), 64)]] += 1
+
+
+class _MetricsShard:
+    """The counters and histograms updated by a single thread, so no lock is needed to update them."""
+
+    __slots__ = ("thread", "handlers", "format_ns", "format_bytes", "rotation_ns")
+
+    def __init__(self, thread: threading.Thread | None):
+        self.thread = thread
+        # The values of each handler, see VALUES_SIZE
+        self.handlers: dict[str, list[int]] = {}
+        # Time spent formatting and the size of the last formatted record of the current record, and the time spent rotating during the current emit
+        self.format_ns: int = 0
+        self.format_bytes: int = 0
+        self.rotation_ns: int = 0
+
+    def get_values(self, handler_name: str) -> list[int]:
+        values = self.handlers.get(handler_name)
+        if values is None:
+            values = self.handlers[handler_name] = [0] * VALUES_SIZE
+        return values
+
+    def merge_into(self, other: "_MetricsShard") -> None:
+        # Copied first, as the owning thread may add handlers meanwhile
+        for handler_name, values in list(self.handlers.items()):
+            other_values: list[int] = other.get_values(handler_name)
+            for i, value in enumerate(list(values)):
+                other_values[i] += value
+
+
+class LoggerMetrics:
+    """Throughput and latency metrics of logging handlers, cheap enough to leave on in production.
+
+    The handlers are instrumented by wrapping the `handle`, `format`, `emit`, `handleError` and `doRollover` methods of the instances.
+    Each thread updates its own counters and histograms (log2 buckets of nanoseconds) without locking, and they are merged on read.
+    Gauges (e.g. the depth of a queue) are read from callbacks when the metrics are read.
+    """
+
+    def __init__(self, prefix: str = "tidy_logger"):
+        """
+        Initialize the LoggerMetrics.
+        :param prefix: The prefix of the metric names in the Prometheus text format.
+        """
+        self.prefix = prefix
+        self._local = threading.local()
+        self._shards: list[_MetricsShard] = []
+        # The metrics of the threads that have exited
+        self._retired_shard = _MetricsShard(thread=None)
+        self._gauges: dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def _create_shard(self) -> _MetricsShard:
+        shard = self._local.shard = _MetricsShard(threading.current_thread())
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    def instrument_handler(self, handler, name: str) -> None:
+        """
+        Collect the metrics of a handler.
+        :param handler: The handler to instrument.
+        :param name: The name of the handler in the metrics, e.g. 'file'.
+        """
+        local = self._local
+        create_shard = self._create_shard
+        perf_counter_ns = time.perf_counter_ns
+        bucket_offsets: tuple[int, ...] = _BUCKET_OFFSETS
+        terminator_size: int = len(getattr(handler, "terminator", ""))
+        original_handle = handler.handle
+        original_format = handler.format
+        original_emit = handler.emit
+        original_handle_error = handler.handleError
+
+        def handle(record):
+            rv = original_handle(record)
+            if not rv:
+                shard = getattr(local, "shard", None) or create_shard()
+                shard.get_values(name)[RECORDS_FILTERED] += 1
+            return rv
+
+        def format(record) -> str | bytes:
+            start: int = perf_counter_ns()
+            text: str | bytes = original_format(record)
+            duration_ns: int = perf_counter_ns() - start
+            shard = getattr(local, "shard", None) or create_shard()
+            shard.format_ns += duration_ns
+            # Binary handlers format the records to bytes
+            shard.format_bytes = (len(text) if type(text) is bytes or text.isascii() else len(text.encode("utf-8", "replace"))) + terminator_size
+            return text
+
+        def emit(record) -> None:
+            shard = getattr(local, "shard", None) or create_shard()
+            # The record may have been formatted before `emit` (outside the handler lock, see `PreformattingHandlerMixin`)
+            format_ns_before_emit: int = shard.format_ns
+            shard.rotation_ns = 0
+            start: int = perf_counter_ns()
+            original_emit(record)
+            duration_ns: int = perf_counter_ns() - start
+            values = shard.handlers.get(name) or shard.get_values(name)
+            values[RECORDS_EMITTED] += 1
+            values[BYTES_WRITTEN] += shard.format_bytes
+            # The histograms are updated inline (see `_observe`), as this runs for every record
+            format_ns: int = shard.format_ns
+            if format_ns:
+                values[FORMAT_SECONDS] += 1
+                values[FORMAT_SECONDS + 1] += format_ns
+                values[FORMAT_SECONDS + bucket_offsets[format_ns.bit_length()]] += 1
+            shard.format_ns = shard.format_bytes = 0
+            write_ns: int = duration_ns - (format_ns - format_ns_before_emit) - shard.rotation_ns
+            if write_ns > 0:
+                values[WRITE_SECONDS + 1] += write_ns
+            else:
+                write_ns = 0
+            values[WRITE_SECONDS] += 1
+            values[WRITE_SECONDS + bucket_offsets[write_ns.bit_length()]] += 1
+
+        def handleError(record) -> None:
+            shard = getattr(local, "shard", None) or create_shard()
+            shard.get_values(name)[ERRORS] += 1
+            original_handle_error(record)
+
+        handler.handle = handle
+        handler.format = format
+        handler.emit = emit
+        handler.handleError = handleError
+
+        original_do_rollover = getattr(handler, "doRollover", None)
+        if original_do_rollover is not None:
+
+            def doRollover() -> None:
+                start: int = perf_counter_ns()
+                original_do_rollover()
+                duration_ns: int = perf_counter_ns() - start
+                shard = getattr(local, "shard", None) or create_shard()
+                shard.rotation_ns += duration_ns
+                values: list[int] = shard.get_values(name)
+                values[ROTATIONS] += 1
+                _observe(values, ROTATION_SECONDS, duration_ns)
+
+            handler.doRollover = doRollover
+
+    def add_gauge(self, name: str, read: Callable[[], float]) -> None:
+        """
+        Add a gauge, whose value is read when the metrics are read.
+        :param name: The name of the gauge, e.g. 'queue_depth'.
+        :param read: A function returning the current value of the gauge.
+        """
+        self._gauges[name] = read
+
+    def _merge_shards(self) -> _MetricsShard:
+        merged_shard = _MetricsShard(thread=None)
+        with self._lock:
+            for shard in list(self._shards):
+                if shard.thread is not None and not shard.thread.is_alive():
+                    # The thread has exited, its metrics no longer change
+                    shard.merge_into(self._retired_shard)
+                    self._shards.remove(shard)
+                else:
+                    shard.merge_into(merged_shard)
+            self._retired_shard.merge_into(merged_shard)
+        return merged_shard
+
+    def _read_gauges(self) -> dict[str, float]:
+        gauges: dict[str, float] = {}
+        for name, read in list(self._gauges.items()):
+            try:
+                gauges[name] = read()
+            except Exception:
+                continue
+        return gauges
+
+    @staticmethod
+    def _get_quantile(histogram: list[int], fraction: float) -> float:
+        """Estimate a quantile of a histogram ([count, sum, buckets...]) in seconds, as the upper bound of the bucket containing it."""
+        rank: float = fraction * histogram[0]
+        cumulative_count: int = 0
+        for i, count in enumerate(histogram[2:]):
+            cumulative_count += count
+            if count and cumulative_count >= rank:
+                return 2 ** (i + BUCKET_MIN_EXPONENT) / 1e9
+        return 2**BUCKET_MAX_EXPONENT / 1e9
+
+    def stats(self) -> dict:
+        """
+        Return the metrics.
+        :return: A dictionary with the counters and histograms per handler name ('handlers'), and the values of the gauges ('gauges').
+            Each histogram has its 'count', 'sum' (in seconds), and estimated 'p50' and 'p99' (in seconds).
+        """
+        merged_shard: _MetricsShard = self._merge_shards()
+        handlers: dict[str, dict] = {}
+        for handler_name, values in merged_shard.handlers.items():
+            handler_stats: dict = dict(zip(COUNTER_NAMES, values))
+            handlers[handler_name] = handler_stats
+            for histogram_name, offset in HISTOGRAM_OFFSETS.items():
+                end: int = offset + HISTOGRAM_SIZE
+                histogram: list[int] = values[offset:end]
+                if histogram[0]:
+                    handler_stats[histogram_name] = {
+                        "count": histogram[0],
+                        "sum": histogram[1] / 1e9,
+                        "p50": self._get_quantile(histogram, 0.5),
+                        "p99": self._get_quantile(histogram, 0.99),
+                    }
+        return {"handlers": handlers, "gauges": self._read_gauges()}
+
+    def to_prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        merged_shard: _MetricsShard = self._merge_shards()
+        lines: list[str] = []
+
+        handlers: list[tuple[str, list[int]]] = sorted(merged_shard.handlers.items())
+
+        for counter_index, counter_name in enumerate(COUNTER_NAMES):
+            values: list[tuple[str, int]] = [(handler_name, handler_values[counter_index]) for handler_name, handler_values in handlers]
+            if not any(value for _, value in values):
+                continue
+            metric_name: str = f"{self.prefix}_{counter_name}_total"
+            lines.append(f"# HELP {metric_name} {HELP_TEXTS[counter_name]}")
+            lines.append(f"# TYPE {metric_name} counter")
+            lines.extend(f'{metric_name}{{handler="{handler_name}"}} {value}' for handler_name, value in values)
+
+        for histogram_name, offset in HISTOGRAM_OFFSETS.items():
+            end: int = offset + HISTOGRAM_SIZE
+            histograms: list[tuple[str, list[int]]] = [(handler_name, values[offset:end]) for handler_name, values in handlers]
+            if not any(histogram[0] for _, histogram in histograms):
+                continue
+            metric_name: str = f"{self.prefix}_{histogram_name}"
+            lines.append(f"# HELP {metric_name} {HELP_TEXTS[histogram_name]}")
+            lines.append(f"# TYPE {metric_name} histogram")
+            for handler_name, histogram in histograms:
+                cumulative_count: int = 0
+                for i, count in enumerate(histogram[2:]):
+                    cumulative_count += count
+                    lines.append(f'{metric_name}_bucket{{handler="{handler_name}",le="{2 ** (i + BUCKET_MIN_EXPONENT) / 1e9:.9g}"}} {cumulative_count}')
+                lines.append(f'{metric_name}_bucket{{handler="{handler_name}",le="+Inf"}} {histogram[0]}')
+                lines.append(f'{metric_name}_sum{{handler="{handler_name}"}} {histogram[1] / 1e9:.9g}')
+                lines.append(f'{metric_name}_count{{handler="{handler_name}"}} {histogram[0]}')
+
+        for gauge_name, value in sorted(self._read_gauges().items()):
+            metric_name: str = f"{self.prefix}_{gauge_name}"
+            lines.append(f"# TYPE {metric_name} gauge")
+            lines.append(f"{metric_name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self, target: str | Path | Callable[[str], None]) -> None:
+        """
+        Export the metrics in the Prometheus text exposition format.
+        :param target: A file path (e.g. for the textfile collector of the node exporter), which is replaced atomically, or a function called with the text.
+        """
+        text: str = self.to_prometheus()
+        if callable(target):
+            target(text)
+            return
+        file_path = Path(target)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_descriptor, temporary_file_name = tempfile.mkstemp(dir=file_path.parent, prefix=file_path.name, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as temporary_file:
+                temporary_file.write(text)
+            os.replace(temporary_file_name, file_path)
+        except BaseException:
+            try:
+                os.remove(temporary_file_name)
+            except OSError:
+                pass
+            raise
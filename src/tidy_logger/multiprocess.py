@@ -0,0 +1,172 @@
+import locale
+import logging
+import os
+import weakref
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+class MultiProcessFileHandler(logging.Handler):
+    """A file handler that several processes can safely use for the same log file, e.g. the workers of a pre-fork server or a multiprocessing pool.
+
+    Each record is written with a single `write` call on a file descriptor opened with O_APPEND, so records of different processes are never interleaved.
+    The size-based rollover is coordinated with a lock file (`<log file>.lock`): the process that rotates holds the lock,
+    and the other processes notice the rotation (the log file path no longer refers to their open file) and reopen the log file.
+    The rollover is not supported on Windows, where the log file cannot be renamed while other processes have it open.
+    The file descriptors are reopened in the child process after `fork()`, so the child does not share the lock with its parent.
+    """
+
+    terminator: str = "\n"
+
+    _handlers: "weakref.WeakSet[MultiProcessFileHandler]" = weakref.WeakSet()
+
+    def __init__(
+        self, filename: str | Path, mode: str = "a", encoding: str | None = None, errors: str | None = None, max_bytes: int = 0, backup_count: int = 0, delay: bool = False
+    ):
+        """
+        Initialize the MultiProcessFileHandler.
+        :param filename: The path of the log file.
+        :param mode: Mode to open the log file. Only 'a' (append) is supported, as truncating a file shared by several processes would lose their records.
+        :param encoding: Encoding of the log file. If None, the locale encoding is used.
+        :param errors: How encoding errors are handled.
+        :param max_bytes: Maximum size in bytes of the log file before rotation. If 0 (or `backup_count` is 0), the file is never rotated.
+        :param backup_count: Number of backup files to keep ('<log file>.1' to '<log file>.<backup_count>').
+        :param delay: Whether to open the log file on the first record.
+        :raises ValueError: If `mode` is not 'a', or if the log file is rotated on Windows.
+        """
+        if mode != "a":
+            raise ValueError("`mode` should be 'a', other modes are not supported for multi-process logging.")
+        if os.name == "nt" and max_bytes > 0 and backup_count > 0:
+            # A file cannot be renamed on Windows while it is open, and the other processes keep the log file open
+            raise ValueError("The log file cannot be rotated on Windows, where a file open in another process cannot be renamed.")
+        super().__init__()
+        self.baseFilename: str = os.path.abspath(os.fspath(filename))
+        self.lock_file_name: str = self.baseFilename + ".lock"
+        self.mode = mode
+        self.encoding: str = locale.getpreferredencoding(False) if encoding in (None, "locale") else encoding
+        self.errors: str = errors or "strict"
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.rollover_count: int = 0
+        self._fd: int | None = None
+        self._lock_fd: int | None = None
+        if not delay:
+            self._open()
+        self._handlers.add(self)
+
+    def _open(self) -> None:
+        self._fd = os.open(self.baseFilename, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+
+    def _close_file_descriptors(self) -> None:
+        for fd in (self._fd, self._lock_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._fd = None
+        self._lock_fd = None
+
+    def _reopen_after_fork(self) -> None:
+        # The lock of a file descriptor is shared with the parent process, so the child needs its own file descriptors
+        self._close_file_descriptors()
+        self._open()
+
+    def _acquire_file_lock(self) -> None:
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self.lock_file_name, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        else:
+            os.lseek(self._lock_fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._lock_fd, msvcrt.LK_LOCK, 1)
+
+    def _release_file_lock(self) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._lock_fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._lock_fd, msvcrt.LK_UNLCK, 1)
+
+    def _is_current_file(self) -> bool:
+        """Return whether the open file descriptor still refers to the log file path, i.e. no other process has rotated it."""
+        try:
+            path_stat = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return False
+        return os.path.samestat(path_stat, os.fstat(self._fd))
+
+    def _should_rollover(self, data_size: int) -> bool:
+        if self.max_bytes <= 0 or self.backup_count <= 0:
+            return False
+        size: int = os.fstat(self._fd).st_size
+        return size > 0 and size + data_size >= self.max_bytes
+
+    def _rollover(self, data_size: int) -> None:
+        """Rotate the log file while holding the lock file, unless another process has already rotated it."""
+        self._acquire_file_lock()
+        try:
+            if not self._is_current_file():
+                # Another process has rotated the log file, write to the new one
+                os.close(self._fd)
+                self._open()
+                if not self._should_rollover(data_size):
+                    return
+
+            # Closed before the log file is renamed, the new log file is opened even if a rename fails
+            os.close(self._fd)
+            self._fd = None
+            try:
+                for i in range(self.backup_count - 1, 0, -1):
+                    source_file_name: str = "{}.{}".format(self.baseFilename, i)
+                    if os.path.exists(source_file_name):
+                        os.replace(source_file_name, "{}.{}".format(self.baseFilename, i + 1))
+                if os.path.exists(self.baseFilename):
+                    os.replace(self.baseFilename, self.baseFilename + ".1")
+            finally:
+                self._open()
+            self.rollover_count += 1
+        finally:
+            self._release_file_lock()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            data: bytes = (self.format(record) + self.terminator).encode(self.encoding, self.errors)
+            if self._fd is None:
+                self._open()
+            if self.max_bytes > 0 and self.backup_count > 0:
+                if not self._is_current_file():
+                    # Another process has rotated the log file, write to the new one
+                    os.close(self._fd)
+                    self._open()
+                if self._should_rollover(len(data)):
+                    self._rollover(len(data))
+            # A single write per record, appended atomically at the end of the file
+            written: int = os.write(self._fd, data)
+            if written < len(data):
+                os.write(self._fd, data[written:])
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        with self.lock:
+            self._close_file_descriptors()
+            super().close()
+        self._handlers.discard(self)
+
+    @classmethod
+    def _reopen_all_after_fork(cls) -> None:
+        for handler in list(cls._handlers):
+            if handler._fd is not None:
+                handler._reopen_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=MultiProcessFileHandler._reopen_all_after_fork)
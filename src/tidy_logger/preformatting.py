@@ -0,0 +1,57 @@
+import logging
+import threading
+
+try:
+    from .handler_classes import mixin_handler_class
+except ImportError:
+    from handler_classes import mixin_handler_class
+
+
+class PreformattingHandlerMixin:
+    """A mixin for handlers that formats the record on the caller's thread before acquiring the handler lock, so the lock is only held while writing.
+
+    `logging.Handler.handle` holds the handler lock across `emit`, which formats and writes the record. With many threads logging at once,
+    the threads queue on the lock while the holder formats (e.g. renders exception details). Here the formatted text is kept in a
+    per-thread slot, and `format` returns it when `emit` (or `shouldRollover`) asks for the same record under the lock.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._preformatted = threading.local()
+
+    def handle(self, record: logging.LogRecord):
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            # Python 3.12+ filters can return a replacement record
+            record = rv
+        if rv:
+            try:
+                text: str = self.format(record)
+            except RecursionError:
+                raise
+            except Exception:
+                self.handleError(record)
+                return rv
+            preformatted = self._preformatted
+            preformatted.entry = (record, text)
+            try:
+                with self.lock:
+                    self.emit(record)
+            finally:
+                preformatted.entry = None
+        return rv
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: tuple[logging.LogRecord, str] | None = getattr(self._preformatted, "entry", None)
+        if entry is not None and entry[0] is record:
+            return entry[1]
+        return super().format(record)
+
+
+def preformatting_handler_class(handler_class: type) -> type:
+    """
+    Return a subclass of a handler class that formats the records outside the handler lock, see `PreformattingHandlerMixin`.
+    :param handler_class: The handler class, e.g. `logging.FileHandler`.
+    :return: The class combining `PreformattingHandlerMixin` and `handler_class`, created once per handler class.
+    """
+    return mixin_handler_class(PreformattingHandlerMixin, handler_class)
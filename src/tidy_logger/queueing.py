@@ -0,0 +1,141 @@
+import logging
+import os
+import queue
+import threading
+import weakref
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable
+
+
+class QueueBarrier:
+    """A marker put into a record queue, whose callback is called by the listener thread once every record queued before it has been handled."""
+
+    __slots__ = ("callback",)
+
+    def __init__(self, callback: Callable[[], None]):
+        """
+        Initialize the QueueBarrier.
+        :param callback: Called once, on the listener thread, when the barrier is reached (or when it is discarded from a full queue).
+        """
+        self.callback = callback
+
+
+class BoundedQueueHandler(QueueHandler):
+    """A queue handler that only enqueues records on the caller's thread and applies a policy when the bounded queue is full."""
+
+    BLOCK: str = "block"
+    DROP_OLDEST: str = "drop_oldest"
+    DROP_NEWEST: str = "drop_newest"
+    QUEUE_FULL_POLICIES: tuple[str, ...] = (BLOCK, DROP_OLDEST, DROP_NEWEST)
+
+    def __init__(self, record_queue: queue.Queue, queue_full_policy: str = BLOCK):
+        """
+        Initialize the BoundedQueueHandler.
+        :param record_queue: The (bounded) queue the records are put into.
+        :param queue_full_policy: What to do when the queue is full: 'block' waits for a free slot, 'drop_oldest' discards the oldest queued record, 'drop_newest' discards the new record.
+        :raises ValueError: If `queue_full_policy` is not one of the supported policies.
+        """
+        if queue_full_policy not in self.QUEUE_FULL_POLICIES:
+            raise ValueError("`queue_full_policy` should be one of {}.".format(", ".join(f"'{p}'" for p in self.QUEUE_FULL_POLICIES)))
+        super().__init__(record_queue)
+        self.queue_full_policy = queue_full_policy
+        self.dropped_oldest_count: int = 0
+        self.dropped_newest_count: int = 0
+        self._counter_lock = threading.Lock()
+
+    @property
+    def dropped_count(self) -> int:
+        """The total number of records dropped because the queue was full."""
+        return self.dropped_oldest_count + self.dropped_newest_count
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Return the record unchanged.
+        The base implementation formats the record on the caller's thread, which is exactly the work the listener thread should do.
+        Records never leave the process, so they do not need to be made picklable.
+        """
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put the record into the queue according to the queue-full policy."""
+        if self.queue_full_policy == self.BLOCK:
+            self.queue.put(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        if self.queue_full_policy == self.DROP_NEWEST:
+            with self._counter_lock:
+                self.dropped_newest_count += 1
+            return
+
+        # drop oldest: make room and retry, the listener may be draining concurrently
+        while True:
+            try:
+                oldest = self.queue.get_nowait()
+                self.queue.task_done()
+                if isinstance(oldest, QueueBarrier):
+                    # Not a record, release its waiter instead of counting it as dropped
+                    oldest.callback()
+                else:
+                    with self._counter_lock:
+                        self.dropped_oldest_count += 1
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                continue
+
+
+class DrainingQueueListener(QueueListener):
+    """A queue listener whose `stop()` always drains the queue, even when the queue is full at the time of stopping.
+
+    A running listener is restarted in the child process after `fork()`, where its thread no longer exists.
+    """
+
+    _listeners: "weakref.WeakSet[DrainingQueueListener]" = weakref.WeakSet()
+
+    def start(self) -> None:
+        super().start()
+        self._listeners.add(self)
+
+    def handle(self, record: logging.LogRecord | QueueBarrier) -> None:
+        """Handle a record, or call the callback of a barrier."""
+        if isinstance(record, QueueBarrier):
+            record.callback()
+            return
+        super().handle(record)
+
+    def enqueue_sentinel(self) -> None:
+        """Block until the sentinel fits into the queue, so every record queued before it is handled."""
+        self.queue.put(self._sentinel)
+
+    def stop(self) -> None:
+        """Stop the listener after all the queued records have been handled. Does nothing if the listener is not running."""
+        if self._thread is None:
+            return
+        super().stop()
+        self._listeners.discard(self)
+
+    def _restart_after_fork(self) -> None:
+        # The records queued before the fork are handled by the parent process, and the locks of the queue may have been held by one of its threads
+        if isinstance(self.queue, queue.Queue):
+            self.queue.__init__(self.queue.maxsize)
+        self._thread = None
+        self.start()
+
+    @classmethod
+    def _restart_all_after_fork(cls) -> None:
+        for listener in list(cls._listeners):
+            if listener._thread is not None:
+                listener._restart_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=DrainingQueueListener._restart_all_after_fork)
@@ -0,0 +1,461 @@
+"""
+Reader of the log files written by TidyLogger in the 'text' format, and the `tidy-logger-query` command line tool.
+
+A record is a header line written by `IndentedMessageFormatter` (with its default format and date format), followed by the indented
+lines of its message. The files are memory-mapped and split into records with a regular expression on the mapped bytes, so only the
+matching records are copied. An optional sidecar index (`<log file>.idx`) keeps the offset, timestamp and level of each record, so
+repeated queries seek directly to the records instead of scanning the file again, and only the part appended since is scanned.
+"""
+
+import bisect
+import gzip
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator
+
+try:
+    from .file_handlers import zstd_open
+except ImportError:
+    from file_handlers import zstd_open
+
+# The header line of a record, see `IndentedMessageFormatter.default_logging_format` and `default_date_format`
+HEADER_PATTERN: re.Pattern = re.compile(
+    rb"(?P<time>\d\d/\d\d/\d{4} \d\d:\d\d:\d\d) \| (?P<level>\w+) \| (?P<file>.*?) (?P<function>\(unknown function\)|[^ ()]*)\(\) \(line: (?P<line>\d+)\) \[(?P<logger>[^\n]*?)\](?: \{(?P<context>[^\n]*)\})?:$",
+    re.M,
+)
+# The start of a header line, which is all the scan needs (the message lines are indented). The other fields are parsed when accessed.
+# A leading newline instead of `^` with re.M lets the regular expression engine search for the newlines, which is several times faster.
+_HEADER_START: bytes = rb"(?P<time>\d\d/\d\d/\d{4} \d\d:\d\d:\d\d) \| (?P<level>\w+) \| "
+_HEADER_START_PATTERN: re.Pattern = re.compile(rb"\n" + _HEADER_START)
+_FIRST_HEADER_START_PATTERN: re.Pattern = re.compile(_HEADER_START)
+
+INDEX_SUFFIX: str = ".idx"
+_INDEX_MAGIC: bytes = b"TIDYIDX1"
+# Magic, indexed size of the log file, number of records, whether the timestamps are sorted, CRC32 of the start of the log file
+_INDEX_HEADER: struct.Struct = struct.Struct("<8sQQ?I")
+# Number of bytes at the start of the log file whose checksum identifies the file
+_INDEX_CHECKSUM_SIZE: int = 4096
+
+# Suffixes of the backups of TimedSizeRotatingFileHandler ('.20260101-120000', '.20260101-120000-1') and RotatingFileHandler ('.1')
+_BACKUP_SUFFIX_PATTERN: re.Pattern = re.compile(r"^\.(?:(?P<number>\d+)|(?P<date>\d{8}-\d{6}(?:-(?P<counter>\d+))?))(?P<compression>\.gz|\.zst)?$")
+
+
+# Level numbers per level name
+_level_numbers: dict[bytes, int] = {}
+
+
+def _parse_level(level_name: bytes) -> int:
+    """Return the number of a level name, or 0 for unknown levels."""
+    levelno = _level_numbers.get(level_name)
+    if levelno is None:
+        level = logging.getLevelName(level_name.decode())
+        levelno = _level_numbers[level_name] = level if isinstance(level, int) else 0
+    return levelno
+
+
+class LogFileRecord:
+    """A record of a log file, whose header fields and text are only decoded when accessed."""
+
+    __slots__ = ("_data", "offset", "end", "timestamp", "levelno", "_header")
+
+    def __init__(self, data, offset: int, end: int, timestamp: float, levelno: int):
+        """
+        Initialize the LogFileRecord.
+        :param data: The (memory-mapped) content of the log file.
+        :param offset: The offset of the header line of the record.
+        :param end: The offset of the end of the record (the header of the next record, or the end of the file).
+        :param timestamp: The creation time of the record, as seconds since the epoch.
+        :param levelno: The level of the record, or 0 if the level name is unknown.
+        """
+        self._data = data
+        self.offset = offset
+        self.end = end
+        self.timestamp = timestamp
+        self.levelno = levelno
+        self._header: re.Match | bool | None = None
+
+    def _get_header_field(self, field: str) -> str:
+        """Return a field of the header line, or an empty string if the header line does not match `HEADER_PATTERN` (e.g. a different format)."""
+        if self._header is None:
+            self._header = HEADER_PATTERN.match(self._data, self.offset) or False
+        value: bytes | None = self._header[field] if self._header else None
+        return value.decode(errors="replace") if value is not None else ""
+
+    @property
+    def level_name(self) -> str:
+        return self._get_header_field("level")
+
+    @property
+    def file_name(self) -> str:
+        return self._get_header_field("file")
+
+    @property
+    def function_name(self) -> str:
+        return self._get_header_field("function")
+
+    @property
+    def line_number(self) -> int:
+        return int(self._get_header_field("line") or 0)
+
+    @property
+    def logger_name(self) -> str:
+        return self._get_header_field("logger")
+
+    @property
+    def context(self) -> str:
+        """The bound context of the header line (e.g. 'request_id=abc, tenant=acme'), or an empty string."""
+        return self._get_header_field("context")
+
+    @property
+    def raw(self) -> bytes:
+        """The bytes of the record, including the header line and the trailing empty line."""
+        start, end = self.offset, self.end
+        return self._data[start:end]
+
+    @property
+    def text(self) -> str:
+        """The text of the record, without trailing empty lines."""
+        return self.raw.rstrip(b"\r\n").decode(errors="replace")
+
+    def contains(self, text: bytes) -> bool:
+        """Return whether the record contains the text, without copying the record."""
+        return self._data.find(text, self.offset, self.end) >= 0
+
+    def __repr__(self) -> str:
+        return "LogFileRecord(offset={}, end={}, level={!r}, logger={!r})".format(self.offset, self.end, self.level_name, self.logger_name)
+
+
+class LogFileReader:
+    """
+    Reads the records of a log file written in the 'text' format, memory-mapped (or decompressed in memory for gzip and zstd backups).
+    Use it as a context manager, or call `close`; the records must not be used after the reader is closed.
+    """
+
+    def __init__(self, file_path: str | Path, use_index: bool = False):
+        """
+        Initialize the LogFileReader.
+        :param file_path: The path of the log file.
+        :param use_index: Whether to load the sidecar index of the file (`<file_path>.idx`), create it if needed, and update it with the records appended since. Compressed files are never indexed.
+        """
+        self.file_path = Path(file_path)
+        self.index_path = Path(str(self.file_path) + INDEX_SUFFIX)
+        self._mmap: mmap.mmap | None = None
+        self._data: bytes | mmap.mmap = b""
+        self._is_compressed: bool = self.file_path.suffix in (".gz", ".zst")
+        if self.file_path.suffix == ".gz":
+            with gzip.open(self.file_path, "rb") as file:
+                self._data = file.read()
+        elif self.file_path.suffix == ".zst":
+            with zstd_open(self.file_path, "rb") as file:
+                self._data = file.read()
+        else:
+            with open(self.file_path, "rb") as file:
+                if os.fstat(file.fileno()).st_size > 0:
+                    self._mmap = self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        # The size of the file when it was opened, records appended later are not read
+        self.size: int = len(self._data)
+        self._time_cache: tuple[bytes, float] = (b"", 0.0)
+
+        self._offsets: array | None = None
+        self._timestamps: array | None = None
+        self._levels: array | None = None
+        self._timestamps_sorted: bool = True
+        if use_index and not self._is_compressed:
+            self._load_or_build_index()
+
+    def __enter__(self) -> "LogFileReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._data = b""
+
+    def _parse_time(self, time_bytes: bytes) -> float:
+        """Return the timestamp of the time of a header ('%d/%m/%Y %H:%M:%S', local time). The last result is cached, as consecutive records often share the same second."""
+        cached_time_bytes, cached_timestamp = self._time_cache
+        if time_bytes == cached_time_bytes:
+            return cached_timestamp
+        timestamp: float = datetime(
+            int(time_bytes[6:10]), int(time_bytes[3:5]), int(time_bytes[0:2]), int(time_bytes[11:13]), int(time_bytes[14:16]), int(time_bytes[17:19])
+        ).timestamp()
+        self._time_cache = (time_bytes, timestamp)
+        return timestamp
+
+    def _scan(self, start: int = 0) -> Iterator[LogFileRecord]:
+        """Split the data from `start` (the start of a line) into records. Lines before the first header are skipped."""
+        data = self._data
+        parse_time = self._parse_time
+        previous: re.Match | None = _FIRST_HEADER_START_PATTERN.match(data, start, self.size)
+        previous_offset: int = start
+        for match in _HEADER_START_PATTERN.finditer(data, start, self.size):
+            # The header starts after the newline
+            offset: int = match.start() + 1
+            if previous is not None:
+                yield LogFileRecord(data, previous_offset, offset, parse_time(previous["time"]), _parse_level(previous["level"]))
+            previous = match
+            previous_offset = offset
+        if previous is not None:
+            yield LogFileRecord(data, previous_offset, self.size, parse_time(previous["time"]), _parse_level(previous["level"]))
+
+    def _checksum(self, size: int) -> int:
+        return zlib.crc32(self._data[: min(size, _INDEX_CHECKSUM_SIZE)])
+
+    def _load_or_build_index(self) -> None:
+        """Load the sidecar index, scan the records appended since it was written, and save it if it changed. The index is rebuilt if the file was replaced or truncated."""
+        offsets, timestamps, levels = array("q"), array("d"), array("H")
+        timestamps_sorted: bool = True
+        indexed_size: int = 0
+        try:
+            with open(self.index_path, "rb") as index_file:
+                magic, indexed_size, count, timestamps_sorted, checksum = _INDEX_HEADER.unpack(index_file.read(_INDEX_HEADER.size))
+                if magic != _INDEX_MAGIC or indexed_size > self.size or checksum != self._checksum(indexed_size):
+                    raise ValueError("The index does not match the log file.")
+                offsets.fromfile(index_file, count)
+                timestamps.fromfile(index_file, count)
+                levels.fromfile(index_file, count)
+        except (OSError, ValueError, EOFError, struct.error):
+            offsets, timestamps, levels = array("q"), array("d"), array("H")
+            timestamps_sorted = True
+            indexed_size = 0
+
+        if indexed_size != self.size or not self.index_path.exists():
+            # The last indexed record may have been continued, scan again from its header
+            start: int = 0
+            if offsets:
+                start = offsets.pop()
+                timestamps.pop()
+                levels.pop()
+            for record in self._scan(start):
+                if timestamps and record.timestamp < timestamps[-1]:
+                    timestamps_sorted = False
+                offsets.append(record.offset)
+                timestamps.append(record.timestamp)
+                levels.append(min(record.levelno, 0xFFFF))
+            self._save_index(offsets, timestamps, levels, timestamps_sorted)
+
+        self._offsets, self._timestamps, self._levels, self._timestamps_sorted = offsets, timestamps, levels, timestamps_sorted
+
+    def _save_index(self, offsets: array, timestamps: array, levels: array, timestamps_sorted: bool) -> None:
+        """Write the index to a temporary file and replace the previous index with it, so readers never see a partial index."""
+        temporary_path = Path(str(self.index_path) + ".tmp")
+        try:
+            with open(temporary_path, "wb") as index_file:
+                index_file.write(_INDEX_HEADER.pack(_INDEX_MAGIC, self.size, len(offsets), timestamps_sorted, self._checksum(self.size)))
+                offsets.tofile(index_file)
+                timestamps.tofile(index_file)
+                levels.tofile(index_file)
+            os.replace(temporary_path, self.index_path)
+        except OSError:
+            # E.g. a read-only directory, the index is only an optimization
+            temporary_path.unlink(missing_ok=True)
+
+    def records(self) -> Iterator[LogFileRecord]:
+        """Iterate over all the records of the file."""
+        return self.query()
+
+    def query(
+        self,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        min_level: int | str | None = None,
+        logger_name: str | None = None,
+        file_name: str | None = None,
+        function_name: str | None = None,
+        text: str | None = None,
+        pattern: str | re.Pattern | None = None,
+    ) -> Iterator[LogFileRecord]:
+        """
+        Iterate over the records matching all the given filters.
+        :param since: Only the records created at or after this time.
+        :param until: Only the records created before this time.
+        :param min_level: Only the records at this level or above.
+        :param logger_name: Only the records of this logger or its children (e.g. 'App' matches 'App' and 'App.db').
+        :param file_name: Only the records logged from this source file name (e.g. 'server.py').
+        :param function_name: Only the records logged from this function.
+        :param text: Only the records containing this text (case-sensitive).
+        :param pattern: Only the records matching this regular expression (applied to the text of the record).
+        """
+        since_timestamp: float | None = since.timestamp() if since is not None else None
+        until_timestamp: float | None = until.timestamp() if until is not None else None
+        levelno: int = logging._checkLevel(min_level) if min_level is not None else 0
+        text_bytes: bytes | None = text.encode() if text is not None else None
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern)
+        logger_prefix: str | None = logger_name + "." if logger_name is not None else None
+
+        for record in self._candidates(since_timestamp, until_timestamp, levelno, text_bytes):
+            if text_bytes is not None and not record.contains(text_bytes):
+                continue
+            if logger_name is not None and record.logger_name != logger_name and not record.logger_name.startswith(logger_prefix):
+                continue
+            if file_name is not None and record.file_name != file_name:
+                continue
+            if function_name is not None and record.function_name != function_name:
+                continue
+            if pattern is not None and pattern.search(record.text) is None:
+                continue
+            yield record
+
+    def _candidates(self, since_timestamp: float | None, until_timestamp: float | None, levelno: int, text: bytes | None) -> Iterator[LogFileRecord]:
+        """
+        Iterate over the records in the time range and at the level or above, from the index (seeking directly to them) or by scanning the file.
+        With the index, only the records where `text` (if any) occurs are considered, found by searching the whole time range at once.
+        """
+        if self._offsets is None:
+            for record in self._scan():
+                if (
+                    record.levelno >= levelno
+                    and (since_timestamp is None or record.timestamp >= since_timestamp)
+                    and (until_timestamp is None or record.timestamp < until_timestamp)
+                ):
+                    yield record
+            return
+
+        offsets, timestamps, levels = self._offsets, self._timestamps, self._levels
+        first, last = 0, len(offsets)
+        if self._timestamps_sorted:
+            if since_timestamp is not None:
+                first = bisect.bisect_left(timestamps, since_timestamp)
+            if until_timestamp is not None:
+                last = bisect.bisect_left(timestamps, until_timestamp)
+        if first >= last:
+            return
+        indices: Iterable[int] = range(first, last) if not text else self._find_text(text, first, last)
+        for i in indices:
+            timestamp: float = timestamps[i]
+            if levels[i] < levelno or (since_timestamp is not None and timestamp < since_timestamp) or (until_timestamp is not None and timestamp >= until_timestamp):
+                continue
+            yield LogFileRecord(self._data, offsets[i], offsets[i + 1] if i + 1 < len(offsets) else self.size, timestamp, levels[i])
+
+    def _find_text(self, text: bytes, first: int, last: int) -> Iterator[int]:
+        """Iterate over the indices of the indexed records from `first` to `last` (excluded) where the text occurs."""
+        data, offsets = self._data, self._offsets
+        end: int = offsets[last] if last < len(offsets) else self.size
+        position: int = data.find(text, offsets[first], end)
+        while position >= 0:
+            i: int = bisect.bisect_right(offsets, position, first, last) - 1
+            yield i
+            if i + 1 >= last:
+                return
+            position = data.find(text, offsets[i + 1], end)
+
+
+def rotated_log_files(file_path: str | Path) -> list[Path]:
+    """
+    Return the backups of a log file rotated by TidyLogger ('<name>.1', '<name>.20260101-120000', optionally compressed), oldest first, followed by the log file itself.
+    :param file_path: The path of the current log file.
+    :return: The paths of the existing backups and the log file.
+    """
+    file_path = Path(file_path)
+    numbered_backups: list[tuple[int, Path]] = []
+    dated_backups: list[tuple[str, int, Path]] = []
+    if file_path.parent.is_dir():
+        name_length: int = len(file_path.name)
+        for path in file_path.parent.iterdir():
+            if not path.name.startswith(file_path.name + "."):
+                continue
+            match = _BACKUP_SUFFIX_PATTERN.match(path.name[name_length:])
+            if match is None:
+                continue
+            if match["number"] is not None:
+                numbered_backups.append((int(match["number"]), path))
+            else:
+                dated_backups.append((match["date"][:15], int(match["counter"] or 0), path))
+    # The highest number is the oldest backup of RotatingFileHandler
+    paths: list[Path] = [path for _, path in sorted(numbered_backups, reverse=True)]
+    paths.extend(path for _, _, path in sorted(dated_backups))
+    if file_path.exists():
+        paths.append(file_path)
+    return paths
+
+
+def read_log_files(file_paths: Iterable[str | Path], include_rotated: bool = False, use_index: bool = False, **filters) -> Iterator[LogFileRecord]:
+    """
+    Iterate over the matching records of several log files, in order. Each file is closed when its records are exhausted.
+    :param file_paths: The paths of the log files.
+    :param include_rotated: Whether to also read the backups of each log file, before it.
+    :param use_index: Whether to use (and maintain) the sidecar indexes of the files, see `LogFileReader`.
+    :param filters: The filters of `LogFileReader.query`.
+    """
+    for file_path in file_paths:
+        for path in rotated_log_files(file_path) if include_rotated else [Path(file_path)]:
+            with LogFileReader(path, use_index=use_index) as reader:
+                yield from reader.query(**filters)
+
+
+def _parse_datetime(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, "%d/%m/%Y %H:%M:%S")
+
+
+def main(arguments: list[str] | None = None) -> int:
+    """The `tidy-logger-query` command: print the matching records of TidyLogger log files."""
+    # Only imported by the command, not by the handlers
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="tidy-logger-query", description="Print the records of TidyLogger log files (text format) matching all the given filters.")
+    parser.add_argument("files", nargs="+", type=Path, help="The log files.")
+    parser.add_argument("--rotated", action="store_true", help="Also read the rotated backups of each log file (oldest first).")
+    parser.add_argument("--index", action="store_true", help="Use a sidecar index of each log file (<file>.idx), created or updated as needed.")
+    parser.add_argument("--since", type=_parse_datetime, help="Only the records created at or after this time (ISO 8601 or 'dd/mm/YYYY HH:MM:SS').")
+    parser.add_argument("--until", type=_parse_datetime, help="Only the records created before this time.")
+    parser.add_argument("--level", help="Only the records at this level or above, e.g. WARNING.")
+    parser.add_argument("--logger", help="Only the records of this logger or its children.")
+    parser.add_argument("--file", help="Only the records logged from this source file name.")
+    parser.add_argument("--function", help="Only the records logged from this function.")
+    parser.add_argument("--grep", help="Only the records containing this text.")
+    parser.add_argument("--regex", help="Only the records matching this regular expression.")
+    parser.add_argument("--count", action="store_true", help="Only print the number of matching records.")
+    args = parser.parse_args(arguments)
+
+    level: int | None = None
+    if args.level is not None:
+        try:
+            level = logging._checkLevel(args.level.upper())
+        except ValueError:
+            parser.error(f"unknown level: {args.level}")
+
+    records: Iterator[LogFileRecord] = read_log_files(
+        args.files,
+        include_rotated=args.rotated,
+        use_index=args.index,
+        since=args.since,
+        until=args.until,
+        min_level=level,
+        logger_name=args.logger,
+        file_name=args.file,
+        function_name=args.function,
+        text=args.grep,
+        pattern=args.regex,
+    )
+    try:
+        if args.count:
+            print(sum(1 for _ in records))
+        else:
+            output = sys.stdout.buffer
+            for record in records:
+                output.write(record.raw)
+            output.flush()
+    except BrokenPipeError:
+        # E.g. piped into `head`
+        sys.stderr.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
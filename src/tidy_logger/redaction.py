@@ -0,0 +1,251 @@
+import logging
+import re
+from typing import Any, Iterable
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:
+    # Python 3.10
+    import sre_constants
+    import sre_parse
+
+# The repeat and group operators of the parsed patterns, see `_required_needles` (the possessive and atomic forms are Python 3.11+)
+_REPEAT_OPERATORS: tuple = tuple(op for op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, "POSSESSIVE_REPEAT", None)) if op is not None)
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+
+# The flags of a compiled pattern that are kept when it is combined with the other patterns, as a scoped inline flag group
+_SCOPED_FLAGS: tuple[tuple[int, str], ...] = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"), (re.VERBOSE, "x"))
+
+
+def _required_needles(items: Iterable[tuple], ignore_case: bool) -> frozenset[str] | None:
+    """
+    Find strings of which at least one appears in any match of a parsed pattern, so the texts containing none of them can skip the pattern.
+    :param items: The (operator, argument) items of the parsed pattern (an `sre_parse.SubPattern`).
+    :param ignore_case: Whether the items match regardless of case.
+    :return: The most selective set of strings found (the longest, then the fewest), or None if every match may contain none of them.
+    """
+    candidates: list[frozenset[str]] = []
+    literal_run: list[str] = []
+
+    def end_literal_run() -> None:
+        if literal_run:
+            candidates.append(frozenset(("".join(literal_run),)))
+            literal_run.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            character: str = chr(av)
+            # Letters matched regardless of case also match other characters (e.g. 'k' matches the Kelvin sign)
+            if not (ignore_case and character.lower() != character.upper()):
+                literal_run.append(character)
+                continue
+            end_literal_run()
+            continue
+        end_literal_run()
+        needles: frozenset[str] | None = None
+        if op is sre_constants.IN:
+            if all(item_op is sre_constants.LITERAL for item_op, _ in av):
+                characters: frozenset[str] = frozenset(chr(item_av) for _, item_av in av)
+                if not (ignore_case and any(c.lower() != c.upper() for c in characters)):
+                    needles = characters
+        elif op is sre_constants.SUBPATTERN:
+            _, add_flags, del_flags, subpattern = av
+            needles = _required_needles(subpattern, (ignore_case or bool(add_flags & re.IGNORECASE)) and not del_flags & re.IGNORECASE)
+        elif op in _REPEAT_OPERATORS:
+            min_count, _, subpattern = av
+            if min_count >= 1:
+                needles = _required_needles(subpattern, ignore_case)
+        elif op is _ATOMIC_GROUP:
+            needles = _required_needles(av, ignore_case)
+        elif op is sre_constants.BRANCH:
+            branch_needles: list[frozenset[str] | None] = [_required_needles(branch, ignore_case) for branch in av[1]]
+            if all(branch_needles):
+                needles = frozenset().union(*branch_needles)
+        if needles:
+            candidates.append(needles)
+    end_literal_run()
+    if not candidates:
+        return None
+    return max(candidates, key=lambda needles: (min(map(len, needles)), -len(needles)))
+
+
+class Redactor:
+    """Replace secrets and personal data (tokens, passwords, emails) in the messages, `extra` fields and exception details of the records.
+
+    The patterns and the literal keys are compiled once into a single regular expression, so a text is scanned in one pass.
+    A key redacts the value that follows it in 'key=value', 'key: value' and '"key": "value"' (the key is kept), and the whole value of the
+    `extra` fields whose name contains it. Texts containing none of the strings that every match requires (e.g. '@' for an email) are
+    returned without running the expression, and the results of the short texts are cached, as the same messages are often logged again.
+    """
+
+    DEFAULT_REPLACEMENT: str = "[REDACTED]"
+
+    # Email addresses, and JSON Web Tokens (a base64url-encoded JSON header, payload and signature)
+    DEFAULT_PATTERNS: tuple[str, ...] = (r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+", r"eyJ[\w-]+\.[\w-]+\.[\w-]*")
+    DEFAULT_KEYS: tuple[str, ...] = ("password", "passwd", "secret", "token", "api_key", "apikey", "authorization", "credential")
+
+    # Texts longer than this are not cached
+    MAX_CACHED_LENGTH: int = 4096
+
+    # The value of a key: quoted, or up to the next separator, optionally after an authorization scheme (e.g. 'Authorization: Bearer <token>')
+    _key_value_pattern: str = r"""(?:(?i:bearer|basic|token)\s+)?(?:"[^"\n]*"|'[^'\n]*'|[^\s"',;&}\]]+)"""
+
+    def __init__(self, patterns: Iterable[str | re.Pattern] = (), keys: Iterable[str] = (), replacement: str = DEFAULT_REPLACEMENT, cache_size: int = 1024):
+        """
+        Initialize the Redactor.
+        :param patterns: The regular expressions of the texts to replace. They are combined into one expression, so they cannot use numbered backreferences or global inline flags (e.g. a leading '(?i)', use '(?i:...)' or a compiled pattern instead).
+        :param keys: The names (case-insensitive) whose values are replaced, e.g. 'password'.
+        :param replacement: The text that replaces a match, or the value of a key.
+        :param cache_size: Maximum number of cached texts.
+        :raises ValueError: If neither `patterns` nor `keys` is given, if `cache_size` is negative, or if a pattern is invalid.
+        """
+        patterns = list(patterns)
+        self.keys: tuple[str, ...] = tuple(key.lower() for key in keys)
+        if not patterns and not self.keys:
+            raise ValueError("`patterns` or `keys` should be specified.")
+        if cache_size < 0:
+            raise ValueError("`cache_size` should be a non-negative integer.")
+        self.replacement = replacement
+        self.cache_size = cache_size
+
+        sources: list[str] = []
+        if self.keys:
+            key_names: str = "|".join(re.escape(key) for key in sorted(self.keys, key=len, reverse=True))
+            # The match starts at the key, not at the start of the name containing it (e.g. 'access_token'), which is kept anyway
+            sources.append(r"""(?P<tidy_key>(?i:(?:{})[\w-]*)["']?\s*[:=]\s*){}""".format(key_names, self._key_value_pattern))
+        for pattern in patterns:
+            if isinstance(pattern, re.Pattern):
+                flags: str = "".join(letter for flag, letter in _SCOPED_FLAGS if pattern.flags & flag)
+                sources.append("(?{}:{})".format(flags, pattern.pattern) if flags else "(?:{})".format(pattern.pattern))
+            else:
+                sources.append("(?:{})".format(pattern))
+        try:
+            self.regex: re.Pattern = re.compile("|".join(sources))
+        except re.error as e:
+            raise ValueError("Invalid redaction pattern: {}".format(e))
+        self._key_group_index: int | None = self.regex.groupindex.get("tidy_key")
+
+        # A text containing none of these strings has no match. None if some pattern has no required string
+        self.prefilter_needles: tuple[str, ...] | None = None
+        try:
+            needles: set[str] = set()
+            for source in sources:
+                source_needles: frozenset[str] | None = _required_needles(sre_parse.parse(source), False)
+                if source_needles is None:
+                    break
+                needles.update(source_needles)
+            else:
+                # The shortest first, they are the most likely to be found
+                self.prefilter_needles = tuple(sorted(needles, key=len))
+        except Exception:
+            # The parser is internal to the `re` module, the redaction still works without the prefilter
+            self.prefilter_needles = None
+
+        self._cache: dict[str, str] = {}
+        # Whether each `extra` field name contains a key
+        self._sensitive_field_names: dict[str, bool] = {}
+
+    def _replace_match(self, match: re.Match) -> str:
+        key_group_index: int | None = self._key_group_index
+        if key_group_index is not None:
+            prefix: str | None = match.group(key_group_index)
+            if prefix is not None:
+                # The first character of the value, after the key
+                first_character: str = match.string[match.end(key_group_index)]
+                quote: str = first_character if first_character in "\"'" else ""
+                return "{}{}{}{}".format(prefix, quote, self.replacement, quote)
+        return self.replacement
+
+    def redact(self, text: str) -> str:
+        """
+        Return a text with its secrets replaced.
+        :param text: The text to redact.
+        :return: The redacted text (the same object if nothing is replaced).
+        """
+        needles: tuple[str, ...] | None = self.prefilter_needles
+        if needles is not None:
+            for needle in needles:
+                if needle in text:
+                    break
+            else:
+                return text
+        cacheable: bool = len(text) <= self.MAX_CACHED_LENGTH
+        if cacheable:
+            redacted_text: str | None = self._cache.get(text)
+            if redacted_text is not None:
+                return redacted_text
+        redacted_text = self.regex.sub(self._replace_match, text)
+        if cacheable and self.cache_size:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[text] = redacted_text
+        return redacted_text
+
+    def apply(self, record: logging.LogRecord, text: str, cache_attribute: str = "_tidy_redacted_message") -> str:
+        """
+        Return a text of a record (its message, or its exception text) with its secrets replaced. The result is cached on the record, so the formatters of all the handlers share it.
+        :param record: The record, which caches the result.
+        :param text: The text of the record.
+        :param cache_attribute: The attribute of the record caching the result, per text.
+        :return: The redacted text.
+        """
+        cached: tuple[Redactor, str, str] | None = record.__dict__.get(cache_attribute)
+        if cached is not None and cached[0] is self and cached[1] is text:
+            return cached[2]
+        redacted_text: str = self.redact(text)
+        record.__dict__[cache_attribute] = (self, text, redacted_text)
+        return redacted_text
+
+    def is_sensitive_field(self, name: str) -> bool:
+        """Return whether a field name contains one of the keys, so its whole value is replaced."""
+        sensitive: bool | None = self._sensitive_field_names.get(name)
+        if sensitive is None:
+            lowercase_name: str = name.lower()
+            sensitive = any(key in lowercase_name for key in self.keys)
+            if len(self._sensitive_field_names) >= 1024:
+                self._sensitive_field_names.clear()
+            self._sensitive_field_names[name] = sensitive
+        return sensitive
+
+    def redact_fields(self, fields: dict) -> dict:
+        """
+        Return the `extra` fields of a record with their secrets replaced: the values of the sensitive field names, and the secrets in the texts (including in nested dictionaries and lists).
+        :param fields: The fields to redact, which are not changed.
+        :return: A new dictionary of the redacted fields.
+        """
+        return {name: self.replacement if isinstance(name, str) and self.is_sensitive_field(name) else self._redact_value(value) for name, value in fields.items()}
+
+    def _redact_value(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return self.redact(value)
+        if isinstance(value, dict):
+            return self.redact_fields(value)
+        if isinstance(value, (list, tuple)):
+            return [self._redact_value(item) for item in value]
+        return value
+
+    def redact_exception_tree(self, tree: dict) -> dict:
+        """
+        Replace the secrets in the messages and source lines of an exception tree built by `exception_to_dict`.
+        The tree is walked iteratively, like it is built. The frame dictionaries (which are shared by the trees, see `exception_rendering._format_frame`) are replaced, not changed.
+        :param tree: The exception tree, changed in place.
+        :return: The tree.
+        """
+        nodes: list[dict] = [tree]
+        while nodes:
+            node: dict = nodes.pop()
+            node["message"] = self.redact(node["message"])
+            frames: list[dict] | None = node.get("frames")
+            if frames:
+                for i, frame in enumerate(frames):
+                    code: str | None = frame.get("code")
+                    if code:
+                        redacted_code: str = self.redact(code)
+                        if redacted_code is not code:
+                            frames[i] = dict(frame, code=redacted_code)
+            for key in ("cause", "context"):
+                if key in node:
+                    nodes.append(node[key])
+            nodes.extend(node.get("exceptions", ()))
+        return tree
@@ -0,0 +1,130 @@
+import logging
+import sys
+from pathlib import Path
+
+
+class _CompactRecord:
+    """The fields of a LogRecord needed to format it later, without its dictionary and the derived fields."""
+
+    __slots__ = ("name", "levelno", "pathname", "lineno", "funcName", "msg", "args", "exc_info", "stack_info", "created", "thread", "threadName", "process", "context")
+
+    def __init__(self, record: logging.LogRecord):
+        self.name = record.name
+        self.levelno = record.levelno
+        self.pathname = record.pathname
+        self.lineno = record.lineno
+        self.funcName = record.funcName
+        self.msg = record.msg
+        self.args = record.args
+        self.exc_info = record.exc_info
+        self.stack_info = record.stack_info
+        self.created = record.created
+        self.thread = record.thread
+        self.threadName = record.threadName
+        self.process = record.process
+        # The bound context, see `context.BoundContext`
+        self.context = record.__dict__.get("_tidy_context")
+
+    def to_log_record(self) -> logging.LogRecord:
+        # The arguments are set afterwards, as LogRecord would unwrap them again if they are a mapping (e.g. "%(key)s", {"key": ...})
+        record = logging.LogRecord(self.name, self.levelno, self.pathname, self.lineno, self.msg, None, self.exc_info, func=self.funcName, sinfo=self.stack_info)
+        record.args = self.args
+        # Restore the time and the origin of the original record
+        record.created = self.created
+        record.msecs = int(self.created * 1000) % 1000
+        record.thread = self.thread
+        record.threadName = self.threadName
+        record.process = self.process
+        if self.context is not None:
+            record._tidy_context = self.context
+        return record
+
+
+class RingBufferHandler(logging.Handler):
+    """A handler that keeps the last `capacity` records in memory, without formatting them, so they can be dumped to a file after a crash.
+
+    The records are stored in a preallocated list as compact objects with the unformatted message and its arguments, so keeping DEBUG
+    records costs an object per record and no formatting or I/O. The oldest record is overwritten when the buffer is full.
+    Note that the arguments and the exceptions of the records are kept by reference until they are overwritten.
+    """
+
+    def __init__(self, capacity: int = 1000, level: int | str = logging.NOTSET):
+        """
+        Initialize the RingBufferHandler.
+        :param capacity: Maximum number of records kept in memory.
+        :param level: The level of the handler.
+        :raises ValueError: If `capacity` is not positive.
+        """
+        if capacity <= 0:
+            raise ValueError("`capacity` should be a positive integer.")
+        super().__init__(level=level)
+        self.capacity = capacity
+        self._records: list[_CompactRecord | None] = [None] * capacity
+        self._next_index: int = 0
+        self._record_count: int = 0
+        self.dump_count: int = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._records[self._next_index] = _CompactRecord(record)
+            self._next_index = (self._next_index + 1) % self.capacity
+            if self._record_count < self.capacity:
+                self._record_count += 1
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def __len__(self) -> int:
+        return self._record_count
+
+    def get_records(self) -> list[logging.LogRecord]:
+        """Return the kept records as LogRecords, the oldest first."""
+        with self.lock:
+            start_index: int = (self._next_index - self._record_count) % self.capacity
+            compact_records: list[_CompactRecord] = [self._records[(start_index + i) % self.capacity] for i in range(self._record_count)]
+        return [compact_record.to_log_record() for compact_record in compact_records]
+
+    def clear(self) -> None:
+        """Discard the kept records."""
+        with self.lock:
+            self._records = [None] * self.capacity
+            self._next_index = 0
+            self._record_count = 0
+
+    def estimated_memory_usage(self) -> int:
+        """
+        Estimate the memory used by the kept records.
+        :return: The approximate size in bytes of the buffer, the compact records, their argument tuples and their messages (not the objects the arguments refer to).
+        """
+        with self.lock:
+            size: int = sys.getsizeof(self._records)
+            for compact_record in self._records:
+                if compact_record is not None:
+                    size += sys.getsizeof(compact_record) + sys.getsizeof(compact_record.args) + sys.getsizeof(compact_record.msg)
+        return size
+
+    def dump(self, file_path: str | Path, formatter: logging.Formatter | None = None) -> Path:
+        """
+        Format the kept records and write them to a file, the oldest first. A record that cannot be formatted is reported by `handleError` and skipped.
+        :param file_path: The path of the dump file. It is overwritten if it exists.
+        :param formatter: The formatter of the records. If None, the formatter of the handler or the default formatter is used.
+        :return: The path of the dump file.
+        """
+        if formatter is None:
+            formatter = self.formatter or logging.Formatter()
+        file_path = Path(file_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, "w", encoding="utf-8", errors="backslashreplace") as dump_file:
+            for record in self.get_records():
+                try:
+                    text: str = formatter.format(record)
+                except RecursionError:
+                    raise
+                except Exception:
+                    self.handleError(record)
+                    continue
+                dump_file.write(text)
+                dump_file.write("\n")
+        self.dump_count += 1
+        return file_path
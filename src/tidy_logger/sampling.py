@@ -0,0 +1,153 @@
+import logging
+import random
+import threading
+import zlib
+from collections import OrderedDict, deque
+
+
+class SamplingFilter(logging.Filter):
+    """A logger filter that keeps only a sample of the records, e.g. to leave DEBUG logging on in production.
+
+    Records are sampled per level with a rate between 0 (drop all) and 1 (keep all). If `key_field` is specified and a record has
+    that attribute (e.g. a request id passed via `extra`), the decision is derived from a hash of its value, so all the records of
+    a request are either kept or dropped together. With tail sampling, the dropped records of a request are held in a bounded buffer
+    instead, and are written when a record at `tail_flush_level` or above is logged for the same request.
+
+    The filter runs before any handler, so the message of a dropped record is never interpolated or formatted.
+    """
+
+    BYPASS_ATTRIBUTE: str = "_tidy_sampling_bypass"
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        level_rates: dict[int | str, float] | None = None,
+        key_field: str | None = None,
+        tail_sampling: bool = False,
+        tail_buffer_size: int = 100,
+        tail_max_contexts: int = 1024,
+        tail_flush_level: int = logging.WARNING,
+    ):
+        """
+        Initialize the SamplingFilter.
+        :param logger: The logger the held records are logged to when they are flushed (the logger the filter is added to).
+        :param level_rates: The fraction of the records to keep per level, e.g. {logging.DEBUG: 0.01}. Records of other levels are all kept.
+        :param key_field: The name of the record attribute (passed via `extra`, or bound with `TidyLogger.bind`) used for deterministic sampling and for tail sampling, e.g. 'request_id'.
+        :param tail_sampling: Whether to hold the dropped records of each `key_field` value, and write them when a record at `tail_flush_level` or above is logged with the same value.
+        :param tail_buffer_size: Maximum number of held records per `key_field` value, the oldest record is discarded first.
+        :param tail_max_contexts: Maximum number of `key_field` values with held records, the least recently used one is discarded first.
+        :param tail_flush_level: The level of the records that write the held records of their `key_field` value. Default is WARNING.
+        :raises ValueError: If a rate is not between 0 and 1, a level name is unknown, `tail_sampling` is used without `key_field`, or `tail_buffer_size` or `tail_max_contexts` is not positive.
+        """
+        rates: dict[int, float] = {}
+        for level, rate in (level_rates or {}).items():
+            if not 0 <= rate <= 1:
+                raise ValueError("`level_rates` should only contain rates between 0 and 1.")
+            if isinstance(level, str):
+                level = logging.getLevelName(level)
+                if not isinstance(level, int):
+                    raise ValueError("`level_rates` should only contain level numbers or registered level names.")
+            rates[level] = rate
+        if tail_sampling and key_field is None:
+            raise ValueError("`key_field` should be specified for tail sampling.")
+        if tail_buffer_size <= 0:
+            raise ValueError("`tail_buffer_size` should be a positive integer.")
+        if tail_max_contexts <= 0:
+            raise ValueError("`tail_max_contexts` should be a positive integer.")
+        super().__init__()
+        self.logger = logger
+        self.level_rates = rates
+        self.key_field = key_field
+        self.tail_sampling = tail_sampling
+        self.tail_buffer_size = tail_buffer_size
+        self.tail_max_contexts = tail_max_contexts
+        self.tail_flush_level = tail_flush_level
+        self.kept_count: int = 0
+        self.dropped_count: int = 0
+        self.held_count: int = 0
+        self.flushed_count: int = 0
+        # Rates as thresholds of the 32-bit hash of the key, for deterministic sampling
+        self._hash_thresholds: dict[int, int] = {level: int(rate * 2**32) for level, rate in rates.items()}
+        self._held_records: OrderedDict[str, deque[logging.LogRecord]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _is_sampled(self, levelno: int, key) -> bool:
+        rate: float | None = self.level_rates.get(levelno)
+        if rate is None or rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        if key is None:
+            return random.random() < rate
+        return zlib.crc32(str(key).encode()) < self._hash_thresholds[levelno]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record_dict: dict = record.__dict__
+        if record_dict.get(self.BYPASS_ATTRIBUTE):
+            return True
+
+        key = None
+        if self.key_field is not None:
+            key = record_dict.get(self.key_field)
+            if key is None:
+                # The field can also be bound to the record, see `context.BoundContext`
+                context = record_dict.get("_tidy_context")
+                if context is not None:
+                    key = context.get(self.key_field)
+
+        if self.tail_sampling and key is not None:
+            key = str(key)
+            if record.levelno >= self.tail_flush_level:
+                self._flush_held_records(key)
+            elif not self._is_sampled(record.levelno, key):
+                self._hold(key, record)
+                return False
+
+        is_sampled: bool = self._is_sampled(record.levelno, key)
+        # Counted under the lock, as the records of several threads are filtered concurrently
+        with self._lock:
+            if is_sampled:
+                self.kept_count += 1
+            else:
+                self.dropped_count += 1
+        return is_sampled
+
+    def _hold(self, key: str, record: logging.LogRecord) -> None:
+        with self._lock:
+            held_records = self._held_records.get(key)
+            if held_records is None:
+                held_records = self._held_records[key] = deque(maxlen=self.tail_buffer_size)
+                if len(self._held_records) > self.tail_max_contexts:
+                    _, discarded_records = self._held_records.popitem(last=False)
+                    self.dropped_count += len(discarded_records)
+            else:
+                self._held_records.move_to_end(key)
+            if len(held_records) == self.tail_buffer_size:
+                self.dropped_count += 1
+            held_records.append(record)
+            self.held_count += 1
+
+    def _flush_held_records(self, key: str) -> None:
+        with self._lock:
+            held_records = self._held_records.pop(key, None)
+            if held_records:
+                self.flushed_count += len(held_records)
+        if not held_records:
+            return
+        for held_record in held_records:
+            setattr(held_record, self.BYPASS_ATTRIBUTE, True)
+            self.logger.handle(held_record)
+
+    def stats(self) -> dict:
+        """
+        Return the sampling statistics.
+        :return: A dictionary with the numbers of kept, dropped, held and flushed records, and the number of `key_field` values with held records.
+        """
+        with self._lock:
+            return {
+                "kept": self.kept_count,
+                "dropped": self.dropped_count,
+                "held": self.held_count,
+                "flushed": self.flushed_count,
+                "held_contexts": len(self._held_records),
+            }
@@ -0,0 +1,470 @@
+import collections
+import logging
+import os
+import queue
+import random
+import re
+import select
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+
+try:
+    from .formatters import JsonLinesFormatter
+except ImportError:
+    from formatters import JsonLinesFormatter
+
+# The length prefix of the frames of the spool files, and of the 'length_prefixed' framing (network byte order)
+_SPOOL_LENGTH = struct.Struct("<I")
+_FRAME_LENGTH = struct.Struct(">I")
+
+
+class DiskSpool:
+    """A bounded first-in first-out buffer of records on disk, holding the records a `ShippingHandler` could not send.
+
+    The records are appended to segment files ('spool-<number>.bin', each record prefixed by its length) and read back from the
+    oldest segment, which is deleted once all its records are consumed. When the spool exceeds `max_bytes`, the oldest segments are
+    deleted and their records counted as dropped. The segments left by a previous process are replayed first (a partially replayed
+    segment is replayed whole, so the collector may receive some records twice). A record torn by a crash ends its segment, as the
+    next process appends to a new segment.
+    Not thread-safe: it is only used by the sender thread of the handler.
+    """
+
+    _segment_name_pattern: re.Pattern = re.compile(r"spool-(\d+)\.bin")
+
+    def __init__(self, directory: str | Path, max_bytes: int = 64 * 1024 * 1024, segment_size: int = 1024 * 1024):
+        """
+        Initialize the DiskSpool.
+        :param directory: The directory of the segment files, created on the first spooled record.
+        :param max_bytes: Maximum size in bytes of the segment files. The oldest records are dropped beyond it.
+        :param segment_size: Size in bytes of a segment file before the next one is started.
+        :raises ValueError: If `max_bytes` or `segment_size` is not positive.
+        """
+        if max_bytes <= 0:
+            raise ValueError("`max_bytes` should be a positive integer.")
+        if segment_size <= 0:
+            raise ValueError("`segment_size` should be a positive integer.")
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        # A segment is never larger than the spool, so dropping the oldest segment always makes room
+        self.segment_size: int = min(segment_size, max(1, max_bytes // 4))
+        self.record_count: int = 0
+        self.byte_count: int = 0
+        self.dropped_record_count: int = 0
+        # [path, size in bytes, number of records] of each segment, the oldest first
+        self._segments: collections.deque[list] = collections.deque()
+        self._next_segment_number: int = 1
+        self._write_file = None
+        # The records of the oldest segment, and the number of them already consumed
+        self._read_records: list[bytes] | None = None
+        self._read_index: int = 0
+        if self.directory.is_dir():
+            self._load_segments()
+
+    def _load_segments(self) -> None:
+        """Find the segments left by a previous process, the oldest first."""
+        numbered_paths: list[tuple[int, Path]] = []
+        for path in self.directory.iterdir():
+            match = self._segment_name_pattern.fullmatch(path.name)
+            if match is not None:
+                numbered_paths.append((int(match.group(1)), path))
+        numbered_paths.sort()
+        for number, path in numbered_paths:
+            size: int = path.stat().st_size
+            self._segments.append([path, size, len(self._read_segment(path))])
+            self.byte_count += size
+            self.record_count += self._segments[-1][2]
+            self._next_segment_number = number + 1
+
+    @staticmethod
+    def _read_segment(path: Path) -> list[bytes]:
+        """Return the records of a segment file, without the torn record at its end (if any)."""
+        data: bytes = path.read_bytes()
+        records: list[bytes] = []
+        position: int = 0
+        while position + _SPOOL_LENGTH.size <= len(data):
+            (length,) = _SPOOL_LENGTH.unpack_from(data, position)
+            start: int = position + _SPOOL_LENGTH.size
+            end: int = start + length
+            if end > len(data):
+                break
+            records.append(data[start:end])
+            position = end
+        return records
+
+    def __len__(self) -> int:
+        return self.record_count
+
+    def append(self, records: list[bytes]) -> None:
+        """Append records to the newest segment, then drop the oldest segments if the spool is too large."""
+        if not records:
+            return
+        data: bytes = b"".join(_SPOOL_LENGTH.pack(len(record)) + record for record in records)
+        if self._write_file is None or self._segments[-1][1] >= self.segment_size:
+            self._start_segment()
+        self._write_file.write(data)
+        self._write_file.flush()
+        segment: list = self._segments[-1]
+        segment[1] += len(data)
+        segment[2] += len(records)
+        self.byte_count += len(data)
+        self.record_count += len(records)
+        while self.byte_count > self.max_bytes and len(self._segments) > 1:
+            self._remove_oldest_segment(dropped=True)
+
+    def _start_segment(self) -> None:
+        self._close_write_file()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path: Path = self.directory / "spool-{:08d}.bin".format(self._next_segment_number)
+        self._next_segment_number += 1
+        self._write_file = open(path, "ab")
+        self._segments.append([path, 0, 0])
+
+    def _close_write_file(self) -> None:
+        if self._write_file is not None:
+            self._write_file.close()
+            self._write_file = None
+
+    def _remove_oldest_segment(self, dropped: bool) -> None:
+        path, size, count = self._segments.popleft()
+        if not self._segments:
+            self._close_write_file()
+        remaining_count: int = count
+        if self._read_records is not None:
+            remaining_count = len(self._read_records) - self._read_index
+            self._read_records = None
+            self._read_index = 0
+        if dropped:
+            self.dropped_record_count += remaining_count
+        self.record_count -= remaining_count
+        self.byte_count -= size
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def peek(self, max_count: int) -> list[bytes]:
+        """Return up to `max_count` of the oldest records, without consuming them."""
+        while self._segments:
+            if self._read_records is None:
+                if len(self._segments) == 1:
+                    # The records appended from now on go to a new segment, which is read after this one
+                    self._close_write_file()
+                self._read_records = self._read_segment(self._segments[0][0])
+                self._read_index = 0
+            if self._read_index < len(self._read_records):
+                start: int = self._read_index
+                end: int = start + max_count
+                return self._read_records[start:end]
+            self._remove_oldest_segment(dropped=False)
+        return []
+
+    def consume(self, count: int) -> None:
+        """Remove the `count` oldest records, returned by `peek`."""
+        self._read_index += count
+        self.record_count -= count
+        if self._read_index >= len(self._read_records):
+            self._remove_oldest_segment(dropped=False)
+
+    def close(self) -> None:
+        """Close the segment being written. The remaining records stay on disk for the next process."""
+        self._close_write_file()
+
+
+class ShippingHandler(logging.Handler):
+    """A handler that sends the records in batches to a remote collector over a persistent TCP or Unix socket connection.
+
+    `emit` formats the record (as a JSON line by default) and puts it into a bounded queue, and never waits: when the queue is full,
+    the record is dropped and counted. A sender thread takes the records in batches (up to `batch_size` records, or those queued
+    within `flush_interval`) and writes each batch with a single `sendall`, as newline-delimited records ('ndjson') or records
+    prefixed by their length as a 4-byte big-endian integer ('length_prefixed'). When the collector is unreachable, the connection
+    is retried with an exponential backoff, and the batches are appended to a `DiskSpool`, which is replayed in order (before any
+    newer record) once the connection is back.
+    """
+
+    FRAMINGS: tuple[str, ...] = ("ndjson", "length_prefixed")
+
+    def __init__(
+        self,
+        address: tuple[str, int] | str | Path,
+        framing: str = "ndjson",
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        queue_size: int = 10000,
+        spool_directory: str | Path | None = None,
+        max_spool_bytes: int = 64 * 1024 * 1024,
+        connect_timeout: float = 5.0,
+        send_timeout: float = 10.0,
+        min_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        level: int | str = logging.NOTSET,
+    ):
+        """
+        Initialize the ShippingHandler and start its sender thread.
+        :param address: The address of the collector: a (host, port) tuple for TCP, or the path of a Unix socket.
+        :param framing: 'ndjson' to end each record with a newline (the formatted records must be single lines), or 'length_prefixed' to prefix each record with its length.
+        :param batch_size: Maximum number of records sent at once.
+        :param flush_interval: Maximum number of seconds a record waits for more records to fill its batch.
+        :param queue_size: Maximum number of records waiting for the sender thread. Records emitted when the queue is full are dropped.
+        :param spool_directory: The directory of the on-disk spool of the records that could not be sent. If None, these records are dropped.
+        :param max_spool_bytes: Maximum size in bytes of the spool. The oldest spooled records are dropped beyond it.
+        :param connect_timeout: Maximum number of seconds to wait for a connection.
+        :param send_timeout: Maximum number of seconds to wait for a batch to be sent, after which the connection is considered broken.
+        :param min_backoff: Number of seconds before the first connection retry. It doubles after each failure, up to `max_backoff`.
+        :param max_backoff: Maximum number of seconds between connection retries.
+        :param level: The level of the handler.
+        :raises ValueError: If `framing` is not supported, or if `batch_size`, `queue_size`, `flush_interval`, `min_backoff` or `max_backoff` is not positive, or if `address` is a path and Unix sockets are not supported (e.g. on Windows).
+        """
+        if framing not in self.FRAMINGS:
+            raise ValueError("`framing` should be one of {}.".format(", ".join(f"'{f}'" for f in self.FRAMINGS)))
+        if not isinstance(address, tuple) and not hasattr(socket, "AF_UNIX"):
+            raise ValueError("`address` should be a (host, port) tuple, Unix sockets are not supported on this platform.")
+        if batch_size <= 0:
+            raise ValueError("`batch_size` should be a positive integer.")
+        if queue_size <= 0:
+            raise ValueError("`queue_size` should be a positive integer.")
+        if flush_interval <= 0 or min_backoff <= 0 or max_backoff <= 0:
+            raise ValueError("`flush_interval`, `min_backoff` and `max_backoff` should be positive.")
+        super().__init__(level)
+        self.setFormatter(JsonLinesFormatter())
+        self.address: tuple[str, int] | str = address if isinstance(address, tuple) else os.fspath(address)
+        self.framing = framing
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.connect_timeout = connect_timeout
+        self.send_timeout = send_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.spool: DiskSpool | None = None if spool_directory is None else DiskSpool(spool_directory, max_bytes=max_spool_bytes)
+
+        self.dropped_record_count: int = 0
+        self.unspooled_record_count: int = 0
+        self.sent_record_count: int = 0
+        self.sent_batch_count: int = 0
+        self.sent_byte_count: int = 0
+        self.connection_count: int = 0
+        self.connection_failure_count: int = 0
+        # The send times in seconds of the recent batches
+        self._batch_latencies: collections.deque[float] = collections.deque(maxlen=1024)
+        self._counter_lock = threading.Lock()
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._socket: socket.socket | None = None
+        self._failure_count: int = 0
+        self._next_connection_time: float = 0.0
+        self._sender = threading.Thread(target=self._run, name="{}-sender".format(type(self).__name__), daemon=True)
+        self._sender.start()
+
+    @property
+    def connected(self) -> bool:
+        """Whether the handler is connected to the collector."""
+        return self._socket is not None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            data: bytes = self.format(record).encode("utf-8", "backslashreplace")
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+            return
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped_record_count += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Send (or spool) the queued records, and try to replay the spool.
+        :param timeout: Maximum number of seconds to wait.
+        :return: Whether the records were handled before the timeout.
+        """
+        if not self._sender.is_alive():
+            return False
+        # The sender thread sets the event once the records queued before it are handled
+        flush_request = threading.Event()
+        try:
+            self._queue.put(flush_request, timeout=timeout)
+        except queue.Full:
+            return False
+        return flush_request.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Send (or spool) the queued records and stop the sender thread. The spooled records are kept on disk for the next process.
+        :param timeout: Maximum number of seconds to wait for the sender thread.
+        """
+        if self._sender.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self._sender.join(timeout)
+        super().close()
+
+    def stats(self) -> dict:
+        """
+        Return the shipping statistics.
+        :return: A dictionary with the numbers of sent records, batches and bytes, the dropped records (queue full, spool full, or no spool),
+            the spool depth in records and bytes, the connection state and counters, and the p50, p99 and maximum send times of the recent batches in seconds.
+        """
+        latencies: list[float] = sorted(self._batch_latencies)
+        return {
+            "connected": self.connected,
+            "sent_records": self.sent_record_count,
+            "sent_batches": self.sent_batch_count,
+            "sent_bytes": self.sent_byte_count,
+            "dropped_records": self.dropped_record_count,
+            "unspooled_records": self.unspooled_record_count,
+            "spool_dropped_records": 0 if self.spool is None else self.spool.dropped_record_count,
+            "spool_records": 0 if self.spool is None else self.spool.record_count,
+            "spool_bytes": 0 if self.spool is None else self.spool.byte_count,
+            "connections": self.connection_count,
+            "connection_failures": self.connection_failure_count,
+            "batch_latency_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+            "batch_latency_p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0,
+            "batch_latency_max": latencies[-1] if latencies else 0.0,
+        }
+
+    def _run(self) -> None:
+        """The sender thread: collect the queued records in batches, send them (or spool them), and replay the spool."""
+        stopping: bool = False
+        while not stopping:
+            batch: list[bytes] = []
+            control_items: list[threading.Event | None] = []
+            try:
+                timeout: float | None = None
+                if self.spool is not None and len(self.spool):
+                    # Wake up to replay the spool when the connection may be retried
+                    timeout = max(self.flush_interval, self._next_connection_time - time.monotonic())
+                item = self._queue.get(timeout=timeout)
+                deadline: float = time.monotonic() + self.flush_interval
+                while True:
+                    if item is None or isinstance(item, threading.Event):
+                        control_items.append(item)
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    remaining: float = deadline - time.monotonic()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            try:
+                if batch:
+                    if self.spool is not None and len(self.spool):
+                        # Sent after the older spooled records
+                        self.spool.append(batch)
+                    elif not self._send(batch):
+                        self._spool(batch)
+                if self.spool is not None:
+                    self._replay_spool()
+            except Exception:
+                # There is no record to report the error for, see logging.Handler.handleError
+                if logging.raiseExceptions:
+                    import traceback
+
+                    traceback.print_exc()
+
+            for control_item in control_items:
+                if control_item is None:
+                    stopping = True
+                else:
+                    control_item.set()
+
+        self._disconnect()
+        if self.spool is not None:
+            self.spool.close()
+
+    def _spool(self, batch: list[bytes]) -> None:
+        if self.spool is not None:
+            self.spool.append(batch)
+        else:
+            self.unspooled_record_count += len(batch)
+
+    def _replay_spool(self) -> None:
+        """Send the spooled records in order, until the spool is empty or a batch cannot be sent."""
+        while True:
+            records: list[bytes] = self.spool.peek(self.batch_size)
+            if not records or not self._send(records):
+                return
+            self.spool.consume(len(records))
+
+    def _connect(self) -> bool:
+        """Connect to the collector, unless the backoff delay after the last failure has not elapsed. Return whether the handler is connected."""
+        if self._socket is not None:
+            if not self._is_closed_by_peer(self._socket):
+                return True
+            self._disconnect()
+        if time.monotonic() < self._next_connection_time:
+            return False
+        try:
+            if isinstance(self.address, tuple):
+                connection: socket.socket = socket.create_connection(self.address, timeout=self.connect_timeout)
+            else:
+                connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    connection.settimeout(self.connect_timeout)
+                    connection.connect(self.address)
+                except OSError:
+                    connection.close()
+                    raise
+        except OSError:
+            self._on_failure()
+            return False
+        connection.settimeout(self.send_timeout)
+        self._socket = connection
+        self.connection_count += 1
+        return True
+
+    @staticmethod
+    def _is_closed_by_peer(connection: socket.socket) -> bool:
+        """Return whether the collector has closed the connection, so a batch is not written to a half-closed connection and lost."""
+        try:
+            readable, _, _ = select.select([connection], [], [], 0)
+            # The collector does not send anything, a readable connection is closed (or reset)
+            return bool(readable) and not connection.recv(1, socket.MSG_PEEK)
+        except (OSError, ValueError):
+            return True
+
+    def _on_failure(self) -> None:
+        """Schedule the next connection attempt with an exponential backoff (with jitter, so restarted clients do not reconnect at once)."""
+        self.connection_failure_count += 1
+        delay: float = min(self.max_backoff, self.min_backoff * 2**self._failure_count)
+        self._failure_count = min(self._failure_count + 1, 32)
+        self._next_connection_time = time.monotonic() + delay * random.uniform(0.5, 1.0)
+
+    def _disconnect(self) -> None:
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+            self._socket = None
+
+    def _send(self, records: list[bytes]) -> bool:
+        """Send a batch of records over the connection. Return False if the collector is unreachable or the connection breaks."""
+        if not self._connect():
+            return False
+        if self.framing == "ndjson":
+            data: bytes = b"\n".join(records) + b"\n"
+        else:
+            data = b"".join(_FRAME_LENGTH.pack(len(record)) + record for record in records)
+        start: float = time.perf_counter()
+        try:
+            self._socket.sendall(data)
+        except OSError:
+            # The batch may have been partially received, it is sent again (the collector may see duplicates)
+            self._disconnect()
+            self._on_failure()
+            return False
+        self._batch_latencies.append(time.perf_counter() - start)
+        self._failure_count = 0
+        self.sent_record_count += len(records)
+        self.sent_batch_count += 1
+        self.sent_byte_count += len(data)
+        return True
@@ -0,0 +1,55 @@
+import logging
+
+try:
+    from .handler_classes import mixin_handler_class
+except ImportError:
+    from handler_classes import mixin_handler_class
+
+
+class StreamingHandlerMixin:
+    """A mixin for `logging.StreamHandler` and `logging.FileHandler` that writes the records with large messages in chunks.
+
+    `StreamHandler.emit` formats the whole record and writes it with its terminator, so a multi-megabyte message is copied by the
+    indentation, by the format, by the coloring and by the concatenation of the terminator. Here, when the interpolated message is
+    longer than `streaming_threshold` characters (after the message limit of the formatter, if any) and the formatter has an
+    `iter_format` method (see `IndentedMessageFormatter`), the indented chunks are written to the stream as they are produced.
+    Smaller records are emitted as usual.
+    """
+
+    def __init__(self, *args, streaming_threshold: int = 1024 * 1024, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.streaming_threshold = streaming_threshold
+        self.streamed_record_count: int = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        formatter = self.formatter
+        iter_format = getattr(formatter, "iter_format", None)
+        if iter_format is None or len(formatter.get_limited_message(record)) <= self.streaming_threshold:
+            super().emit(record)
+            return
+        if isinstance(self, logging.FileHandler) and self.stream is None:
+            # See logging.FileHandler.emit: a file opened with mode 'w' is not reopened after it was closed
+            if self.mode != "w" or not getattr(self, "_closed", False):
+                self.stream = self._open()
+            if self.stream is None:
+                return
+        try:
+            write = self.stream.write
+            for text in iter_format(record):
+                write(text)
+            write(self.terminator)
+            self.flush()
+            self.streamed_record_count += 1
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+def streaming_handler_class(handler_class: type) -> type:
+    """
+    Return a subclass of a stream or file handler class that writes the records with large messages in chunks, see `StreamingHandlerMixin`.
+    :param handler_class: The handler class, `logging.StreamHandler`, `logging.FileHandler` or a subclass using their `emit`.
+    :return: The class combining `StreamingHandlerMixin` and `handler_class`, created once per handler class.
+    """
+    return mixin_handler_class(StreamingHandlerMixin, handler_class)
@@ -0,0 +1,177 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from .messages import LazyExceptionMessage
+except ImportError:
+    from messages import LazyExceptionMessage
+
+
+class _CallSiteState:
+    """Token bucket and counters of a single call site."""
+
+    __slots__ = ("tokens", "last_refill_time", "allowed_count", "suppressed_count", "pending_suppressed_count", "first_suppressed_time")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.last_refill_time = now
+        self.allowed_count: int = 0
+        self.suppressed_count: int = 0
+        self.pending_suppressed_count: int = 0
+        self.first_suppressed_time: float = 0.0
+
+
+class CallSiteThrottleFilter(logging.Filter):
+    """A logger filter that rate-limits records per call site with a token bucket.
+
+    The call site is identified by the file, the line and the level of the record, and optionally the type of the logged exception.
+    Suppressed records are dropped before any handler formats them (so exception details are never rendered for them), and are
+    collapsed into a single "Suppressed N identical messages" summary record, logged before the next allowed record of the same call site.
+    The number of tracked call sites is bounded, the least recently used call site is evicted first (after logging the summary of its suppressed records).
+    """
+
+    SUMMARY_ATTRIBUTE: str = "tidy_throttle_summary"
+    SUMMARY_MESSAGE: str = "Suppressed %d identical messages from %s:%d in the last %.1f seconds."
+
+    def __init__(self, logger: logging.Logger, rate: float, burst: int = 10, key_by_exception_type: bool = False, max_call_sites: int = 1024):
+        """
+        Initialize the CallSiteThrottleFilter.
+        :param logger: The logger the summary records are logged to (the logger the filter is added to).
+        :param rate: Number of records per second allowed per call site, on average.
+        :param burst: Number of records a call site can log at once before it is rate-limited.
+        :param key_by_exception_type: Whether records of the same call site with different exception types are throttled separately.
+        :param max_call_sites: Maximum number of tracked call sites.
+        :raises ValueError: If `rate`, `burst` or `max_call_sites` is not positive.
+        """
+        if rate <= 0:
+            raise ValueError("`rate` should be a positive number.")
+        if burst <= 0:
+            raise ValueError("`burst` should be a positive integer.")
+        if max_call_sites <= 0:
+            raise ValueError("`max_call_sites` should be a positive integer.")
+        super().__init__()
+        self.logger = logger
+        self.rate = rate
+        self.burst = burst
+        self.key_by_exception_type = key_by_exception_type
+        self.max_call_sites = max_call_sites
+        self.total_allowed_count: int = 0
+        self.total_suppressed_count: int = 0
+        self.evicted_call_site_count: int = 0
+        self._call_sites: OrderedDict[tuple, _CallSiteState] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_exception_type_name(record: logging.LogRecord) -> str | None:
+        if isinstance(record.msg, LazyExceptionMessage):
+            return type(record.msg.exception).__name__
+        if record.exc_info and record.exc_info[1] is not None:
+            return type(record.exc_info[1]).__name__
+        return None
+
+    def _get_call_site_key(self, record: logging.LogRecord) -> tuple:
+        if self.key_by_exception_type:
+            return (record.pathname, record.lineno, record.levelno, self._get_exception_type_name(record))
+        return (record.pathname, record.lineno, record.levelno, None)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.__dict__.get(self.SUMMARY_ATTRIBUTE):
+            return True
+
+        key: tuple = self._get_call_site_key(record)
+        now: float = time.monotonic()
+        pending_suppressed_count: int = 0
+        # The summary of the suppressed records of an evicted call site, logged as it will not get another record
+        evicted_summary: tuple[tuple, int, float] | None = None
+
+        with self._lock:
+            state = self._call_sites.get(key)
+            if state is None:
+                state = self._call_sites[key] = _CallSiteState(tokens=self.burst, now=now)
+                if len(self._call_sites) > self.max_call_sites:
+                    evicted_key, evicted_state = self._call_sites.popitem(last=False)
+                    self.evicted_call_site_count += 1
+                    if evicted_state.pending_suppressed_count:
+                        evicted_summary = (evicted_key, evicted_state.pending_suppressed_count, now - evicted_state.first_suppressed_time)
+            else:
+                self._call_sites.move_to_end(key)
+                state.tokens = min(self.burst, state.tokens + (now - state.last_refill_time) * self.rate)
+                state.last_refill_time = now
+
+            allowed: bool = state.tokens >= 1
+            if not allowed:
+                state.suppressed_count += 1
+                if not state.pending_suppressed_count:
+                    state.first_suppressed_time = now
+                state.pending_suppressed_count += 1
+                self.total_suppressed_count += 1
+            else:
+                state.tokens -= 1
+                state.allowed_count += 1
+                self.total_allowed_count += 1
+                if state.pending_suppressed_count:
+                    pending_suppressed_count = state.pending_suppressed_count
+                    suppressed_duration: float = now - state.first_suppressed_time
+                    state.pending_suppressed_count = 0
+
+        if evicted_summary is not None:
+            self._log_summaries([evicted_summary])
+        if pending_suppressed_count:
+            self._log_summary(record.name, record.levelno, record.pathname, record.lineno, record.funcName, pending_suppressed_count, suppressed_duration)
+        return allowed
+
+    def _log_summary(self, name: str, level: int, pathname: str, lineno: int, func: str | None, suppressed_count: int, suppressed_duration: float) -> None:
+        summary_record = self.logger.makeRecord(
+            name,
+            level,
+            pathname,
+            lineno,
+            self.SUMMARY_MESSAGE,
+            (suppressed_count, pathname, lineno, suppressed_duration),
+            None,
+            func=func,
+            extra={self.SUMMARY_ATTRIBUTE: True},
+        )
+        self.logger.handle(summary_record)
+
+    def flush_summaries(self) -> None:
+        """Log the summary records of all the call sites with suppressed records, e.g. before the logger is closed."""
+        now: float = time.monotonic()
+        summaries: list[tuple[tuple, int, float]] = []
+        with self._lock:
+            for key, state in self._call_sites.items():
+                if state.pending_suppressed_count:
+                    summaries.append((key, state.pending_suppressed_count, now - state.first_suppressed_time))
+                    state.pending_suppressed_count = 0
+        self._log_summaries(summaries)
+
+    def _log_summaries(self, summaries: list[tuple[tuple, int, float]]) -> None:
+        """Log the summary records of call sites that will not log another record: (call site key, suppressed count, suppressed duration) tuples."""
+        for (pathname, lineno, level, _), suppressed_count, suppressed_duration in summaries:
+            self._log_summary(self.logger.name, level, pathname, lineno, None, suppressed_count, suppressed_duration)
+
+    def stats(self) -> dict:
+        """
+        Return the throttling statistics.
+        :return: A dictionary with the total numbers of allowed and suppressed records, the number of evicted call sites, and the counters of each tracked call site.
+        """
+        with self._lock:
+            call_sites: list[dict] = [
+                {
+                    "file": pathname,
+                    "line": lineno,
+                    "level": logging.getLevelName(level),
+                    "exception_type": exception_type_name,
+                    "allowed": state.allowed_count,
+                    "suppressed": state.suppressed_count,
+                }
+                for (pathname, lineno, level, exception_type_name), state in self._call_sites.items()
+            ]
+            return {
+                "allowed": self.total_allowed_count,
+                "suppressed": self.total_suppressed_count,
+                "evicted_call_sites": self.evicted_call_site_count,
+                "call_sites": call_sites,
+            }
@@ -1,16 +1,50 @@
+import importlib
 import logging
 import os
-import traceback
-from datetime import datetime
-from logging.handlers import RotatingFileHandler
+import re
+import sys
+import threading
+import time
 from pathlib import Path
-
-import platformdirs
+from types import ModuleType
+from typing import TYPE_CHECKING, Iterable
 
 try:
-    from .formatters import ColoredIndentedMessageFormatter, IndentedMessageFormatter
+    from .caller import find_caller, formatter_uses_caller_fields, skip_caller
+    from .console import NonBlockingConsoleHandler, stream_supports_color
+    from .formatters import ColoredIndentedMessageFormatter, IndentedMessageFormatter, MessageSizeLimit
+    from .messages import LazyExceptionMessage
 except ImportError:
-    from formatters import ColoredIndentedMessageFormatter, IndentedMessageFormatter
+    from caller import find_caller, formatter_uses_caller_fields, skip_caller
+    from console import NonBlockingConsoleHandler, stream_supports_color
+    from formatters import ColoredIndentedMessageFormatter, IndentedMessageFormatter, MessageSizeLimit
+    from messages import LazyExceptionMessage
+
+if TYPE_CHECKING:
+    from contextlib import AbstractContextManager
+    from datetime import datetime
+
+    from .context import BoundContext, BoundLogger, ContextFilter
+    from .exception_rendering import ExceptionRenderer
+    from .metrics import LoggerMetrics
+    from .queueing import BoundedQueueHandler, DrainingQueueListener
+    from .redaction import Redactor
+    from .ring_buffer import RingBufferHandler
+    from .sampling import SamplingFilter
+    from .shipping import ShippingHandler
+    from .throttling import CallSiteThrottleFilter
+
+
+def _import_module(module_name: str) -> ModuleType:
+    """
+    Import a module of this package on first use, so importing TidyLogger does not import the features it does not use (and their dependencies, e.g. `logging.handlers`).
+    :param module_name: The name of the module in this package, e.g. 'queueing'.
+    :return: The module.
+    """
+    if __package__:
+        return importlib.import_module(f"{__package__}.{module_name}")
+    # Imported as a top-level module (e.g. by the tests and benchmarks)
+    return importlib.import_module(module_name)
 
 
 class TidyLogger:
@@ -19,6 +53,9 @@ class TidyLogger:
     DEFAULT_FILE_EXTENSION: str = ".log"
     TIDY_LOGGER_LOG_FILE_DIR_ENV_VAR: str = "TIDY_LOGGER_LOG_FILE_DIR"
     TIDY_LOGGER_LOG_FILE_NAME_ENV_VAR: str = "TIDY_LOGGER_LOG_FILE_NAME"
+    FILE_FORMATS: tuple[str, ...] = ("text", "ndjson", "binary")
+    ROTATION_TRIGGERS: tuple[str, ...] = ("size", "time", "size_or_time")
+    CALLER_LOOKUP_MODES: tuple[str, ...] = ("auto", "always", "never")
 
     def __init__(
         self,
@@ -34,6 +71,49 @@ class TidyLogger:
         use_file_rotation: bool = False,
         max_bytes: int = 100 * 1024 * 1024,
         backup_count: int = 10,
+        async_mode: bool = False,
+        queue_size: int = 10000,
+        queue_full_policy: str = "block",
+        file_format: str = "text",
+        use_batched_file_writes: bool = False,
+        file_buffer_size: int = 64 * 1024,
+        file_flush_interval: float = 1.0,
+        file_flush_level: int = logging.ERROR,
+        rotation_trigger: str = "size",
+        rotation_interval: str = "midnight",
+        compress_rotated_files: str | None = None,
+        multi_process_safe: bool = False,
+        max_exception_depth: int = 64,
+        max_exception_group_size: int = 100,
+        throttle_rate: float | None = None,
+        throttle_burst: int = 10,
+        throttle_by_exception_type: bool = False,
+        throttle_max_call_sites: int = 1024,
+        sample_rates: dict[int | str, float] | None = None,
+        sample_key: str | None = None,
+        tail_sampling: bool = False,
+        tail_sampling_buffer_size: int = 100,
+        tail_sampling_max_contexts: int = 1024,
+        ring_buffer_size: int = 0,
+        ring_buffer_level: int | str = logging.DEBUG,
+        dump_ring_buffer_on_crash: bool = False,
+        caller_lookup: str = "auto",
+        collect_metrics: bool = False,
+        format_outside_lock: bool = False,
+        console_colors: bool | None = None,
+        non_blocking_console: bool = False,
+        console_buffer_size: int = 1024 * 1024,
+        delay_file_creation: bool = False,
+        max_message_size: int | None = None,
+        oversize_policy: str = "truncate",
+        streaming_threshold: int | None = None,
+        shipping_address: tuple[str, int] | str | Path | None = None,
+        shipping_framing: str = "ndjson",
+        shipping_batch_size: int = 500,
+        shipping_spool_size: int = 64 * 1024 * 1024,
+        redact_patterns: Iterable[str | re.Pattern] | None = None,
+        redact_keys: Iterable[str] | None = None,
+        redaction_replacement: str = "[REDACTED]",
     ):
         """
         Initialize the TidyLogger.
@@ -49,7 +129,50 @@ class TidyLogger:
         :param use_file_rotation: Whether to use rotating file handler.
         :param max_bytes: Maximum size in bytes for the log file before rotation (only if use_file_rotation is True).
         :param backup_count: Number of backup files to keep (only if use_file_rotation is True).
-        :raises ValueError: if any of the following arguments are empty strings: `app_name`, `app_author`, `file_name`, `file_directory`.
+        :param async_mode: Whether to only enqueue records on the caller's thread and let a background listener thread format and write them to the file and console handlers.
+        :param queue_size: Maximum number of records waiting in the queue (only if async_mode is True).
+        :param queue_full_policy: What to do when the queue is full (only if async_mode is True): 'block', 'drop_oldest' or 'drop_newest'.
+        :param file_format: Format of the log file: 'text' for indented messages, 'ndjson' for one JSON object per record (with structured exception details), or 'binary' for compact records with interned format strings and unformatted arguments, rendered offline with `tidy-logger-decode` (see `binary_format`). The binary format only supports size-based rotation without compression, and no batched file writes or multi-process safety.
+        :param use_batched_file_writes: Whether to buffer the records written to the log file and write them in batches, instead of writing and flushing the file for every record.
+        :param file_buffer_size: Size of the file write buffer in bytes (only if use_batched_file_writes is True).
+        :param file_flush_interval: Maximum number of seconds a record stays in the file write buffer (only if use_batched_file_writes is True).
+        :param file_flush_level: Records at this level or above are written to the file immediately (only if use_batched_file_writes is True). Default is ERROR.
+        :param rotation_trigger: When to rotate the log file (only if use_file_rotation is True): 'size' when it reaches `max_bytes`, 'time' every `rotation_interval`, or 'size_or_time' on whichever comes first.
+        :param rotation_interval: Interval of time-based rotation: 'hourly' or 'midnight' (only if `rotation_trigger` is 'time' or 'size_or_time'). The log file name, including the date suffix, is recomputed on each time-based rotation.
+        :param compress_rotated_files: 'gzip' or 'zstd' to compress the rotated log files on a background thread, or None to keep them uncompressed (only if use_file_rotation is True).
+        :param multi_process_safe: Whether several processes (e.g. the workers of a pre-fork server) log to the same file. Each record is appended with a single write, and the size-based rotation is coordinated between the processes with a lock file. Only supported with `file_mode` 'a', size-based rotation without compression (and without rotation on Windows), and without batched file writes or shipping. The async mode and the non-blocking console keep working in child processes created with `fork()`.
+        :param max_exception_depth: Maximum nesting level of chained and grouped exceptions in the logged exception details. Deeper exceptions are summarized.
+        :param max_exception_group_size: Maximum number of logged exceptions of an ExceptionGroup. The remaining exceptions are summarized.
+        :param throttle_rate: Number of records per second allowed per call site (file, line and level), on average. Suppressed records are dropped before they are formatted, and summarized in a single record. If None, records are not throttled.
+        :param throttle_burst: Number of records a call site can log at once before it is throttled (only if throttle_rate is specified).
+        :param throttle_by_exception_type: Whether records of the same call site with different exception types are throttled separately (only if throttle_rate is specified).
+        :param throttle_max_call_sites: Maximum number of call sites tracked for throttling, the least recently used call site is evicted first (only if throttle_rate is specified).
+        :param sample_rates: The fraction of the records to keep per level, e.g. {logging.DEBUG: 0.01}. Dropped records are never interpolated or formatted. If None, all the records are kept.
+        :param sample_key: The name of an `extra` or bound field (e.g. 'request_id', see `bind`) whose value decides deterministically whether a record is sampled, so all the records with the same value are kept or dropped together.
+        :param tail_sampling: Whether to hold the dropped records of each `sample_key` value in a bounded buffer, and write them if a WARNING or above is logged with the same value.
+        :param tail_sampling_buffer_size: Maximum number of held records per `sample_key` value (only if tail_sampling is True).
+        :param tail_sampling_max_contexts: Maximum number of `sample_key` values with held records, the least recently used one is discarded first (only if tail_sampling is True).
+        :param ring_buffer_size: Number of recent records kept in memory (unformatted, at `ring_buffer_level` or above, even below `file_level`), which are written to a separate crash dump file by `critical_exception` and `dump_ring_buffer`. If 0, no records are kept.
+        :param ring_buffer_level: Logging level of the records kept in memory (only if ring_buffer_size is positive). Default is DEBUG.
+        :param dump_ring_buffer_on_crash: Whether to also dump the records kept in memory on unhandled exceptions of the main thread and other threads, via `sys.excepthook` and `threading.excepthook` (only if ring_buffer_size is positive).
+        :param caller_lookup: Whether to find the file name, line number and function name of the caller of each record: 'always', 'never' (the records have '(unknown file)', 0 and '(unknown function)' instead), or 'auto' to only find them if a handler's format uses them. It replaces the caller lookup of the whole named logger (`logging.getLogger(app_name)`), for every user of that logger, and is only applied by the TidyLogger that creates the handlers of the logger.
+        :param collect_metrics: Whether to collect the throughput and latency metrics of the handlers (records, bytes, format and write times, rotations) and the queue depth, available via `metrics`.
+        :param format_outside_lock: Whether the file and console handlers format the records on the caller's thread before acquiring the handler lock, so the lock is only held while writing. Reduces lock contention when many threads log at once.
+        :param console_colors: Whether to color the console output. If None, the console output is only colored if stderr is a terminal and the NO_COLOR environment variable is not set (checked once).
+        :param non_blocking_console: Whether to write the console output on a background thread, so logging never blocks on a slow stderr (e.g. a pipe). Records that do not fit in the console buffer are dropped and counted in `console_handler.dropped_record_count`.
+        :param console_buffer_size: Maximum number of characters waiting to be written to the console (only if non_blocking_console is True).
+        :param delay_file_creation: Whether to create the log file and its directory when the first record reaches the file handler, instead of on initialization. A program that logs nothing to the file (e.g. a short command-line tool) then never touches the file system.
+        :param max_message_size: Maximum number of characters of the interpolated message of a record in the file and console output. Longer messages are replaced according to `oversize_policy`. If None, messages are written whole. Not applied to the 'binary' `file_format`, whose arguments are not interpolated.
+        :param oversize_policy: What to write instead of a message longer than `max_message_size`: 'truncate' for the head and the tail of the message with the number of omitted bytes, or 'spill' for the head of the message and the path of a side file with the whole message, in the '<log file stem>_messages' directory next to the log file.
+        :param streaming_threshold: Messages longer than this many characters are indented and written to the file and console in chunks, without building the formatted record in memory. If None, records are always formatted whole. Only applied to the default file handler (without rotation, batched file writes or `multi_process_safe`) and console handler (without `non_blocking_console`), and not with `format_outside_lock`.
+        :param shipping_address: The address of a remote log collector to send the records to (at `file_level` or above), as JSON objects in batches over a persistent connection: a (host, port) tuple for TCP, or the path of a Unix socket. Logging never waits for the collector: while it is unreachable, the records are spooled in the '<log file stem>_spool' directory next to the log file and sent in order once it is back (see `shipping.ShippingHandler`). If None, the records are not shipped.
+        :param shipping_framing: How the shipped records are delimited: 'ndjson' (one record per line) or 'length_prefixed' (each record is prefixed by its length as a 4-byte big-endian integer).
+        :param shipping_batch_size: Maximum number of records sent to the collector at once (only if shipping_address is specified).
+        :param shipping_spool_size: Maximum size in bytes of the spool of the records not yet sent to the collector, the oldest records are dropped beyond it. If 0, the records are dropped while the collector is unreachable (only if shipping_address is specified).
+        :param redact_patterns: Regular expressions of the secrets and personal data (e.g. `Redactor.DEFAULT_PATTERNS`, for emails and JSON Web Tokens) replaced by `redaction_replacement` in the messages, exception details and `extra` fields of the records, before they are written to the file and console, shipped, or spilled. The patterns are combined into one expression, see `redaction.Redactor`. If None (and without `redact_keys`), nothing is redacted.
+        :param redact_keys: Names (case-insensitive, e.g. `Redactor.DEFAULT_KEYS`) whose values are replaced by `redaction_replacement`: in the texts (after 'key=', 'key:' or '"key":'), and the whole value of the `extra` fields whose name contains one of them. If None (and without `redact_patterns`), nothing is redacted.
+        :param redaction_replacement: The text that replaces the redacted secrets (only if redact_patterns or redact_keys is specified).
+        :raises ValueError: if any of the following arguments are empty strings: `app_name`, `app_author`, `file_name`, `file_directory`; or if `ring_buffer_size` is negative, or `console_buffer_size`, `max_message_size` or `streaming_threshold` is not positive; or if `caller_lookup` is not supported, or is 'never' with throttling (which identifies call sites by the caller); or if a rate of `sample_rates` is not between 0 and 1, or `tail_sampling` is used without `sample_key`; or if `tail_sampling_buffer_size`, `tail_sampling_max_contexts`, `shipping_batch_size`, `throttle_rate`, `throttle_burst`, `throttle_max_call_sites`, `queue_size` or `file_buffer_size` is not positive, or `queue_full_policy`, `oversize_policy`, `shipping_framing`, `file_format`, `rotation_trigger`, `rotation_interval` or `compress_rotated_files` is not supported, or `shipping_address` is a path where Unix sockets are not supported (e.g. on Windows), or `multi_process_safe` or the 'binary' `file_format` is combined with an unsupported option (including redaction, as its arguments are not interpolated); or if a redaction pattern is invalid.
         """
 
         if app_name == "":
@@ -60,6 +183,48 @@ class TidyLogger:
             raise ValueError("`log_file_name` cannot be an empty string.")
         if log_file_directory == "":
             raise ValueError("`log_file_directory` cannot be an empty string.")
+        if caller_lookup not in self.CALLER_LOOKUP_MODES:
+            raise ValueError("`caller_lookup` should be one of {}.".format(", ".join(f"'{m}'" for m in self.CALLER_LOOKUP_MODES)))
+        if caller_lookup == "never" and throttle_rate is not None:
+            raise ValueError("`caller_lookup` cannot be 'never' with `throttle_rate`, call sites are identified by the caller.")
+        if non_blocking_console and console_buffer_size <= 0:
+            raise ValueError("`console_buffer_size` should be a positive integer.")
+        if max_message_size is not None and max_message_size <= 0:
+            raise ValueError("`max_message_size` should be a positive integer.")
+        if oversize_policy not in MessageSizeLimit.POLICIES:
+            raise ValueError("`oversize_policy` should be one of {}.".format(", ".join(f"'{p}'" for p in MessageSizeLimit.POLICIES)))
+        if streaming_threshold is not None and streaming_threshold <= 0:
+            raise ValueError("`streaming_threshold` should be a positive integer.")
+        if shipping_address is not None:
+            import socket
+
+            shipping_framings: tuple[str, ...] = _import_module("shipping").ShippingHandler.FRAMINGS
+            if shipping_framing not in shipping_framings:
+                raise ValueError("`shipping_framing` should be one of {}.".format(", ".join(f"'{f}'" for f in shipping_framings)))
+            if shipping_batch_size <= 0:
+                raise ValueError("`shipping_batch_size` should be a positive integer.")
+            if not isinstance(shipping_address, tuple) and not hasattr(socket, "AF_UNIX"):
+                raise ValueError("`shipping_address` should be a (host, port) tuple, Unix sockets are not supported on this platform.")
+        if ring_buffer_size < 0:
+            raise ValueError("`ring_buffer_size` should be a non-negative integer.")
+        if async_mode and queue_size <= 0:
+            raise ValueError("`queue_size` should be a positive integer.")
+        if file_format not in self.FILE_FORMATS:
+            raise ValueError("`file_format` should be one of {}.".format(", ".join(f"'{f}'" for f in self.FILE_FORMATS)))
+        if rotation_trigger not in self.ROTATION_TRIGGERS:
+            raise ValueError("`rotation_trigger` should be one of {}.".format(", ".join(f"'{t}'" for t in self.ROTATION_TRIGGERS)))
+        if file_format == "binary" and (
+            multi_process_safe or use_batched_file_writes or (use_file_rotation and (rotation_trigger != "size" or compress_rotated_files is not None))
+        ):
+            raise ValueError("The 'binary' `file_format` only supports size-based rotation without compression, batched file writes or `multi_process_safe`.")
+        if file_format == "binary" and (redact_patterns is not None or redact_keys is not None):
+            raise ValueError("The 'binary' `file_format` does not support redaction, its messages are written with their unformatted arguments.")
+        if multi_process_safe and (file_mode != "a" or use_batched_file_writes or rotation_trigger != "size" or compress_rotated_files is not None):
+            raise ValueError("`multi_process_safe` only supports `file_mode` 'a' and size-based rotation without compression or batched file writes.")
+        if multi_process_safe and shipping_address is not None:
+            raise ValueError("`multi_process_safe` does not support `shipping_address`, the processes would share the spool of the records not yet sent.")
+        if multi_process_safe and use_file_rotation and os.name == "nt":
+            raise ValueError("`multi_process_safe` does not support file rotation on Windows, where a log file open in another process cannot be renamed.")
 
         resolved_log_file_directory: Path = self._create_log_file_directory(
             log_file_directory=log_file_directory, log_file_directory_environment_variable_name=self.TIDY_LOGGER_LOG_FILE_DIR_ENV_VAR, app_name=app_name, app_author=app_author
@@ -71,90 +236,338 @@ class TidyLogger:
 
         log_file_path: Path = resolved_log_file_directory / resolved_log_file_name
 
-        log_file_path.parent.mkdir(parents=True, exist_ok=True)
+        if not delay_file_creation:
+            log_file_path.parent.mkdir(parents=True, exist_ok=True)
 
         self.logger = logging.getLogger(self.__class__.__name__ if app_name is None else app_name)
-        self.logger.setLevel(min(console_level, file_level))
-
-        file_formatter = IndentedMessageFormatter()
-        console_formatter = ColoredIndentedMessageFormatter()
+        # Created on the first logged exception, see `_log_exception`
+        self._exception_renderer: ExceptionRenderer | None = None
+        self._max_exception_depth: int = max_exception_depth
+        self._max_exception_group_size: int = max_exception_group_size
+        # The ring buffer keeps records below the file and console levels as well
+        self.logger.setLevel(min(console_level, file_level, ring_buffer_level) if ring_buffer_size > 0 else min(console_level, file_level))
+        self._log_file_path: Path = log_file_path
+
+        # Shared by the formatters, so a message is redacted once per record
+        redactor: Redactor | None = None
+        if redact_patterns is not None or redact_keys is not None:
+            redactor = _import_module("redaction").Redactor(redact_patterns or (), redact_keys or (), replacement=redaction_replacement)
+
+        # Binary file handlers create their own formatter, which keeps the interning tables of the file
+        message_limit: MessageSizeLimit | None = None
+        if max_message_size is not None:
+            # Shared by the formatters, so an oversized message is truncated (or spilled) once per record
+            message_limit = MessageSizeLimit(max_message_size, policy=oversize_policy, spill_directory=log_file_path.with_name(log_file_path.stem + "_messages"))
+        file_formatter: logging.Formatter | None = None
+        if file_format == "ndjson":
+            file_formatter = _import_module("formatters").JsonLinesFormatter(
+                message_limit=message_limit, redactor=redactor, max_exception_depth=max_exception_depth, max_exception_group_size=max_exception_group_size
+            )
+        elif file_format == "text":
+            file_formatter = IndentedMessageFormatter(message_limit=message_limit, redactor=redactor)
+        if console_colors is None:
+            # The console handler writes to stderr
+            console_colors = stream_supports_color(sys.stderr)
+        console_formatter = ColoredIndentedMessageFormatter(use_colors=console_colors, message_limit=message_limit, redactor=redactor)
+
+        self.file_handler: logging.Handler | None = None
+        self.console_handler: logging.Handler | None = None
+        self._queue_handler: BoundedQueueHandler | None = None
+        self._queue_listener: DrainingQueueListener | None = None
+        self._throttle_filter: CallSiteThrottleFilter | None = None
+        self._sampling_filter: SamplingFilter | None = None
+        self.ring_buffer_handler: RingBufferHandler | None = None
+        self.shipping_handler: ShippingHandler | None = None
+        # Added on the first `bind` or `bind_context`
+        self._bound_context_filter: ContextFilter | None = None
+        self._previous_excepthook = None
+        self._previous_threading_excepthook = None
+        self.metrics: LoggerMetrics | None = None
 
         # Avoid adding handlers if they already exist (prevents duplicate logs)
         if not self.logger.handlers:
 
-            if use_file_rotation:
-                file_handler = RotatingFileHandler(filename=log_file_path, mode=file_mode, maxBytes=max_bytes, backupCount=backup_count)
-            else:
-                file_handler = logging.FileHandler(filename=log_file_path, mode=file_mode)
+            file_handler_class: type[logging.Handler]
+            file_handler_arguments: dict
+            if file_format == "binary":
+                binary_format: ModuleType = _import_module("binary_format")
+                file_handler_class = binary_format.BinaryRotatingFileHandler if use_file_rotation else binary_format.BinaryFileHandler
+                file_handler_arguments = dict(filename=log_file_path, mode=file_mode)
+                if use_file_rotation:
+                    file_handler_arguments.update(maxBytes=max_bytes, backupCount=backup_count)
+            elif multi_process_safe:
+                file_handler_class = _import_module("multiprocess").MultiProcessFileHandler
+                file_handler_arguments = dict(filename=log_file_path, mode=file_mode, max_bytes=max_bytes if use_file_rotation else 0, backup_count=backup_count)
+            elif use_file_rotation and (rotation_trigger != "size" or compress_rotated_files is not None):
+
+                def log_file_path_factory(now: "datetime") -> Path:
+                    # The same rules as for the initial log file name, for the date of the rotation
+                    return resolved_log_file_directory / self._create_log_file_name(
+                        log_file_name=log_file_name,
+                        log_file_name_environment_variable_name=self.TIDY_LOGGER_LOG_FILE_NAME_ENV_VAR,
+                        add_date_suffix_to_file_name=add_date_suffix_to_file_name,
+                        now=now,
+                    )
+
+                file_handlers: ModuleType = _import_module("file_handlers")
+                file_handler_class = file_handlers.BatchedTimedSizeRotatingFileHandler if use_batched_file_writes else file_handlers.TimedSizeRotatingFileHandler
+                file_handler_arguments = dict(
+                    file_name_factory=log_file_path_factory,
+                    when=None if rotation_trigger == "size" else rotation_interval,
+                    max_bytes=0 if rotation_trigger == "time" else max_bytes,
+                    backup_count=backup_count,
+                    compression=compress_rotated_files,
+                    mode=file_mode,
+                )
+            elif use_file_rotation:
+                if use_batched_file_writes:
+                    file_handler_class = _import_module("file_handlers").BatchedRotatingFileHandler
+                else:
+                    from logging.handlers import RotatingFileHandler
 
-            file_handler.setFormatter(file_formatter)
+                    file_handler_class = RotatingFileHandler
+                file_handler_arguments = dict(filename=log_file_path, mode=file_mode, maxBytes=max_bytes, backupCount=backup_count)
+            else:
+                file_handler_class = _import_module("file_handlers").BatchedFileHandler if use_batched_file_writes else logging.FileHandler
+                file_handler_arguments = dict(filename=log_file_path, mode=file_mode)
+            if use_batched_file_writes:
+                file_handler_arguments.update(buffer_size=file_buffer_size, flush_interval=file_flush_interval, flush_level=file_flush_level)
+            console_handler_class: type[logging.Handler] = NonBlockingConsoleHandler if non_blocking_console else logging.StreamHandler
+            console_handler_arguments: dict = dict(buffer_size=console_buffer_size) if non_blocking_console else {}
+            if streaming_threshold is not None and not format_outside_lock:
+                # The other handlers need the whole formatted record (to buffer it, or to check the size of the file before writing it)
+                streaming_handler_class = _import_module("streaming").streaming_handler_class
+                if file_handler_class is logging.FileHandler:
+                    file_handler_class = streaming_handler_class(file_handler_class)
+                    file_handler_arguments.update(streaming_threshold=streaming_threshold)
+                if console_handler_class is logging.StreamHandler:
+                    console_handler_class = streaming_handler_class(console_handler_class)
+                    console_handler_arguments.update(streaming_threshold=streaming_threshold)
+            if delay_file_creation:
+                # The directory is created with the file, by the first record
+                file_handler_arguments.update(delay=True)
+                file_handler_class = _import_module("delayed_files").directory_creating_handler_class(file_handler_class)
+
+            if format_outside_lock:
+                # Only the writes are serialized by the handler locks. The binary encoding is cheap, and must be serialized with the writes (it interns strings per file)
+                preformatting_handler_class = _import_module("preformatting").preformatting_handler_class
+                if file_format != "binary":
+                    file_handler_class = preformatting_handler_class(file_handler_class)
+                console_handler_class = preformatting_handler_class(console_handler_class)
+
+            file_handler = file_handler_class(**file_handler_arguments)
+            if file_formatter is not None:
+                file_handler.setFormatter(file_formatter)
             file_handler.setLevel(file_level)
-            self.logger.addHandler(file_handler)
 
             if print_log_file_path:
                 print("Log file path:", log_file_path)
                 print()
 
             # Console handler
-            console_handler = logging.StreamHandler()
+            console_handler = console_handler_class(**console_handler_arguments)
             console_handler.setFormatter(console_formatter)
             console_handler.setLevel(console_level)
-            self.logger.addHandler(console_handler)
+
+            self.file_handler = file_handler
+            self.console_handler = console_handler
+
+            if sample_rates is not None or tail_sampling:
+                # Sampled before throttling, so only the kept records consume the tokens of their call site
+                self._sampling_filter = _import_module("sampling").SamplingFilter(
+                    self.logger,
+                    level_rates=sample_rates,
+                    key_field=sample_key,
+                    tail_sampling=tail_sampling,
+                    tail_buffer_size=tail_sampling_buffer_size,
+                    tail_max_contexts=tail_sampling_max_contexts,
+                )
+                self.logger.addFilter(self._sampling_filter)
+
+            if throttle_rate is not None:
+                # A logger filter runs before any handler, so suppressed records are never formatted
+                self._throttle_filter = _import_module("throttling").CallSiteThrottleFilter(
+                    self.logger, rate=throttle_rate, burst=throttle_burst, key_by_exception_type=throttle_by_exception_type, max_call_sites=throttle_max_call_sites
+                )
+                self.logger.addFilter(self._throttle_filter)
+
+            if async_mode:
+                # The caller's thread only enqueues records, the listener thread owns the file and console handlers
+                import queue
+
+                queueing: ModuleType = _import_module("queueing")
+                self._queue_handler = queueing.BoundedQueueHandler(queue.Queue(maxsize=queue_size), queue_full_policy=queue_full_policy)
+                self._queue_listener = queueing.DrainingQueueListener(self._queue_handler.queue, file_handler, console_handler, respect_handler_level=True)
+                self.logger.addHandler(self._queue_handler)
+                self._queue_listener.start()
+            else:
+                self.logger.addHandler(file_handler)
+                self.logger.addHandler(console_handler)
+
+            if ring_buffer_size > 0:
+                # Kept on the caller's thread even in async mode, appending a compact record is cheaper than enqueuing it
+                self.ring_buffer_handler = _import_module("ring_buffer").RingBufferHandler(capacity=ring_buffer_size, level=ring_buffer_level)
+                self.ring_buffer_handler.setFormatter(IndentedMessageFormatter(redactor=redactor))
+                self.logger.addHandler(self.ring_buffer_handler)
+                if dump_ring_buffer_on_crash:
+                    self._install_crash_hooks()
+
+            if shipping_address is not None:
+                # Sends from its own thread, so it is not behind the queue in async mode
+                self.shipping_handler = _import_module("shipping").ShippingHandler(
+                    shipping_address,
+                    framing=shipping_framing,
+                    batch_size=shipping_batch_size,
+                    spool_directory=log_file_path.with_name(log_file_path.stem + "_spool") if shipping_spool_size > 0 else None,
+                    max_spool_bytes=max(shipping_spool_size, 1),
+                    level=file_level,
+                )
+                self.shipping_handler.setFormatter(
+                    _import_module("formatters").JsonLinesFormatter(redactor=redactor, max_exception_depth=max_exception_depth, max_exception_group_size=max_exception_group_size)
+                )
+                self.logger.addHandler(self.shipping_handler)
+
+            if collect_metrics:
+                self.metrics = self._create_metrics()
+
+            self._set_caller_lookup(caller_lookup)
+
+    def _create_metrics(self) -> "LoggerMetrics":
+        """Instrument the handlers created by this TidyLogger, and add the gauges of the queue, the sampling and the throttling."""
+        metrics = _import_module("metrics").LoggerMetrics()
+        metrics.instrument_handler(self.file_handler, "file")
+        metrics.instrument_handler(self.console_handler, "console")
+        if self.ring_buffer_handler is not None:
+            metrics.instrument_handler(self.ring_buffer_handler, "ring_buffer")
+        if self.shipping_handler is not None:
+            shipping_handler: ShippingHandler = self.shipping_handler
+            metrics.instrument_handler(shipping_handler, "shipping")
+            metrics.add_gauge("shipping_spool_records", lambda: shipping_handler.stats()["spool_records"])
+            metrics.add_gauge("shipping_dropped_records", lambda: shipping_handler.dropped_record_count + shipping_handler.unspooled_record_count)
+        if self._queue_handler is not None:
+            queue_handler: BoundedQueueHandler = self._queue_handler
+            metrics.add_gauge("queue_depth", queue_handler.queue.qsize)
+            metrics.add_gauge("queue_dropped_records", lambda: queue_handler.dropped_count)
+        if isinstance(self.console_handler, NonBlockingConsoleHandler):
+            console_handler: NonBlockingConsoleHandler = self.console_handler
+            metrics.add_gauge("console_dropped_records", lambda: console_handler.dropped_record_count)
+        if self._sampling_filter is not None:
+            sampling_filter: SamplingFilter = self._sampling_filter
+            metrics.add_gauge("sampling_dropped_records", lambda: sampling_filter.dropped_count)
+        if self._throttle_filter is not None:
+            throttle_filter: CallSiteThrottleFilter = self._throttle_filter
+            metrics.add_gauge("throttling_suppressed_records", lambda: throttle_filter.total_suppressed_count)
+        return metrics
+
+    def set_levels(self, console_level: int | str | None = None, file_level: int | str | None = None) -> None:
+        """
+        Change the logging levels of the console and file output, and update the level of the logger accordingly.
+        :param console_level: New logging level for console output. If None, it is not changed.
+        :param file_level: New logging level for file output. If None, it is not changed.
+        """
+        if console_level is not None and self.console_handler is not None:
+            self.console_handler.setLevel(console_level)
+        if file_level is not None and self.file_handler is not None:
+            self.file_handler.setLevel(file_level)
+        levels: list[int] = [handler.level for handler in (self.console_handler, self.file_handler, self.ring_buffer_handler) if handler is not None]
+        if not levels:
+            # The handlers were not created by this TidyLogger
+            levels = [logging._checkLevel(level) for level in (console_level, file_level) if level is not None]
+        if levels:
+            self.logger.setLevel(min(levels))
+
+    def _set_caller_lookup(self, caller_lookup: str) -> None:
+        """Replace the caller lookup of the named logger, see the `caller_lookup` argument of `__init__`. Only called by the TidyLogger that creates the handlers of the logger."""
+        if caller_lookup == "auto":
+            handlers: list[logging.Handler] = [handler for handler in self.logger.handlers if handler is not self._queue_handler]
+            if self._queue_listener is not None:
+                handlers.extend(self._queue_listener.handlers)
+            if self._throttle_filter is not None or any(formatter_uses_caller_fields(handler.formatter) for handler in handlers):
+                caller_lookup = "always"
+            else:
+                caller_lookup = "never"
+        self.logger.findCaller = find_caller if caller_lookup == "always" else skip_caller
 
     def debug(self, message: str, *args, **kwargs) -> None:
         """Log a debug message."""
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
         kwargs.setdefault("stacklevel", 2)
         self.logger.debug(message, *args, **kwargs)
 
     def info(self, message: str, *args, **kwargs) -> None:
         """Log an info message."""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
         kwargs.setdefault("stacklevel", 2)
         self.logger.info(message, *args, **kwargs)
 
     def warning(self, message: str, *args, **kwargs) -> None:
         """Log a warning message."""
+        if not self.logger.isEnabledFor(logging.WARNING):
+            return
         kwargs.setdefault("stacklevel", 2)
         self.logger.warning(message, *args, **kwargs)
 
     def error(self, message: str, *args, **kwargs) -> None:
         """Log an error message."""
+        if not self.logger.isEnabledFor(logging.ERROR):
+            return
         kwargs.setdefault("stacklevel", 2)
         self.logger.error(message, *args, **kwargs)
 
     def critical(self, message: str, *args, **kwargs) -> None:
         """Log a critical message."""
+        if not self.logger.isEnabledFor(logging.CRITICAL):
+            return
         kwargs.setdefault("stacklevel", 2)
         self.logger.critical(message, *args, **kwargs)
 
     def debug_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
         """Log a debug message with exception details."""
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
         kwargs.setdefault("stacklevel", 2)
-        debug_full_message: str = self._get_full_message(message=message, ex=ex)
+        debug_full_message: LazyExceptionMessage = self._get_lazy_full_message(message=message, ex=ex)
         self.logger.debug(debug_full_message, *args, **kwargs)
 
     def info_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
         """Log an info message with exception details."""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
         kwargs.setdefault("stacklevel", 2)
-        info_full_message: str = self._get_full_message(message=message, ex=ex)
+        info_full_message: LazyExceptionMessage = self._get_lazy_full_message(message=message, ex=ex)
         self.logger.info(info_full_message, *args, **kwargs)
 
     def warning_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
         """Log a warning message with exception details."""
+        if not self.logger.isEnabledFor(logging.WARNING):
+            return
         kwargs.setdefault("stacklevel", 2)
-        warning_full_message: str = self._get_full_message(message=message, ex=ex)
+        warning_full_message: LazyExceptionMessage = self._get_lazy_full_message(message=message, ex=ex)
         self.logger.warning(warning_full_message, *args, **kwargs)
 
     def error_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
         """Log an error message with exception details."""
+        if not self.logger.isEnabledFor(logging.ERROR):
+            return
         kwargs.setdefault("stacklevel", 2)
-        error_full_message: str = self._get_full_message(message=message, ex=ex)
+        error_full_message: LazyExceptionMessage = self._get_lazy_full_message(message=message, ex=ex)
         self.logger.error(error_full_message, *args, **kwargs)
 
     def critical_exception(self, ex: BaseException, message: str, *args, **kwargs) -> None:
         """Log a critical message with exception details."""
+        if not self.logger.isEnabledFor(logging.CRITICAL):
+            return
         kwargs.setdefault("stacklevel", 2)
-        critical_full_message: str = self._get_full_message(message=message, ex=ex)
+        critical_full_message: LazyExceptionMessage = self._get_lazy_full_message(message=message, ex=ex)
         self.logger.critical(critical_full_message, *args, **kwargs)
+        if self.ring_buffer_handler is not None:
+            self._dump_ring_buffer_on_crash()
+
+    def _get_lazy_full_message(self, message: str, ex: BaseException) -> LazyExceptionMessage:
+        """Construct a full log message whose exception details are only rendered when a handler formats the record."""
+        return LazyExceptionMessage(message=message, exception=ex, render=self._get_full_message)
 
     def _get_full_message(self, message: str, ex: BaseException) -> str:
         """Construct a full log message including the provided message and exception details."""
@@ -162,53 +575,152 @@ class TidyLogger:
         return f"{message}\n\n{exception_details}"
 
     def _log_exception(self, ex: BaseException, indentation: str = "    ", level: int = 0, is_inner_exception=False, inner_exception_num: int | None = None) -> str:
-        """Recursively log exception details, including chained exceptions and ExceptionGroup contents, with indentation for readability.
+        """Log exception details, including chained exceptions and ExceptionGroup contents, with indentation for readability.
+        The exception tree is rendered iteratively, see `ExceptionRenderer`.
 
         :param ex: The exception to log.
         :param indentation: The string to use for indentation (default is 4 spaces).
-        :param level: The current indentation level (used for recursive calls).
-        :param is_inner_exception: Whether the current exception is an inner exception (part of an ExceptionGroup).
+        :param level: The indentation level of the exception.
+        :param is_inner_exception: Whether the exception is an inner exception (part of an ExceptionGroup).
         :param inner_exception_num: The number of the inner exception if it is part of an ExceptionGroup (used for labeling).
 
         :return: A formatted string containing the exception details.
         """
-        indent: str = indentation * level
-
         if is_inner_exception and inner_exception_num is not None:
             exception_type_header: str = "Exception {}".format(inner_exception_num)
         else:
             exception_type_header: str = "Exception"
 
-        message_lines = []
-        message_lines.append("{}– {}".format(indent, "{}: {}".format(exception_type_header, type(ex).__name__)))
-        message_header: str = "Message:".ljust(len(exception_type_header))
-        message_lines.append("{}  {}".format(indent, "{}  {}".format(message_header, str(ex).replace("\n", "\n" + indent + " " * (len(exception_type_header) + 2 + 1)))))
-        traceback_text: str = "".join(traceback.format_tb(ex.__traceback__)).lstrip().rstrip("\n")
-        traceback_header: str = "Traceback:".ljust(len(exception_type_header))
-        message_lines.append("{}  {}".format(indent, "{} {}".format(traceback_header, traceback_text.replace("\n", "\n" + indent + " " * (len(exception_type_header) + 2 + 1)))))
-
-        # Explicit chained exception: raise X from Y
-        if ex.__cause__:
-            message_lines.append("{}  {}".format(indent, "Caused by:"))
-            message_lines.append(self._log_exception(ex=ex.__cause__, indentation=indentation, level=level + 1))
-        # Implicit chained exception
-        elif ex.__context__:
-            message_lines.append("{}  {}".format(indent, "In Context:"))
-            message_lines.append(self._log_exception(ex=ex.__context__, indentation=indentation, level=level + 1))
-
-        # Python 3.11+ ExceptionGroup support
-        if isinstance(ex, ExceptionGroup):
-            num_exceptions: int = len(ex.exceptions)
-            message_lines.append("{}  {}".format(indent, f"Contains {len(ex.exceptions)} exception{'s' if num_exceptions > 1 else ''}:"))
-
-            for i, inner in enumerate(ex.exceptions, start=1):
-                message_lines.append(self._log_exception(ex=inner, indentation=indentation, level=level + 1, is_inner_exception=True, inner_exception_num=i))
-
-        return "\n".join(message_lines)
+        exception_renderer: ExceptionRenderer | None = self._exception_renderer
+        if exception_renderer is None:
+            # Imports `traceback`, which programs that never log an exception do not need
+            exception_renderer = self._exception_renderer = _import_module("exception_rendering").ExceptionRenderer(
+                max_depth=self._max_exception_depth, max_group_exceptions=self._max_exception_group_size
+            )
+        return exception_renderer.render(ex, level=level, exception_type_header=exception_type_header, indentation=indentation)
+
+    def bind(self, **fields) -> "BoundLogger":
+        """
+        Return a logger whose records have bound fields (e.g. a request id, a tenant and a user), written in the header line of the text format and as the 'context' object of the JSON format.
+        The fields are rendered once, instead of on every call as the `extra` fields. Nested binds (`bind` of the returned logger) share the fields of their parent.
+        :param fields: The fields to bind, e.g. `request_id="abc"`.
+        :return: The bound logger, with the same logging methods.
+        :raises ValueError: If a field name is not an identifier.
+        """
+        context: ModuleType = _import_module("context")
+        self._add_bound_context_filter(context)
+        return context.BoundLogger(self, context.BoundContext(fields))
+
+    def bind_context(self, **fields) -> "AbstractContextManager[BoundContext]":
+        """
+        Bind fields to the records logged inside a `with` block, by any logger of the block (including the records of `bind`), and by the asyncio tasks created inside it, which inherit them through a context variable.
+        Nested blocks add their fields to the enclosing block, see `context.bound_context`.
+        :param fields: The fields to bind, e.g. `request_id="abc"`.
+        :return: A context manager, which returns the bound context.
+        :raises ValueError: If a field name is not an identifier.
+        """
+        context: ModuleType = _import_module("context")
+        self._add_bound_context_filter(context)
+        return context.bound_context(**fields)
+
+    def _add_bound_context_filter(self, context: ModuleType) -> None:
+        """Add the filter attaching the context of `bind_context` to the records, first, so sampling can use the bound fields as `sample_key`."""
+        if self._bound_context_filter is None:
+            self._bound_context_filter = context.ContextFilter()
+            self.logger.filters.insert(0, self._bound_context_filter)
+
+    @property
+    def dropped_record_count(self) -> int:
+        """The number of records dropped because the queue was full (always 0 if async mode is not used)."""
+        if self._queue_handler is None:
+            return 0
+        return self._queue_handler.dropped_count
+
+    def throttle_stats(self) -> dict:
+        """Return the throttling statistics: the numbers of allowed and suppressed records in total and per call site. Empty if throttling is not used."""
+        if self._throttle_filter is None:
+            return {}
+        return self._throttle_filter.stats()
+
+    def sampling_stats(self) -> dict:
+        """Return the sampling statistics: the numbers of kept, dropped, held and flushed records. Empty if sampling is not used."""
+        if self._sampling_filter is None:
+            return {}
+        return self._sampling_filter.stats()
+
+    def dump_ring_buffer(self, file_path: str | Path | None = None) -> Path | None:
+        """
+        Write the records kept in memory to a crash dump file, the oldest first.
+        :param file_path: The path of the dump file. If None, '<log file stem>_crash_<date>-<time><log file suffix>' next to the log file is used.
+        :return: The path of the dump file, or None if no records are kept in memory (`ring_buffer_size` is 0).
+        """
+        if self.ring_buffer_handler is None:
+            return None
+        if file_path is None:
+            from datetime import datetime
+
+            timestamp: str = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            file_path = self._log_file_path.with_name("{}_crash_{}{}".format(self._log_file_path.stem, timestamp, self._log_file_path.suffix))
+        return self.ring_buffer_handler.dump(file_path)
+
+    def _dump_ring_buffer_on_crash(self) -> None:
+        """Dump the records kept in memory after a crash. A failing dump is printed to stderr (like the errors of the handlers), so the crash is still reported."""
+        try:
+            self.dump_ring_buffer()
+        except Exception:
+            import traceback
+
+            traceback.print_exc(file=sys.stderr)
+
+    def _install_crash_hooks(self) -> None:
+        """Dump the records kept in memory on unhandled exceptions, then call the previous hooks."""
+        previous_excepthook = self._previous_excepthook = sys.excepthook
+        previous_threading_excepthook = self._previous_threading_excepthook = threading.excepthook
+
+        def excepthook(exc_type, exc_value, exc_traceback) -> None:
+            self._dump_ring_buffer_on_crash()
+            previous_excepthook(exc_type, exc_value, exc_traceback)
+
+        def threading_excepthook(args: threading.ExceptHookArgs) -> None:
+            self._dump_ring_buffer_on_crash()
+            previous_threading_excepthook(args)
+
+        self._excepthook = excepthook
+        self._threading_excepthook = threading_excepthook
+        sys.excepthook = excepthook
+        threading.excepthook = threading_excepthook
+
+    def _uninstall_crash_hooks(self) -> None:
+        # Only restore the previous hooks if no other hook was installed in the meantime
+        if self._previous_excepthook is not None and sys.excepthook is self._excepthook:
+            sys.excepthook = self._previous_excepthook
+        if self._previous_threading_excepthook is not None and threading.excepthook is self._threading_excepthook:
+            threading.excepthook = self._previous_threading_excepthook
+        self._previous_excepthook = None
+        self._previous_threading_excepthook = None
 
     def close(self) -> None:
-        """Close all handlers associated with the logger."""
-        for handler in list(self.logger.handlers):
+        """Close all handlers associated with the logger. In async mode, the queued records are written before the handlers are closed."""
+        self._uninstall_crash_hooks()
+        self.logger.__dict__.pop("findCaller", None)
+        if self._bound_context_filter is not None:
+            self.logger.removeFilter(self._bound_context_filter)
+            self._bound_context_filter = None
+        if self._sampling_filter is not None:
+            self.logger.removeFilter(self._sampling_filter)
+            self._sampling_filter = None
+        if self._throttle_filter is not None:
+            self._throttle_filter.flush_summaries()
+            self.logger.removeFilter(self._throttle_filter)
+            self._throttle_filter = None
+        handlers = list(self.logger.handlers)
+        if self._queue_listener is not None:
+            # Stop accepting new records, then drain the queue
+            self.logger.removeHandler(self._queue_handler)
+            self._queue_listener.stop()
+            handlers.extend(self._queue_listener.handlers)
+            self._queue_listener = None
+        for handler in handlers:
             try:
                 handler.flush()
             except Exception:
@@ -265,6 +777,8 @@ class TidyLogger:
         # OS standard log directory
         if use_os_standard_log_directory:
             if app_name is not None and app_author is not None:
+                import platformdirs
+
                 return Path(platformdirs.user_log_dir(app_name, app_author)).expanduser().resolve()
 
         # fallback: current working directory as absolute path
@@ -272,7 +786,10 @@ class TidyLogger:
 
     @staticmethod
     def _create_log_file_name(
-        log_file_name: str | None = None, log_file_name_environment_variable_name: str = TIDY_LOGGER_LOG_FILE_NAME_ENV_VAR, add_date_suffix_to_file_name: bool = True
+        log_file_name: str | None = None,
+        log_file_name_environment_variable_name: str = TIDY_LOGGER_LOG_FILE_NAME_ENV_VAR,
+        add_date_suffix_to_file_name: bool = True,
+        now: "datetime | None" = None,
     ) -> Path:
         """
         Validate and normalize a log file name.
@@ -280,11 +797,13 @@ class TidyLogger:
         :param log_file_name: The log file name. If None, checks the environment variable, then uses the default name.
         :param log_file_name_environment_variable_name: The name of the environment variable to check for the log file name. If the log_file_name is None and the environment variable is not set, the function will use the default log file name.
         :param add_date_suffix_to_file_name: Whether to append the current date to the log file name.
+        :param now: The date used for the date suffix. If None, the current date is used.
         :return: A string representing the validated log file name.
         :raises ValueError: If the provided `log_file_name` is an empty string, contains null bytes, or contains invalid characters for Windows paths; or if the environment variable is set to an empty string.
         """
 
-        date_suffix: str = datetime.now().strftime("%Y%m%d")
+        # `time.strftime` formats the current local date without importing `datetime`
+        date_suffix: str = time.strftime("%Y%m%d") if now is None else now.strftime("%Y%m%d")
 
         if log_file_name is None:
             log_file_name_from_env: str = os.getenv(log_file_name_environment_variable_name)
@@ -0,0 +1,6 @@
+import logging
+
+
+def create_record(message: str, level: int = logging.INFO) -> logging.LogRecord:
+    """Return a record of the 'App' logger, logged from `handle` of '/app/server.py', for the tests that pass records to handlers directly."""
+    return logging.LogRecord("App", level, "/app/server.py", 10, message, None, None, func="handle")
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import logging
+import sys
+import threading
+from contextvars import ContextVar
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from asyncio_logging import AsyncTidyLogger, ContextVarsFilter  # noqa: E402
+
+request_id: ContextVar[str] = ContextVar("request_id")
+
+
+class SlowHandler(logging.Handler):
+    """A handler whose writes take a while, like a slow disk, and which records the thread of each write."""
+
+    def __init__(self):
+        super().__init__()
+        self.messages: list[str] = []
+        self.threads: set[int] = set()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        threading.Event().wait(0.01)
+        self.threads.add(threading.get_ident())
+        self.messages.append(record.getMessage())
+
+
+def test_context_vars_filter():
+
+    context_filter = ContextVarsFilter([request_id])
+
+    async def log_in_task() -> logging.LogRecord:
+        request_id.set("request-1")
+        record = logging.makeLogRecord({"msg": "message"})
+        context_filter.filter(record)
+        return record
+
+    async def main() -> logging.LogRecord:
+        return await asyncio.create_task(log_in_task(), name="handler-task")
+
+    record = asyncio.run(main())
+    assert record.taskName == "handler-task", "The name of the current task must be added."
+    assert record.request_id == "request-1", "The values of the context variables must be added."
+
+    record = logging.makeLogRecord({"msg": "message", "request_id": "explicit"})
+    context_filter.filter(record)
+    assert record.taskName is None, "The task name must be None outside of a task."
+    assert record.request_id == "explicit", "`extra` fields must not be overwritten."
+    record = logging.makeLogRecord({"msg": "message"})
+    context_filter.filter(record)
+    assert not hasattr(record, "request_id"), "Unset context variables must be skipped."
+
+
+def test_async_tidy_logger(tmp_path: Path):
+
+    with pytest.raises(ValueError):
+        AsyncTidyLogger(app_name="AsyncTidyLoggerInvalid", log_file_directory=tmp_path, print_log_file_path=False, async_mode=False)
+
+    tidy_logger = AsyncTidyLogger(
+        app_name="AsyncTidyLoggerTest",
+        log_file_name="async.log",
+        log_file_directory=tmp_path,
+        add_date_suffix_to_file_name=False,
+        print_log_file_path=False,
+        console_level=logging.CRITICAL,
+        file_format="ndjson",
+        context_variables=[request_id],
+    )
+    slow_handler = SlowHandler()
+    tidy_logger._queue_listener.handlers += (slow_handler,)
+
+    async def handle_request(i: int) -> None:
+        request_id.set(f"request-{i}")
+        tidy_logger.info("Fire and forget %d", i)
+        await tidy_logger.ainfo("Awaited %d", i)
+
+    async def main() -> None:
+        loop_thread: int = threading.get_ident()
+        await asyncio.gather(*(handle_request(i) for i in range(5)))
+        assert len(slow_handler.messages) == 10, "Awaitable methods must return once the records logged before are written."
+        assert loop_thread not in slow_handler.threads, "Records must not be written on the event loop."
+
+        tidy_logger.info("Written by aclose")
+        await tidy_logger.aclose()
+        await tidy_logger.ainfo("After close")
+
+    asyncio.run(main())
+
+    assert slow_handler.messages[-1] == "Written by aclose", "`aclose` must write the queued records."
+    records: list[dict] = [json.loads(line) for line in (tmp_path / "async.log").read_text().splitlines()]
+    assert len(records) == 11
+    assert {record["extra"]["request_id"] for record in records[:10]} == {f"request-{i}" for i in range(5)}, "Context variables must be captured."
+    assert all(record["task"].startswith("Task-") for record in records[:10]), "The task names must be captured."
+    assert all(record["function"] == "handle_request" for record in records[:10]), "The caller must be the coroutine, not the logger."
+    assert not tidy_logger.logger.filters, "The context filter must be removed on close."
@@ -0,0 +1,127 @@
+import io
+import json
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from binary_format import BinaryFileHandler, BinaryLogReader, BinaryRotatingFileHandler, main, render_binary_log  # noqa: E402
+from formatters import IndentedMessageFormatter  # noqa: E402
+
+from tidy_logger import TidyLogger  # noqa: E402
+
+
+class Point:
+    def __repr__(self) -> str:
+        return "Point(1, 2)"
+
+
+def create_records() -> list[logging.LogRecord]:
+    try:
+        raise KeyError("missing")
+    except KeyError:
+        exc_info = sys.exc_info()
+    return [
+        logging.LogRecord("App", logging.INFO, "/app/server.py", 10, "Started", None, None, func="start"),
+        logging.LogRecord(
+            "App.db", logging.WARNING, "/app/db.py", 20, "Query %s took %.2f ms (%d rows, cached: %s, %r, %s)", ("SELECT 1", 12.5, 3, True, None, b"\x00"), None, func="query"
+        ),
+        logging.LogRecord("App", logging.INFO, "/app/server.py", 10, "Multi-line\n%s", ("second line",), None, func="start"),
+        logging.LogRecord("App", logging.ERROR, "/app/server.py", 30, "Mapping %(key)s", None, None, func="handle"),
+        logging.LogRecord("App", logging.ERROR, "/app/server.py", 40, "Point %r", (Point(),), None, func="handle"),
+        logging.LogRecord("App", logging.ERROR, "/app/server.py", 50, "Failed", None, exc_info, func="handle", sinfo="Stack (most recent call last):\n  here"),
+        logging.LogRecord("App", 25, "/app/server.py", 60, "Custom level %d", (2**70,), None, func="handle"),
+    ]
+
+
+def test_binary_format(tmp_path: Path):
+
+    records: list[logging.LogRecord] = create_records()
+    records[3].args = {"key": "value"}
+
+    binary_file_path: Path = tmp_path / "app.bin"
+    handler = BinaryFileHandler(binary_file_path)
+    for record in records:
+        handler.handle(record)
+    handler.close()
+    for record in records:
+        record.exc_text = None
+    expected_text = "".join(IndentedMessageFormatter().format(record) + "\n" for record in records)
+
+    output = io.StringIO()
+    reader: BinaryLogReader = render_binary_log(binary_file_path, output)
+    assert output.getvalue() == expected_text, "The rendered text must be exactly the text of IndentedMessageFormatter."
+    assert reader.truncated_byte_count == 0 and reader.corrupted_byte_count == 0
+
+    output = io.StringIO()
+    render_binary_log(binary_file_path, output, "ndjson")
+    objects: list[dict] = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert objects[1]["message"] == "Query SELECT 1 took 12.50 ms (3 rows, cached: True, None, b'\\x00')"
+    assert objects[1]["logger"] == "App.db" and objects[1]["function"] == "query" and objects[1]["line"] == 20
+
+    # Interned strings are written once per file
+    assert binary_file_path.read_bytes().count(b"/app/server.py") == 1, "Strings must be interned."
+
+    # A crash in the middle of a record, then a new session appended to the same file
+    with open(binary_file_path, "ab") as file:
+        file.write(binary_file_path.read_bytes()[-30:-10])
+    handler = BinaryFileHandler(binary_file_path)
+    handler.handle(records[0])
+    handler.close()
+    with BinaryLogReader(binary_file_path) as reader:
+        decoded = list(reader.records())
+        assert [record.getMessage() for record in decoded[-2:]] == [records[-1].getMessage(), "Started"], "Records after a torn write must be decoded."
+        assert reader.corrupted_byte_count == 20
+
+    # A truncated tail
+    data: bytes = binary_file_path.read_bytes()
+    binary_file_path.write_bytes(data[:-5])
+    with BinaryLogReader(binary_file_path) as reader:
+        assert len(list(reader.records())) == len(records), "The truncated record must be skipped."
+        assert reader.truncated_byte_count > 0
+
+    (tmp_path / "text.log").write_text("not binary")
+    with pytest.raises(ValueError):
+        BinaryLogReader(tmp_path / "text.log")
+
+
+def test_binary_rotation_and_tidy_logger(tmp_path: Path, capsys):
+
+    handler = BinaryRotatingFileHandler(tmp_path / "rotating.bin", maxBytes=500, backupCount=5)
+    for i in range(50):
+        handler.handle(logging.LogRecord("App", logging.INFO, "/app/server.py", 10, "Record %d", (i,), None, func="start"))
+    handler.close()
+    files: list[Path] = [tmp_path / "rotating.bin.{}".format(i) for i in range(5, 0, -1)] + [tmp_path / "rotating.bin"]
+    messages: list[str] = [record.getMessage() for file_path in files if file_path.exists() for record in BinaryLogReader(file_path).records()]
+    assert messages == [f"Record {i}" for i in range(50 - len(messages), 50)], "Each rotated file must be decodable on its own."
+    assert all(file_path.stat().st_size <= 500 for file_path in files if file_path.exists())
+
+    with pytest.raises(ValueError):
+        TidyLogger(app_name="BinaryInvalid", log_file_directory=tmp_path, print_log_file_path=False, file_format="binary", use_batched_file_writes=True)
+
+    tidy_logger = TidyLogger(
+        app_name="BinaryTidyLogger",
+        log_file_name="app.bin",
+        log_file_directory=tmp_path,
+        add_date_suffix_to_file_name=False,
+        print_log_file_path=False,
+        console_level=logging.CRITICAL,
+        file_format="binary",
+        format_outside_lock=True,
+        collect_metrics=True,
+    )
+    tidy_logger.info("Request %d done", 1)
+    try:
+        raise ValueError("bad value")
+    except ValueError as ex:
+        tidy_logger.error_exception(ex, "Request failed")
+    assert tidy_logger.metrics.stats()["handlers"]["file"]["bytes_written"] > 0
+    tidy_logger.close()
+
+    assert main([str(tmp_path / "app.bin")]) == 0
+    output: str = capsys.readouterr().out
+    assert "test_binary_format.py test_binary_rotation_and_tidy_logger()" in output, "The caller must be written."
+    assert "   Request 1 done\n" in output and "bad value" in output
@@ -0,0 +1,68 @@
+import io
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from console import NonBlockingConsoleHandler, stream_supports_color  # noqa: E402
+from formatters import ColoredIndentedMessageFormatter  # noqa: E402
+
+
+class TerminalStream(io.StringIO):
+    def isatty(self) -> bool:
+        return True
+
+
+class BlockingStream(io.StringIO):
+    """A stream whose writes block until `unblock` is set, like a full pipe."""
+
+    def __init__(self):
+        super().__init__()
+        self.unblock = threading.Event()
+        self.write_count: int = 0
+
+    def write(self, text: str) -> int:
+        self.unblock.wait()
+        self.write_count += 1
+        return super().write(text)
+
+
+def test_stream_supports_color(monkeypatch: pytest.MonkeyPatch):
+
+    monkeypatch.delenv("NO_COLOR", raising=False)
+    assert stream_supports_color(TerminalStream()), "Terminals must be colored."
+    assert not stream_supports_color(io.StringIO()), "Other streams must not be colored."
+
+    monkeypatch.setenv("NO_COLOR", "1")
+    assert not stream_supports_color(TerminalStream()), "Terminals must not be colored if NO_COLOR is set."
+
+    record = logging.makeLogRecord({"msg": "message", "levelno": logging.INFO, "levelname": "INFO"})
+    assert "\033[" not in ColoredIndentedMessageFormatter(use_colors=False).format(record), "No escape codes must be written without colors."
+
+
+def test_non_blocking_console_handler():
+
+    stream = BlockingStream()
+    handler = NonBlockingConsoleHandler(stream, buffer_size=100)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    start: float = time.monotonic()
+    for i in range(50):
+        handler.handle(logging.makeLogRecord({"msg": f"record {i:02d}"}))
+    assert time.monotonic() - start < 1, "Logging must not block on a blocked stream."
+    assert handler.dropped_record_count > 0, "Records that do not fit in the buffer must be dropped and counted."
+
+    stream.unblock.set()
+    handler.flush()
+    handler.close()
+
+    output_lines: list[str] = stream.getvalue().splitlines()
+    assert f"[{handler.dropped_record_count} console log records dropped]" in output_lines, "The number of dropped records must be written."
+    written_records: list[str] = [line for line in output_lines if line.startswith("record")]
+    assert len(written_records) == 50 - handler.dropped_record_count and written_records == sorted(written_records), "The other records must be written in order."
+    assert stream.write_count < len(written_records), "Buffered records must be coalesced into fewer writes."
@@ -0,0 +1,125 @@
+import asyncio
+import io
+import json
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from binary_format import render_binary_log  # noqa: E402
+from context import BoundContext, BoundLogger, current_context  # noqa: E402
+from reader import LogFileReader  # noqa: E402
+
+from tidy_logger import TidyLogger  # noqa: E402
+
+
+def test_bound_context():
+
+    context = BoundContext({"request_id": "r1", "tenant": "acme"})
+    assert context.header_fragment == " {request_id=r1, tenant=acme}"
+    assert json.loads("{" + context.json_fragment[1:] + "}") == {"context": {"request_id": "r1", "tenant": "acme"}}
+
+    # A nested context only keeps its own fields, and extends the rendered fragments of its parent
+    nested = context.bind(user="bob", attempt=2)
+    assert nested.parent is context and nested.fields == {"user": "bob", "attempt": 2}
+    assert nested.header_fragment == " {request_id=r1, tenant=acme, user=bob, attempt=2}"
+    assert nested.get("tenant") == "acme" and nested.get("missing", 0) == 0
+    assert nested.as_dict() == {"request_id": "r1", "tenant": "acme", "user": "bob", "attempt": 2}
+
+    replaced = nested.bind(tenant="other\nline")
+    assert replaced.header_fragment == " {request_id=r1, tenant=other\\nline, user=bob, attempt=2}", "A replaced field must be rendered once, on a single line."
+    assert BoundContext.from_json_items(replaced.json_items).as_dict() == replaced.as_dict()
+
+    # The combination with an ambient context is cached
+    ambient = BoundContext({"trace": "t9"})
+    assert nested.combine(ambient) is nested.combine(ambient) and nested.combine(ambient).header_fragment == " {trace=t9, request_id=r1, tenant=acme, user=bob, attempt=2}"
+
+    with pytest.raises(ValueError):
+        BoundContext({"not valid": 1})
+
+
+def test_bound_logger(tmp_path: Path):
+
+    tidy_logger = TidyLogger(
+        app_name="BoundLoggerApp",
+        log_file_directory=tmp_path,
+        log_file_name="app",
+        add_date_suffix_to_file_name=False,
+        print_log_file_path=False,
+        console_level=logging.CRITICAL,
+        ring_buffer_size=10,
+    )
+    request_logger: BoundLogger = tidy_logger.bind(request_id="r1", tenant="acme")
+    request_logger.info("Started")
+    user_logger: BoundLogger = request_logger.bind(user="bob")
+    user_logger.warning("Quota at %d%%", 90, extra={"quota": 90})
+    with tidy_logger.bind_context(trace="t9"):
+
+        async def handle() -> None:
+            # Tasks inherit the context of their creator
+            tidy_logger.info("In task")
+            user_logger.info("In task, bound")
+
+        asyncio.run(handle())
+    assert current_context.get() is None
+    tidy_logger.info("Unbound")
+    ring_buffer_path: Path = tidy_logger.dump_ring_buffer(tmp_path / "ring_buffer.log")
+    tidy_logger.close()
+
+    with LogFileReader(tmp_path / "app.log") as reader:
+        records = [(record.logger_name, record.context, record.file_name, record.function_name) for record in reader.query()]
+    assert [record[:2] for record in records] == [
+        ("BoundLoggerApp", "request_id=r1, tenant=acme"),
+        ("BoundLoggerApp", "request_id=r1, tenant=acme, user=bob"),
+        ("BoundLoggerApp", "trace=t9"),
+        ("BoundLoggerApp", "trace=t9, request_id=r1, tenant=acme, user=bob"),
+        ("BoundLoggerApp", ""),
+    ]
+    assert records[0][2:] == (Path(__file__).name, "test_bound_logger"), "The caller of the bound logger must be found."
+    assert "[BoundLoggerApp] {request_id=r1, tenant=acme, user=bob}:\n   Quota at 90%" in ring_buffer_path.read_text(), "The ring buffer must keep the bound context."
+
+
+def test_bound_logger_formats(tmp_path: Path):
+
+    tidy_logger = TidyLogger(
+        app_name="BoundJsonApp",
+        log_file_directory=tmp_path,
+        log_file_name="app",
+        add_date_suffix_to_file_name=False,
+        print_log_file_path=False,
+        console_level=logging.CRITICAL,
+        file_format="ndjson",
+        redact_keys=["password"],
+        sample_rates={"INFO": 0.5},
+        sample_key="request_id",
+    )
+    for i in range(40):
+        request_logger: BoundLogger = tidy_logger.bind(request_id=f"r{i}", password="hunter2")
+        request_logger.info("First")
+        request_logger.info("Second")
+    tidy_logger.close()
+    records: list[dict] = [json.loads(line) for line in (tmp_path / "app.log").read_text().splitlines()]
+    kept = [record["context"]["request_id"] for record in records]
+    assert 0 < len(kept) < 80 and all(kept.count(request_id) == 2 for request_id in kept), "The records must be sampled by their bound `sample_key`."
+    assert records[0]["context"]["password"] == "[REDACTED]"
+
+    # The binary format interns the context, which the decoder renders as the JSON format would have written it
+    tidy_logger = TidyLogger(
+        app_name="BoundBinaryApp",
+        log_file_directory=tmp_path,
+        log_file_name="binary",
+        add_date_suffix_to_file_name=False,
+        print_log_file_path=False,
+        console_level=logging.CRITICAL,
+        file_format="binary",
+    )
+    request_logger = tidy_logger.bind(request_id="r1", attempt=2)
+    request_logger.info("Started %s", "job")
+    request_logger.info("Done")
+    tidy_logger.close()
+    output = io.StringIO()
+    render_binary_log(tmp_path / "binary.log", output, "ndjson")
+    assert [json.loads(line)["context"] for line in output.getvalue().splitlines()] == [{"request_id": "r1", "attempt": 2}] * 2
@@ -0,0 +1,53 @@
+import sys
+import traceback
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from exception_rendering import ExceptionRenderer, exception_to_dict, format_traceback  # noqa: E402
+
+
+def recurse(depth: int) -> None:
+    if depth == 0:
+        raise ValueError("recursion end")
+    recurse(depth - 1)
+
+
+def test_format_traceback():
+
+    try:
+        recurse(20)
+    except ValueError as ex:
+        expected_text: str = "".join(traceback.format_tb(ex.__traceback__))
+        assert format_traceback(ex.__traceback__) == expected_text, "The traceback must be formatted like traceback.format_tb."
+        assert format_traceback(ex.__traceback__) == expected_text, "The memoized traceback must be formatted like traceback.format_tb."
+
+
+def test_exception_renderer_limits():
+
+    # Deep chain, deeper than the recursion limit
+    chain_length: int = sys.getrecursionlimit() + 100
+    ex: BaseException = ValueError("0")
+    for i in range(1, chain_length):
+        chained_ex = ValueError(str(i))
+        chained_ex.__cause__ = ex
+        ex = chained_ex
+
+    renderer = ExceptionRenderer(max_depth=10)
+    text: str = renderer.render(ex)
+    assert text.count("Caused by:") == 11, "The chain must be rendered up to the maximum depth."
+    assert "... {} more chained exceptions (maximum depth reached)".format(chain_length - 11) in text, "The rest of the chain must be summarized."
+    assert exception_to_dict(ex, max_depth=10) is not None, "The exception tree of a deep chain must be built."
+
+    # Cycle in the chain
+    first_ex, second_ex = ValueError("first"), ValueError("second")
+    first_ex.__context__, second_ex.__context__ = second_ex, first_ex
+    text = renderer.render(first_ex)
+    assert text.count("(already shown above)") == 1, "An exception must only be rendered once in a cycle."
+
+    # Large ExceptionGroup
+    group = ExceptionGroup("group", [ValueError(str(i)) for i in range(500)])
+    text = ExceptionRenderer(max_group_exceptions=20).render(group)
+    assert "Exception 20: ValueError" in text and "Exception 21: ValueError" not in text, "The exceptions of the group must be rendered up to the maximum."
+    assert "... 480 more exceptions" in text, "The remaining exceptions of the group must be summarized."
+    assert exception_to_dict(group, max_group_exceptions=20)["more_exceptions"] == 480, "The remaining exceptions of the group must be counted in the tree."
@@ -0,0 +1,111 @@
+import gzip
+import logging
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from file_handlers import BatchedFileHandler, BatchedRotatingFileHandler, TimedSizeRotatingFileHandler  # noqa: E402
+from helpers import create_record  # noqa: E402
+
+
+def test_batched_file_handler(tmp_path: Path):
+
+    log_file_path: Path = tmp_path / "batched.log"
+    handler = BatchedFileHandler(log_file_path, buffer_size=1024, flush_interval=0)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    # Records are buffered
+    for i in range(10):
+        handler.handle(create_record(f"record {i}"))
+    assert log_file_path.read_text() == "", "Records below the flush level must be buffered."
+    assert handler.flush_count == 0, "No write must happen before the buffer is flushed."
+
+    # Records at the flush level are written immediately, together with the buffered records
+    handler.handle(create_record("error record", logging.ERROR))
+    assert log_file_path.read_text() == "".join(f"record {i}\n" for i in range(10)) + "error record\n", "The buffer must be flushed on an error record."
+    assert handler.flush_count == 1, "The buffered records must be written with a single write."
+
+    # The buffer is written when it is full
+    for i in range(200):
+        handler.handle(create_record(f"full buffer record {i}"))
+    assert handler.flush_count > 1, "The buffer must be written when it is full."
+
+    handler.close()
+    assert log_file_path.read_text().endswith("full buffer record 199\n"), "The buffer must be flushed on close."
+    assert handler.bytes_written == log_file_path.stat().st_size, "The written bytes must be counted."
+
+
+def test_batched_rotating_file_handler(tmp_path: Path):
+
+    log_file_path: Path = tmp_path / "batched_rotating.log"
+    handler = BatchedRotatingFileHandler(log_file_path, maxBytes=1000, backupCount=100, buffer_size=256, flush_interval=0)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    for i in range(500):
+        handler.handle(create_record(f"record {i:04d}"))
+    handler.close()
+
+    log_files: list[Path] = list(tmp_path.iterdir())
+    assert len(log_files) > 1, "The log file must be rotated."
+    assert all(f.stat().st_size <= 1000 for f in log_files), "The rotated files must not exceed the maximum size."
+    lines: list[str] = [line for f in log_files for line in f.read_text().splitlines()]
+    assert sorted(lines) == [f"record {i:04d}" for i in range(500)], "No record must be lost or split by the rotation."
+
+
+def test_timed_size_rotating_file_handler(tmp_path: Path):
+
+    # Time-based rotation: the file name is recomputed, and the previous file is compressed in the background
+    file_names: list[str] = ["day_1.log", "day_2.log"]
+
+    def file_name_factory(now: datetime) -> Path:
+        return tmp_path / file_names[0]
+
+    handler = TimedSizeRotatingFileHandler(file_name_factory, when="midnight", compression="gzip")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler.handle(create_record("first day"))
+    assert handler.next_rollover_time > datetime.now().timestamp(), "The next rollover must be in the future."
+
+    file_names.pop(0)
+    handler.next_rollover_time = 0  # simulate midnight
+    handler.handle(create_record("second day"))
+    handler.wait_for_background_jobs()
+    handler.close()
+
+    assert (tmp_path / "day_2.log").read_text() == "second day\n", "After a time-based rotation, the records must be written to the new file."
+    assert gzip.decompress((tmp_path / "day_1.log.gz").read_bytes()) == b"first day\n", "The rotated file must be compressed."
+    assert not (tmp_path / "day_1.log").exists(), "The uncompressed rotated file must be removed."
+
+    # Size-based rotation with the same file name: the file is renamed to a backup, and old backups are removed
+    handler = TimedSizeRotatingFileHandler(lambda now: tmp_path / "sized.log", when="hourly", max_bytes=100, backup_count=2, compression="gzip")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    for i in range(50):
+        handler.handle(create_record(f"record {i:04d}"))
+    handler.wait_for_background_jobs()
+    handler.close()
+
+    backups: list[Path] = list(tmp_path.glob("sized.log.*"))
+    assert handler.rollover_count > 2, "The log file must be rotated by size."
+    assert len(backups) == 2 and all(b.suffix == ".gz" for b in backups), "Only `backup_count` compressed backups must be kept."
+
+    # Time-based rotation with a date suffix: the files of the previous periods count as backups
+    period: list[int] = [0]
+
+    def dated_file_name_factory(now: datetime) -> Path:
+        return tmp_path / "dated" / "app_{}.log".format((now + timedelta(days=period[0])).strftime("%Y%m%d"))
+
+    (tmp_path / "dated").mkdir()
+    (tmp_path / "dated" / "app_other_20200101.log").write_text("another log\n")
+    handler = TimedSizeRotatingFileHandler(dated_file_name_factory, when="midnight", backup_count=2)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    for i in range(5):
+        if i:
+            period[0] += 1
+            handler.next_rollover_time = 0  # simulate midnight
+        handler.handle(create_record(f"day {i}"))
+    handler.wait_for_background_jobs()
+    handler.close()
+
+    log_files: list[Path] = sorted((tmp_path / "dated").glob("app_2*.log"))
+    assert len(log_files) == 3 and log_files[-1].read_text() == "day 4\n", "Only `backup_count` files of the previous periods must be kept."
+    assert (tmp_path / "dated" / "app_other_20200101.log").exists(), "The files of other logs must not be removed."
@@ -0,0 +1,152 @@
+import io
+import json
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from formatters import ColoredIndentedMessageFormatter, IndentedMessageFormatter, JsonLinesFormatter, MessageSizeLimit  # noqa: E402
+from messages import LazyExceptionMessage  # noqa: E402
+from streaming import streaming_handler_class  # noqa: E402
+
+
+def test_format_once_render_many():
+
+    record = logging.makeLogRecord({"name": "test", "levelno": logging.INFO, "levelname": "INFO", "msg": "first line %s\nsecond line %d", "args": ("arg", 42)})
+
+    get_message_calls: list[None] = []
+    original_get_message = record.getMessage
+
+    def counting_get_message() -> str:
+        get_message_calls.append(None)
+        return original_get_message()
+
+    record.getMessage = counting_get_message
+
+    file_formatter = IndentedMessageFormatter()
+    console_formatter = ColoredIndentedMessageFormatter()
+
+    file_output: str = file_formatter.format(record)
+    console_output: str = console_formatter.format(record)
+    second_file_output: str = file_formatter.format(record)
+
+    assert file_output.endswith(":\n   first line arg\n   second line 42\n"), "The message must be interpolated and indented once."
+    assert second_file_output == file_output, "Formatting the same record again must give the same output."
+    assert console_output.endswith("{}   first line arg\n   second line 42\n".format(ColoredIndentedMessageFormatter.RESET)), "Only the header must be colored."
+    assert console_output.startswith(ColoredIndentedMessageFormatter.COLORS["INFO"]), "The header must be colored."
+    assert len(get_message_calls) == 1, "The message must be interpolated only once per record."
+    assert record.msg == "first line %s\nsecond line %d" and record.args == ("arg", 42), "`msg` and `args` of the record must not be changed."
+
+
+def test_compiled_format():
+
+    record = logging.makeLogRecord(
+        {"name": "test", "levelno": logging.WARNING, "levelname": "WARNING", "filename": "module.py", "funcName": "function", "lineno": 7, "msg": "message"}
+    )
+
+    for fmt in [IndentedMessageFormatter.default_logging_format, "%(levelname)-8s|%(lineno)05d|%(name)r|%(process)d %% %(message)s", "%(message)s"]:
+        formatter = IndentedMessageFormatter(fmt=fmt, indentation="")
+        reference_formatter = logging.Formatter(fmt=fmt, datefmt=IndentedMessageFormatter.default_date_format)
+        output: str = formatter.format(record)
+        record.msg = record.message  # the reference formatter interpolates `msg` again
+        assert output == reference_formatter.format(record), "The compiled format must render the same output as logging.Formatter. fmt: {!r}".format(fmt)
+        record.msg = "message"
+        del record._tidy_message, record._tidy_indented_messages
+
+    # The formatted time is cached per second
+    formatter = IndentedMessageFormatter()
+    assert formatter.formatTime(record, formatter.datefmt) is formatter.formatTime(record, formatter.datefmt), "The formatted time must be cached for the same second."
+
+
+def test_json_lines_formatter():
+
+    try:
+        try:
+            raise ValueError("inner")
+        except ValueError as inner_ex:
+            raise ExceptionGroup("group", [RuntimeError("first"), KeyError("second")]) from inner_ex
+    except ExceptionGroup as ex:
+        exception = ex
+
+    formatter = JsonLinesFormatter()
+
+    record = logging.makeLogRecord({"name": "test", "levelno": logging.ERROR, "levelname": "ERROR", "msg": "failed %s", "args": ("job",), "request_id": "abc"})
+    record.msg = LazyExceptionMessage(message=record.msg, exception=exception, render=lambda message, ex: "unused")
+    output: str = formatter.format(record)
+
+    assert "\n" not in output, "A record must be formatted as a single line."
+    obj: dict = json.loads(output)
+    assert obj["level"] == "ERROR" and obj["logger"] == "test", "The level and the logger name must be included."
+    assert obj["message"] == "failed job", "The message must be interpolated without the exception details."
+    assert obj["extra"] == {"request_id": "abc"}, "The `extra` fields must be included."
+    assert obj["exception"]["type"] == "ExceptionGroup", "The exception type must be included."
+    assert obj["exception"]["cause"]["message"] == "inner", "The cause of the exception must be included."
+    assert [e["type"] for e in obj["exception"]["exceptions"]] == ["RuntimeError", "KeyError"], "The exceptions of the group must be included in order."
+    assert obj["exception"]["frames"][0]["function"] == "test_json_lines_formatter", "The frames of the exception must be included."
+
+
+def test_streaming_format():
+
+    try:
+        raise KeyError("missing")
+    except KeyError:
+        exc_info = sys.exc_info()
+    messages: list[str] = ["line %d\r\n\nnext\x0bvertical tab\n" % i * 50 for i in range(3)] + ["x" * 300, "a\n\n\nb", "trailing newline\n" * 40, "y" * 100 + "\n"]
+    formatters: list[IndentedMessageFormatter] = [
+        IndentedMessageFormatter(chunk_size=16),
+        IndentedMessageFormatter(fmt="[%(levelname)s] %(message)s (%(lineno)d)", indentation="", chunk_size=16),
+        IndentedMessageFormatter(fmt="%(levelname)s only", chunk_size=16),
+        ColoredIndentedMessageFormatter(),
+        ColoredIndentedMessageFormatter(only_apply_on_header=False),
+    ]
+    formatters[3].chunk_size = formatters[4].chunk_size = 16
+    for message in messages:
+        for exc_info_value, stack_info in ((None, None), (exc_info, None), (None, "Stack (most recent call last):\n  here")):
+            for formatter in formatters:
+                record = logging.makeLogRecord({"name": "test", "levelno": logging.INFO, "levelname": "INFO", "msg": message, "exc_info": exc_info_value, "stack_info": stack_info})
+                texts: list[str] = list(formatter.iter_format(record))
+                expected: str = formatter.format(logging.makeLogRecord(dict(record.__dict__, _tidy_indented_messages=None, exc_text=None)))
+                assert "".join(texts) == expected, "The streamed texts must add up to the formatted record. message: {!r}".format(message[:20])
+                if message.count("\n") > 10 and "%(message)" in formatter._fmt:
+                    assert len(texts) > 2, "A large message must be streamed in chunks."
+
+    # The handler streams the large messages only
+    stream = io.StringIO()
+    handler = streaming_handler_class(logging.StreamHandler)(stream, streaming_threshold=100)
+    handler.setFormatter(IndentedMessageFormatter(fmt="%(message)s", chunk_size=16))
+    for message in ("small", "large\n" * 100):
+        handler.handle(logging.makeLogRecord({"msg": message}))
+    assert stream.getvalue() == "   small\n\n" + "   large\n" * 100 + "\n"
+    assert handler.streamed_record_count == 1
+
+
+def test_message_size_limit(tmp_path: Path):
+
+    limit = MessageSizeLimit(20, excerpt_size=5)
+    file_formatter = IndentedMessageFormatter(fmt="%(message)s", message_limit=limit)
+    json_formatter = JsonLinesFormatter(message_limit=limit)
+    record = logging.makeLogRecord({"name": "test", "msg": "%s", "args": ("0123456789" * 3 + "é",)})
+    assert file_formatter.format(record) == "   01234\n   [... 21 of 32 bytes truncated ...]\n   6789é\n", "The head, the tail and the omitted bytes must be written."
+    assert json.loads(json_formatter.format(record))["message"] == "01234\n[... 21 of 32 bytes truncated ...]\n6789é"
+    assert limit.truncated_count == 1, "The message must be truncated once per record."
+    assert IndentedMessageFormatter(fmt="%(message)s").format(record) == "   " + "0123456789" * 3 + "é\n", "A formatter without limit must write the whole message."
+
+    limit = MessageSizeLimit(20, policy="spill", spill_directory=tmp_path / "messages")
+    output: str = IndentedMessageFormatter(fmt="%(message)s", message_limit=limit).format(record)
+    spill_files: list[Path] = list((tmp_path / "messages").iterdir())
+    assert len(spill_files) == 1 and spill_files[0].read_text(encoding="utf-8") == "0123456789" * 3 + "é"
+    assert output == "   0123456789\n   [... message of 32 bytes written to {}]\n".format(spill_files[0]), "The spilled message must be referenced."
+
+    with pytest.raises(ValueError):
+        MessageSizeLimit(20, policy="spill")
+
+    # The JSON format limits the message without the exception details, the text format with them
+    exception_message = LazyExceptionMessage(message="failed %s", exception=ValueError("boom"), render=lambda message, ex: "{}\ndetails of {!r}".format(message, ex))
+    record = logging.makeLogRecord({"name": "test", "msg": exception_message, "args": ("x" * 30,)})
+    assert json.loads(json_formatter.format(record))["message"].endswith("xxxxx")
+    assert file_formatter.format(record).endswith("oom')\n"), "The text format must not reuse the message limited by the JSON format."
+    assert json.loads(json_formatter.format(record))["message"].endswith("xxxxx")
+    assert file_formatter.message_limit.truncated_count == 3, "Each limited message must be truncated once per record."
@@ -0,0 +1,73 @@
+import io
+import logging
+import sys
+import threading
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from helpers import create_record  # noqa: E402
+from metrics import LoggerMetrics  # noqa: E402
+
+from tidy_logger import TidyLogger  # noqa: E402
+
+
+def test_logger_metrics(tmp_path: Path):
+
+    metrics = LoggerMetrics()
+
+    stream_handler = logging.StreamHandler(io.StringIO())
+    stream_handler.addFilter(lambda record: "secret" not in record.msg)
+    metrics.instrument_handler(stream_handler, "console")
+
+    rotating_handler = RotatingFileHandler(tmp_path / "metrics.log", maxBytes=100, backupCount=2)
+    metrics.instrument_handler(rotating_handler, "file")
+
+    # The records of each thread are counted separately, and merged on read
+    def log_records() -> None:
+        for i in range(50):
+            stream_handler.handle(create_record(f"record {i}"))
+            rotating_handler.handle(create_record(f"record {i}"))
+
+    threads: list[threading.Thread] = [threading.Thread(target=log_records) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stream_handler.handle(create_record("secret record"))
+    stream_handler.handle(create_record("record ü"))
+    rotating_handler.close()
+
+    metrics.add_gauge("queue_depth", lambda: 7)
+    stats: dict = metrics.stats()
+    console_stats: dict = stats["handlers"]["console"]
+    assert console_stats["records_emitted"] == 201 and console_stats["records_filtered"] == 1, "The emitted and filtered records must be counted."
+    assert console_stats["bytes_written"] == len(stream_handler.stream.getvalue().encode()), "The written bytes must be counted."
+    assert console_stats["format_seconds"]["count"] == 201 and console_stats["write_seconds"]["count"] == 201, "The format and write times must be measured."
+    assert 0 < console_stats["format_seconds"]["p50"] <= console_stats["format_seconds"]["p99"], "The quantiles must be estimated."
+    file_stats: dict = stats["handlers"]["file"]
+    assert file_stats["rotations"] > 0 and file_stats["rotation_seconds"]["count"] == file_stats["rotations"], "The rotations must be counted and measured."
+    assert stats["gauges"] == {"queue_depth": 7}, "The gauges must be read."
+
+    prometheus_text: str = metrics.to_prometheus()
+    assert '# TYPE tidy_logger_records_emitted_total counter\ntidy_logger_records_emitted_total{handler="console"} 201' in prometheus_text, "The counters must be exported."
+    assert 'tidy_logger_format_seconds_bucket{handler="console",le="+Inf"} 201' in prometheus_text, "The histograms must be exported."
+    assert "tidy_logger_queue_depth 7" in prometheus_text, "The gauges must be exported."
+
+    metrics.export_prometheus(tmp_path / "metrics.prom")
+    exported_texts: list[str] = []
+    metrics.export_prometheus(exported_texts.append)
+    assert (tmp_path / "metrics.prom").read_text() == exported_texts[0] == prometheus_text, "The metrics must be exported to a file or a callback."
+
+
+def test_tidy_logger_metrics(tmp_path: Path):
+
+    tidy_logger = TidyLogger(app_name="MetricsApp", log_file_directory=tmp_path, print_log_file_path=False, console_level=logging.CRITICAL, async_mode=True, collect_metrics=True)
+    for i in range(20):
+        tidy_logger.info("Record %d.", i)
+    tidy_logger.close()
+
+    stats: dict = tidy_logger.metrics.stats()
+    assert stats["handlers"]["file"]["records_emitted"] == 20, "The records of the file handler must be counted."
+    assert stats["gauges"]["queue_depth"] == 0 and stats["gauges"]["queue_dropped_records"] == 0, "The queue depth must be measured."
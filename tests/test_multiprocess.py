@@ -0,0 +1,125 @@
+import logging
+import multiprocessing
+import os
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from multiprocess import MultiProcessFileHandler  # noqa: E402
+
+from tidy_logger import TidyLogger  # noqa: E402
+
+NUM_PROCESSES: int = 4
+NUM_RECORDS: int = 500
+PADDING: str = "x" * 100
+
+
+def write_records(log_file_path: str, worker: int) -> None:
+    handler = MultiProcessFileHandler(log_file_path, max_bytes=20 * 1024, backup_count=1000)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    for i in range(NUM_RECORDS):
+        handler.handle(logging.makeLogRecord({"msg": "worker %d record %d %s", "args": (worker, i, PADDING)}))
+    handler.close()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="The log file cannot be rotated on Windows.")
+def test_multi_process_file_handler(tmp_path: Path):
+
+    log_file_path: Path = tmp_path / "multi_process.log"
+
+    processes: list[multiprocessing.Process] = [multiprocessing.Process(target=write_records, args=(str(log_file_path), worker)) for worker in range(NUM_PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0, "The worker processes must not fail."
+
+    log_files: list[Path] = [p for p in tmp_path.iterdir() if not p.name.endswith(".lock")]
+    assert len(log_files) > 1, "The log file must be rotated."
+
+    lines: list[str] = [line for f in log_files for line in f.read_text().splitlines()]
+    line_pattern = re.compile(r"worker (\d+) record (\d+) " + PADDING)
+    assert all(line_pattern.fullmatch(line) for line in lines), "Records must not be interleaved."
+    assert sorted(lines) == sorted(f"worker {w} record {i} {PADDING}" for w in range(NUM_PROCESSES) for i in range(NUM_RECORDS)), "No record must be lost or duplicated."
+
+
+def write_records_with_inherited_handler(handler: MultiProcessFileHandler, worker: int) -> None:
+    for i in range(NUM_RECORDS):
+        handler.handle(logging.makeLogRecord({"msg": "worker %d record %d %s", "args": (worker, i, PADDING)}))
+    handler.close()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="fork() is not available on this platform.")
+def test_multi_process_file_handler_after_fork(tmp_path: Path):
+
+    log_file_path: Path = tmp_path / "forked.log"
+    handler = MultiProcessFileHandler(log_file_path, max_bytes=20 * 1024, backup_count=1000)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=write_records_with_inherited_handler, args=(handler, worker)) for worker in range(NUM_PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0, "The forked worker processes must not fail."
+    handler.close()
+
+    lines: list[str] = [line for f in tmp_path.iterdir() if not f.name.endswith(".lock") for line in f.read_text().splitlines()]
+    assert sorted(lines) == sorted(
+        f"worker {w} record {i} {PADDING}" for w in range(NUM_PROCESSES) for i in range(NUM_RECORDS)
+    ), "No record must be lost or interleaved after fork()."
+
+
+def write_records_with_inherited_logger(tidy_logger: TidyLogger, worker: int) -> None:
+    for i in range(NUM_RECORDS):
+        tidy_logger.info("worker %d record %d", worker, i)
+    tidy_logger.close()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="fork() is not available on this platform.")
+def test_tidy_logger_after_fork(tmp_path: Path):
+
+    tidy_logger = TidyLogger(
+        app_name="ForkedApp",
+        log_file_directory=tmp_path,
+        print_log_file_path=False,
+        multi_process_safe=True,
+        async_mode=True,
+        non_blocking_console=True,
+        console_level=logging.INFO,
+    )
+    console_file_path: Path = tmp_path / "console.txt"
+    tidy_logger.console_handler.setStream(open(console_file_path, "a"))
+    tidy_logger.info("parent record")
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=write_records_with_inherited_logger, args=(tidy_logger, worker)) for worker in range(NUM_PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0, "The forked worker processes must not fail."
+    tidy_logger.close()
+    tidy_logger.console_handler.stream.close()
+
+    expected_messages: list[str] = ["parent record"] + [f"worker {w} record {i}" for w in range(NUM_PROCESSES) for i in range(NUM_RECORDS)]
+    log_text: str = next(tmp_path.glob("*.log")).read_text()
+    console_text: str = console_file_path.read_text()
+    for text in (log_text, console_text):
+        messages: list[str] = [line.strip() for line in text.splitlines() if line.startswith("   ")]
+        assert sorted(messages) == sorted(expected_messages), "The background threads must be restarted in the child processes, so no record is lost."
+
+    with pytest.raises(ValueError):
+        TidyLogger(app_name="ForkedApp", log_file_directory=tmp_path, multi_process_safe=True, shipping_address=("127.0.0.1", 9))
+
+
+@pytest.mark.skipif(os.name != "nt", reason="The log file can be rotated on this platform.")
+def test_multi_process_file_handler_rotation_on_windows(tmp_path: Path):
+
+    with pytest.raises(ValueError):
+        MultiProcessFileHandler(tmp_path / "multi_process.log", max_bytes=20 * 1024, backup_count=1000)
@@ -0,0 +1,41 @@
+import logging
+import sys
+import threading
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from preformatting import PreformattingHandlerMixin, preformatting_handler_class  # noqa: E402
+
+
+def test_preformatting_handler(tmp_path: Path):
+
+    handler_class: type = preformatting_handler_class(RotatingFileHandler)
+    assert issubclass(handler_class, PreformattingHandlerMixin) and issubclass(handler_class, RotatingFileHandler), "The class must combine the mixin and the handler class."
+    assert preformatting_handler_class(RotatingFileHandler) is handler_class, "The class must be created once per handler class."
+
+    handler = handler_class(tmp_path / "preformatting.log", maxBytes=20_000, backupCount=3)
+    formatted_under_lock: list[bool] = []
+
+    class CheckingFormatter(logging.Formatter):
+        def format(self, record: logging.LogRecord) -> str:
+            formatted_under_lock.append(handler.lock._is_owned())
+            return super().format(record)
+
+    handler.setFormatter(CheckingFormatter("%(threadName)s %(message)s"))
+
+    def log_records() -> None:
+        for i in range(200):
+            handler.handle(logging.makeLogRecord({"msg": "record %d", "args": (i,), "levelno": logging.INFO, "threadName": threading.current_thread().name}))
+
+    threads: list[threading.Thread] = [threading.Thread(target=log_records, name=f"thread-{i}") for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    handler.close()
+
+    assert len(formatted_under_lock) == 1600 and not any(formatted_under_lock), "Each record must be formatted once, outside the handler lock (also for the rollover check)."
+    lines: list[str] = [line for file_path in tmp_path.iterdir() for line in file_path.read_text().splitlines()]
+    assert sorted(lines) == sorted(f"thread-{t} record {i}" for t in range(8) for i in range(200)), "All the records must be written intact."
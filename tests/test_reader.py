@@ -0,0 +1,77 @@
+import gzip
+import logging
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from formatters import IndentedMessageFormatter  # noqa: E402
+from reader import LogFileReader, main, read_log_files, rotated_log_files  # noqa: E402
+
+FORMATTER = IndentedMessageFormatter()
+
+
+def write_records(file_path: Path, records: list[tuple[str, int, str, str, datetime]], mode: str = "a") -> None:
+    """Write records (logger name, level, function name, message, creation time) like a TidyLogger file handler."""
+    with open(file_path, mode) as file:
+        for logger_name, level, function_name, message, created in records:
+            record = logging.LogRecord(logger_name, level, "/app/server.py", 42, message, None, None, func=function_name)
+            record.created = created.timestamp()
+            file.write(FORMATTER.format(record) + "\n")
+
+
+def test_log_file_reader(tmp_path: Path):
+
+    log_file_path: Path = tmp_path / "app.log"
+    write_records(
+        log_file_path,
+        [
+            ("App", logging.INFO, "start", "Started", datetime(2026, 1, 1, 10, 0, 0)),
+            ("App.db", logging.WARNING, "query", "Slow query\nSELECT *\nFROM users", datetime(2026, 1, 1, 10, 0, 5)),
+            ("Other", logging.ERROR, "handle", "Request failed: timeout", datetime(2026, 1, 1, 11, 0, 0)),
+        ],
+    )
+
+    for use_index in (False, True, True):
+        with LogFileReader(log_file_path, use_index=use_index) as reader:
+            records = list(reader.records())
+            assert [record.function_name for record in records] == ["start", "query", "handle"]
+            assert records[1].text.splitlines()[1:] == ["   Slow query", "   SELECT *", "   FROM users"], "Records must span the indented lines."
+            assert records[1].logger_name == "App.db" and records[1].file_name == "server.py" and records[1].line_number == 42
+            assert [r.function_name for r in reader.query(logger_name="App")] == ["start", "query"], "Child loggers must match."
+            assert [r.function_name for r in reader.query(min_level="WARNING")] == ["query", "handle"]
+            assert [r.function_name for r in reader.query(since=datetime(2026, 1, 1, 10, 0, 5), until=datetime(2026, 1, 1, 11))] == ["query"]
+            assert [r.function_name for r in reader.query(text="SELECT")] == ["query"]
+            assert [r.function_name for r in reader.query(pattern=r"failed: \w+out")] == ["handle"]
+            assert [r.function_name for r in reader.query(file_name="server.py", function_name="start")] == ["start"]
+    assert (tmp_path / "app.log.idx").exists(), "The index must be saved."
+
+    # Records appended after the index was written are indexed on the next read
+    write_records(log_file_path, [("App", logging.CRITICAL, "stop", "Stopped", datetime(2026, 1, 1, 12, 0, 0))])
+    with LogFileReader(log_file_path, use_index=True) as reader:
+        assert [r.function_name for r in reader.query(min_level=logging.ERROR)] == ["handle", "stop"], "Appended records must be indexed."
+
+    # A replaced file invalidates the index
+    write_records(log_file_path, [("App", logging.INFO, "restart", "Restarted", datetime(2026, 1, 2))], mode="w")
+    with LogFileReader(log_file_path, use_index=True) as reader:
+        assert [r.function_name for r in reader.records()] == ["restart"], "The index of a replaced file must be rebuilt."
+
+
+def test_rotated_log_files(tmp_path: Path, capsys):
+
+    log_file_path: Path = tmp_path / "app.log"
+    write_records(log_file_path, [("App", logging.INFO, "current", "Current", datetime(2026, 1, 3))])
+    write_records(tmp_path / "app.log.20260102-000000", [("App", logging.INFO, "newer_backup", "Backup", datetime(2026, 1, 2))])
+    with gzip.open(tmp_path / "app.log.20260101-000000.gz", "wt") as file:
+        record = logging.LogRecord("App", logging.ERROR, "/app/server.py", 1, "Compressed", None, None, func="older_backup")
+        file.write(FORMATTER.format(record) + "\n")
+    (tmp_path / "app.log.idx").write_bytes(b"")
+
+    assert [path.name for path in rotated_log_files(log_file_path)] == ["app.log.20260101-000000.gz", "app.log.20260102-000000", "app.log"]
+    assert [r.function_name for r in read_log_files([log_file_path], include_rotated=True)] == ["older_backup", "newer_backup", "current"]
+
+    assert main([str(log_file_path), "--rotated", "--count"]) == 0
+    assert capsys.readouterr().out == "3\n"
+    assert main([str(log_file_path), "--rotated", "--level", "error", "--index"]) == 0
+    assert "Compressed" in capsys.readouterr().out
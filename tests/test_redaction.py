@@ -0,0 +1,100 @@
+import json
+import logging
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from formatters import IndentedMessageFormatter, JsonLinesFormatter  # noqa: E402
+from redaction import Redactor  # noqa: E402
+
+from tidy_logger import TidyLogger  # noqa: E402
+
+
+def test_redactor():
+
+    redactor = Redactor(Redactor.DEFAULT_PATTERNS, Redactor.DEFAULT_KEYS)
+    assert redactor.redact("login password=hunter2 for bob@example.com") == "login password=[REDACTED] for [REDACTED]"
+    assert redactor.redact('{"api_key": "some secret", "user": "bob"}') == '{"api_key": "[REDACTED]", "user": "bob"}', "The quotes of a quoted value must be kept."
+    assert redactor.redact("Authorization: Bearer abc.def") == "Authorization: [REDACTED]"
+    assert redactor.redact("callback?access_token=abc&page=2") == "callback?access_token=[REDACTED]&page=2", "A key must match inside a longer name."
+    assert redactor.redact("jwt eyJhbGciOi.eyJzdWIiOi.c2lnbmF0dXJl") == "jwt [REDACTED]"
+
+    # Texts without any string required by a pattern skip the expression, and the other texts are cached
+    assert redactor.prefilter_needles is not None and "@" in redactor.prefilter_needles
+    text: str = "Request handled in 12.5 ms"
+    assert redactor.redact(text) is text and text not in redactor._cache
+    assert redactor.redact("Token: abc") is redactor.redact("Token: abc") and "Token: abc" in redactor._cache
+    assert Redactor([re.compile(r"secret\d+", re.IGNORECASE)]).prefilter_needles is None, "Letters matched regardless of case cannot be required."
+    assert Redactor([re.compile(r"secret\d+", re.IGNORECASE)]).redact("a SECRET42 b") == "a [REDACTED] b", "The flags of a compiled pattern must be kept."
+    assert Redactor([r"card \d{16}"], replacement="***").redact("card 4111111111111111 paid") == "*** paid"
+
+    assert redactor.redact_fields({"user_password": "x", "note": "from a@b.io", "nested": {"token": "t"}, "count": 3}) == {
+        "user_password": "[REDACTED]",
+        "note": "from [REDACTED]",
+        "nested": {"token": "[REDACTED]"},
+        "count": 3,
+    }
+
+    with pytest.raises(ValueError):
+        Redactor()
+    with pytest.raises(ValueError):
+        Redactor([r"(unclosed"])
+
+
+def test_formatter_redaction():
+
+    redactor = Redactor(keys=["password"])
+    formatter = IndentedMessageFormatter(fmt="%(message)s", redactor=redactor)
+    try:
+        raise ValueError("Invalid password=hunter2")
+    except ValueError:
+        record = logging.LogRecord("App", logging.ERROR, __file__, 10, "Login with password=%s", ("hunter2",), sys.exc_info(), func="login")
+    text: str = formatter.format(record)
+    assert "hunter2" not in text and text.startswith("   Login with password=[REDACTED]\n") and "ValueError: Invalid password=[REDACTED]" in text
+    assert record.exc_text.endswith("hunter2"), "The exception text of the record must be kept, only its output is redacted."
+    assert (
+        IndentedMessageFormatter(fmt="%(message)s").format(record).startswith("   Login with password=hunter2")
+    ), "A formatter without redaction must not reuse the redacted message."
+
+    json_formatter = JsonLinesFormatter(redactor=redactor)
+    record = logging.LogRecord("App", logging.ERROR, __file__, 10, "password=%s", ("hunter2",), record.exc_info, func="login")
+    record.db_password = "hunter2"
+    record.query = "SET password=hunter2"
+    data: dict = json.loads(json_formatter.format(record))
+    assert "hunter2" not in json.dumps(data)
+    assert data["extra"] == {"db_password": "[REDACTED]", "query": "SET password=[REDACTED]"}
+    assert data["exception"]["message"] == "Invalid password=[REDACTED]" and data["exception"]["frames"][0]["code"].startswith("raise ValueError")
+
+
+def test_tidy_logger_redaction(tmp_path: Path):
+
+    tidy_logger = TidyLogger(
+        app_name="RedactionApp",
+        log_file_directory=tmp_path,
+        log_file_name="app",
+        add_date_suffix_to_file_name=False,
+        print_log_file_path=False,
+        console_level=logging.CRITICAL,
+        file_format="ndjson",
+        redact_patterns=Redactor.DEFAULT_PATTERNS,
+        redact_keys=["password"],
+    )
+    tidy_logger.info("Signed up %s", "bob@example.com", extra={"password": "hunter2"})
+    try:
+        raise RuntimeError("Connection refused for password=hunter2")
+    except RuntimeError as e:
+        tidy_logger.error_exception(e, "Login of %s failed", "bob@example.com")
+    tidy_logger.close()
+
+    log_text: str = (tmp_path / "app.log").read_text()
+    assert "hunter2" not in log_text and "bob@example.com" not in log_text
+    records: list[dict] = [json.loads(line) for line in log_text.splitlines()]
+    assert records[0]["message"] == "Signed up [REDACTED]" and records[0]["extra"] == {"password": "[REDACTED]"}
+    assert records[1]["exception"]["message"] == "Connection refused for password=[REDACTED]"
+
+    with pytest.raises(ValueError):
+        TidyLogger(app_name="RedactionInvalid", log_file_directory=tmp_path, print_log_file_path=False, file_format="binary", redact_keys=["password"])
@@ -0,0 +1,92 @@
+import logging
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from ring_buffer import RingBufferHandler  # noqa: E402
+
+from tidy_logger import TidyLogger  # noqa: E402
+
+
+def test_ring_buffer_handler(tmp_path: Path):
+
+    handler = RingBufferHandler(capacity=5)
+    handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    empty_memory_usage: int = handler.estimated_memory_usage()
+
+    for i in range(12):
+        handler.handle(logging.makeLogRecord({"msg": "record %d", "args": (i,), "levelno": logging.DEBUG, "levelname": "DEBUG"}))
+
+    assert len(handler) == 5, "The number of kept records must be bounded by the capacity."
+    assert [record.getMessage() for record in handler.get_records()] == [f"record {i}" for i in range(7, 12)], "The last records must be kept, the oldest first."
+    assert handler.estimated_memory_usage() > empty_memory_usage, "The memory usage of the kept records must be estimated."
+
+    dump_file_path: Path = handler.dump(tmp_path / "dump.log")
+    assert dump_file_path.read_text() == "".join(f"DEBUG record {i}\n" for i in range(7, 12)), "The kept records must be formatted in the dump file."
+
+    handler.clear()
+    assert len(handler) == 0 and handler.get_records() == [], "The kept records must be discarded."
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_ring_buffer_crash_dump(tmp_path: Path):
+
+    previous_excepthook = sys.excepthook
+    previous_threading_excepthook = threading.excepthook
+
+    tidy_logger = TidyLogger(
+        app_name="RingBufferApp",
+        log_file_directory=tmp_path,
+        print_log_file_path=False,
+        console_level=logging.CRITICAL + 1,
+        file_level=logging.WARNING,
+        ring_buffer_size=100,
+        dump_ring_buffer_on_crash=True,
+    )
+
+    for i in range(3):
+        tidy_logger.debug("Debug context %d.", i)
+
+    try:
+        raise RuntimeError("fatal")
+    except RuntimeError as ex:
+        tidy_logger.critical_exception(ex, "The application crashed.")
+
+    crash_dump_paths: list[Path] = list(tmp_path.glob("*_crash_*.log"))
+    assert len(crash_dump_paths) == 1, "The records kept in memory must be dumped on critical_exception."
+    crash_dump_text: str = crash_dump_paths[0].read_text()
+    assert all(f"Debug context {i}." in crash_dump_text for i in range(3)), "Records below the file level must be in the crash dump."
+    assert "RuntimeError" in crash_dump_text and "The application crashed." in crash_dump_text, "The critical record must be in the crash dump."
+
+    # Unhandled exceptions of threads are dumped as well
+    thread = threading.Thread(target=lambda: 1 / 0)
+    thread.start()
+    thread.join()
+    assert len(list(tmp_path.glob("*_crash_*.log"))) == 2, "The records kept in memory must be dumped on unhandled exceptions."
+
+    tidy_logger.close()
+    assert sys.excepthook is previous_excepthook and threading.excepthook is previous_threading_excepthook, "The previous excepthooks must be restored."
+
+
+def test_ring_buffer_mapping_args(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture):
+
+    tidy_logger = TidyLogger(app_name="RingBufferMappingApp", log_file_directory=tmp_path, print_log_file_path=False, console_level=logging.CRITICAL + 1, ring_buffer_size=10)
+    tidy_logger.info("Request %(request_id)s", {"request_id": "r1"})
+
+    try:
+        raise RuntimeError("fatal")
+    except RuntimeError as ex:
+        tidy_logger.critical_exception(ex, "The application crashed.")
+
+    crash_dump_paths: list[Path] = list(tmp_path.glob("*_crash_*.log"))
+    assert len(crash_dump_paths) == 1 and "Request r1" in crash_dump_paths[0].read_text(), "The records logged with a mapping must be dumped."
+
+    # A failing dump is reported, without raising from critical_exception
+    monkeypatch.setattr(tidy_logger.ring_buffer_handler, "dump", lambda file_path: 1 / 0)
+    tidy_logger.critical_exception(RuntimeError("fatal"), "The application crashed again.")
+    assert "ZeroDivisionError" in capsys.readouterr().err
+    tidy_logger.close()
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import shutil
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
+
+from helpers import create_record  # noqa: E402
+from shipping import DiskSpool, ShippingHandler  # noqa: E402
+
+from tidy_logger import TidyLogger  # noqa: E402
+
+
+class Collector:
+    """A local stand-in for the log collector, which keeps the messages of the received records."""
+
+    def __init__(self, address: tuple[str, int] | str, framing: str = "ndjson"):
+        self.framing = framing
+        self.messages: list[str] = []
+        self.connection_count: int = 0
+        self._condition = threading.Condition()
+        if isinstance(address, tuple):
+            self._server = socket.create_server(address)
+        else:
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._server.bind(address)
+            self._server.listen()
+        self.address = self._server.getsockname()
+        self._connections: list[socket.socket] = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return
+            self._connections.append(connection)
+            self.connection_count += 1
+            threading.Thread(target=self._receive, args=(connection,), daemon=True).start()
+
+    def _receive(self, connection: socket.socket) -> None:
+        buffer: bytes = b""
+        while True:
+            try:
+                data: bytes = connection.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            buffer += data
+            records: list[bytes] = []
+            if self.framing == "ndjson":
+                *records, buffer = buffer.split(b"\n")
+            else:
+                while len(buffer) >= 4 and len(buffer) >= 4 + struct.unpack_from(">I", buffer)[0]:
+                    end: int = 4 + struct.unpack_from(">I", buffer)[0]
+                    records.append(buffer[4:end])
+                    buffer = buffer[end:]
+            with self._condition:
+                self.messages.extend(json.loads(record)["message"] for record in records)
+                self._condition.notify_all()
+
+    def wait_for(self, count: int, timeout: float = 10.0) -> list[str]:
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.messages) >= count, timeout)
+            return list(self.messages)
+
+    def close(self) -> None:
+        self._server.close()
+        for connection in self._connections:
+            # Shut down first, as closing a socket does not interrupt the recv of its receiving thread
+            connection.shutdown(socket.SHUT_RDWR)
+            connection.close()
+
+
+def test_shipping_handler(tmp_path: Path):
+
+    # TCP with newline-delimited JSON, in batches over a single connection
+    collector = Collector(("127.0.0.1", 0))
+    handler = ShippingHandler(collector.address, batch_size=10, flush_interval=0.05)
+    for i in range(25):
+        handler.handle(create_record(f"tcp {i}"))
+    assert handler.flush()
+    assert collector.wait_for(25) == [f"tcp {i}" for i in range(25)], "The records must be received in order."
+    stats: dict = handler.stats()
+    assert collector.connection_count == 1 and stats["connections"] == 1, "The connection must be reused."
+    assert stats["sent_records"] == 25 and stats["sent_batches"] >= 3 and stats["batch_latency_max"] > 0
+    handler.close()
+    collector.close()
+
+    with pytest.raises(ValueError):
+        ShippingHandler(("127.0.0.1", 9), framing="xml")
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets are not available on this platform.")
+def test_shipping_handler_unix_socket(tmp_path: Path):
+
+    # Unix socket with length-prefixed records, with an outage of the collector.
+    # The socket is created in a short directory, as the pytest temporary directory can exceed the maximum length of a socket path (104 characters on macOS)
+    socket_directory: str = tempfile.mkdtemp(dir="/tmp")
+    try:
+        socket_path: str = os.path.join(socket_directory, "collector.sock")
+        collector = Collector(socket_path, framing="length_prefixed")
+        handler = ShippingHandler(socket_path, framing="length_prefixed", flush_interval=0.05, spool_directory=tmp_path / "spool", min_backoff=0.05, max_backoff=0.1)
+        handler.handle(create_record("before outage"))
+        assert handler.flush() and collector.wait_for(1) == ["before outage"]
+
+        collector.close()
+        Path(socket_path).unlink()
+        for i in range(20):
+            handler.handle(create_record(f"during outage {i}"))
+            handler.flush()
+        stats: dict = handler.stats()
+        assert stats["spool_records"] == 20 and stats["spool_bytes"] > 0, "The records must be spooled while the collector is unreachable."
+        assert not stats["connected"] and stats["connection_failures"] > 0
+
+        collector = Collector(socket_path, framing="length_prefixed")
+        handler.handle(create_record("after outage"))
+        deadline: float = time.monotonic() + 10
+        while handler.stats()["spool_records"] and time.monotonic() < deadline:
+            handler.flush()
+            time.sleep(0.02)
+        assert collector.wait_for(21) == [f"during outage {i}" for i in range(20)] + ["after outage"], "The spool must be replayed in order, before the newer records."
+        handler.close()
+        collector.close()
+    finally:
+        shutil.rmtree(socket_directory, ignore_errors=True)
+
+
+@pytest.mark.skipif(hasattr(socket, "AF_UNIX"), reason="Unix sockets are available on this platform.")
+def test_shipping_handler_without_unix_sockets(tmp_path: Path):
+
+    with pytest.raises(ValueError):
+        ShippingHandler(tmp_path / "collector.sock")
+
+
+def test_disk_spool(tmp_path: Path):
+
+    spool = DiskSpool(tmp_path, max_bytes=1000, segment_size=100)
+    for i in range(50):
+        spool.append([b"record %02d " % i + b"x" * 20])
+    assert spool.byte_count <= 1000 and spool.dropped_record_count > 0, "The oldest records must be dropped beyond the maximum size."
+    assert len(spool) + spool.dropped_record_count == 50
+    first: bytes = spool.peek(1)[0]
+    spool.consume(1)
+    spool.close()
+
+    # The remaining segments are replayed by the next process, in order (including the consumed record of the partially replayed segment), without the torn record at the end
+    with open(sorted(tmp_path.iterdir())[-1], "ab") as segment_file:
+        segment_file.write(b"\xff\x00\x00\x00torn")
+    spool = DiskSpool(tmp_path, max_bytes=1000, segment_size=100)
+    records: list[bytes] = []
+    while len(spool):
+        batch: list[bytes] = spool.peek(7)
+        records.extend(batch)
+        spool.consume(len(batch))
+    assert records == [b"record %02d " % i + b"x" * 20 for i in range(int(first[7:9]), 50)]
+    assert not list(tmp_path.iterdir()), "The consumed segments must be removed."
+
+
+def test_tidy_logger_shipping(tmp_path: Path):
+
+    collector = Collector(("127.0.0.1", 0))
+    tidy_logger = TidyLogger(
+        app_name="ShippingApp",
+        log_file_directory=tmp_path,
+        print_log_file_path=False,
+        console_level=logging.CRITICAL,
+        shipping_address=collector.address,
+        collect_metrics=True,
+    )
+    tidy_logger.info("Shipped %d", 1)
+    tidy_logger.shipping_handler.flush()
+    assert collector.wait_for(1) == ["Shipped 1"]
+    assert tidy_logger.metrics.stats()["gauges"]["shipping_spool_records"] == 0
+    tidy_logger.close()
+    collector.close()
@@ -1,6 +1,10 @@
+import json
 import logging
 import os
+import queue
+import subprocess
 import sys
+import threading
 from datetime import datetime
 from os import environ
 from pathlib import Path
@@ -9,6 +13,9 @@ import pytest
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src/tidy_logger"))
 
+from queueing import BoundedQueueHandler  # noqa: E402
+from sampling import SamplingFilter  # noqa: E402
+
 from tidy_logger import TidyLogger  # noqa: E402
 
 
@@ -236,6 +243,359 @@ def test_log_file_creation():
     remove_log_files_and_empty_directories(log_file_path)
 
 
+def test_delay_file_creation(tmp_path: Path):
+
+    for use_file_rotation, rotation_trigger, multi_process_safe in ((False, "size", False), (True, "size", False), (True, "time", False), (False, "size", True)):
+        log_file_directory: Path = tmp_path / "rotation_{}_{}_{}".format(use_file_rotation, rotation_trigger, multi_process_safe) / "logs"
+        tidy_logger = TidyLogger(
+            app_name="DelayFileCreationApp",
+            log_file_directory=log_file_directory,
+            log_file_name="app",
+            add_date_suffix_to_file_name=False,
+            print_log_file_path=False,
+            console_level=logging.CRITICAL,
+            file_level=logging.INFO,
+            use_file_rotation=use_file_rotation,
+            rotation_trigger=rotation_trigger,
+            multi_process_safe=multi_process_safe,
+            delay_file_creation=True,
+            format_outside_lock=True,
+        )
+        tidy_logger.debug("Below the file level")
+        assert not log_file_directory.parent.exists(), "The log directory must not be created before a record reaches the file handler."
+        tidy_logger.info("First record")
+        tidy_logger.close()
+        assert "First record" in (log_file_directory / "app.log").read_text(), "The log file must be created by the first record."
+
+    # A logger that never writes to the file leaves nothing behind
+    TidyLogger(app_name="DelayFileCreationUnused", log_file_directory=tmp_path / "unused", print_log_file_path=False, delay_file_creation=True).close()
+    assert not (tmp_path / "unused").exists()
+
+
+def test_large_messages(tmp_path: Path):
+
+    tidy_logger = TidyLogger(
+        app_name="LargeMessagesApp",
+        log_file_directory=tmp_path,
+        log_file_name="app",
+        add_date_suffix_to_file_name=False,
+        print_log_file_path=False,
+        console_level=logging.CRITICAL,
+        max_message_size=20_000,
+        oversize_policy="spill",
+        streaming_threshold=12_000,
+    )
+    tidy_logger.info("Rows:\n%s", "\n".join("row %d" % i for i in range(2000)))
+    tidy_logger.info("Body: %s", "x" * 50_000)
+    tidy_logger.close()
+
+    log_text: str = (tmp_path / "app.log").read_text()
+    assert "   row 1999\n" in log_text and tidy_logger.file_handler.streamed_record_count == 1, "A message above the streaming threshold must be streamed."
+    spill_files: list[Path] = list((tmp_path / "app_messages").iterdir())
+    assert len(spill_files) == 1 and spill_files[0].read_text() == "Body: " + "x" * 50_000, "An oversized message must be spilled to a side file."
+    assert "bytes written to {}]".format(spill_files[0]) in log_text and "x" * 20_000 not in log_text
+
+    with pytest.raises(ValueError):
+        TidyLogger(app_name="LargeMessagesInvalid", log_file_directory=tmp_path, print_log_file_path=False, oversize_policy="drop")
+
+
+def test_lazy_imports(tmp_path: Path):
+
+    # Run in a fresh interpreter, with the package imported like an installed one
+    code: str = "\n".join(
+        [
+            "import sys",
+            "import tidy_logger",
+            "assert 'asyncio' not in sys.modules and 'tidy_logger.tidy_logger' not in sys.modules, sorted(sys.modules)",
+            "tidy_logger.TidyLogger(app_name='LazyImportsApp', log_file_directory=sys.argv[1], print_log_file_path=False).info('Started')",
+            "unused = {'platformdirs', 'logging.handlers', 'datetime', 'tidy_logger.queueing', 'tidy_logger.exception_rendering', 'orjson'} & set(sys.modules)",
+            "assert not unused, unused",
+            "assert tidy_logger.AsyncTidyLogger.__name__ == 'AsyncTidyLogger'",
+        ]
+    )
+    environment: dict[str, str] = dict(os.environ, PYTHONPATH=str(Path(__file__).resolve().parents[1] / "src"))
+    result = subprocess.run([sys.executable, "-c", code, str(tmp_path)], env=environment, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_async_mode(tmp_path: Path):
+
+    # All the records are written when the logger is closed
+    tidy_logger = TidyLogger(
+        app_name="AsyncModeApp", log_file_directory=tmp_path, log_file_name="async_log", async_mode=True, print_log_file_path=False, console_level=logging.CRITICAL
+    )
+    for i in range(500):
+        tidy_logger.debug(f"record {i}")
+    tidy_logger.close()
+
+    log_text: str = next(tmp_path.iterdir()).read_text()
+    assert all(f"record {i}\n" in log_text for i in range(500)), "Async mode: all the queued records must be written on close."
+    assert tidy_logger.dropped_record_count == 0, "Async mode: no record must be dropped with the 'block' policy."
+
+    # Queue-full policies
+    record = logging.makeLogRecord({"msg": "message"})
+
+    queue_handler = BoundedQueueHandler(queue.Queue(maxsize=2), queue_full_policy=BoundedQueueHandler.DROP_NEWEST)
+    for _ in range(5):
+        queue_handler.handle(record)
+    assert queue_handler.queue.qsize() == 2, "'drop_newest' policy: the queue must stay bounded."
+    assert queue_handler.dropped_newest_count == 3, "'drop_newest' policy: the dropped records must be counted."
+
+    queue_handler = BoundedQueueHandler(queue.Queue(maxsize=2), queue_full_policy=BoundedQueueHandler.DROP_OLDEST)
+    newest_record = logging.makeLogRecord({"msg": "newest"})
+    for _ in range(4):
+        queue_handler.handle(record)
+    queue_handler.handle(newest_record)
+    assert queue_handler.dropped_oldest_count == 3, "'drop_oldest' policy: the dropped records must be counted."
+    assert list(queue_handler.queue.queue)[-1] is newest_record, "'drop_oldest' policy: the newest record must be kept."
+
+    with pytest.raises(ValueError):
+        BoundedQueueHandler(queue.Queue(), queue_full_policy="invalid")
+
+
+def test_lazy_exception_rendering(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+
+    tidy_logger = TidyLogger(app_name="LazyExceptionApp", log_file_directory=tmp_path, file_level=logging.INFO, console_level=logging.INFO, print_log_file_path=False)
+
+    rendered_exceptions: list[BaseException] = []
+    original_log_exception = tidy_logger._log_exception
+
+    def counting_log_exception(ex: BaseException, *args, **kwargs) -> str:
+        rendered_exceptions.append(ex)
+        return original_log_exception(ex, *args, **kwargs)
+
+    monkeypatch.setattr(tidy_logger, "_log_exception", counting_log_exception)
+
+    try:
+        raise ValueError("test exception")
+    except ValueError as ex:
+        tidy_logger.debug_exception(ex, "Disabled level.")
+        assert len(rendered_exceptions) == 0, "Disabled level: the exception details must not be rendered."
+
+        tidy_logger.error_exception(ex, "Enabled level.")
+        assert len(rendered_exceptions) == 1, "Enabled level: the exception details must be rendered once for both handlers."
+
+    tidy_logger.close()
+
+    log_text: str = next(tmp_path.iterdir()).read_text()
+    assert "Disabled level." not in log_text, "Disabled level: the record must not be written."
+    assert "Enabled level." in log_text and "ValueError" in log_text, "Enabled level: the message and the exception details must be written."
+
+
+def test_ndjson_file_format(tmp_path: Path):
+
+    tidy_logger = TidyLogger(app_name="NdjsonApp", log_file_directory=tmp_path, file_format="ndjson", print_log_file_path=False, console_level=logging.CRITICAL)
+    tidy_logger.info("first record")
+    try:
+        raise ValueError("test exception")
+    except ValueError as ex:
+        tidy_logger.error_exception(ex, "second record")
+    tidy_logger.close()
+
+    lines: list[str] = next(tmp_path.iterdir()).read_text().splitlines()
+    assert len(lines) == 2, "NDJSON file format: each record must be written as a single line."
+    records: list[dict] = [json.loads(line) for line in lines]
+    assert records[0]["message"] == "first record" and records[0]["function"] == "test_ndjson_file_format", "NDJSON file format: the message and the caller must be written."
+    assert records[1]["exception"]["type"] == "ValueError", "NDJSON file format: the exception details must be written."
+
+    # The exception tree is capped like the text rendering
+    tidy_logger = TidyLogger(
+        app_name="NdjsonCapsApp", log_file_directory=tmp_path / "caps", file_format="ndjson", print_log_file_path=False, console_level=logging.CRITICAL, max_exception_depth=3
+    )
+    exception: Exception = ValueError("error 0")
+    for i in range(1, 10):
+        try:
+            raise ValueError(f"error {i}") from exception
+        except ValueError as ex:
+            exception = ex
+    tidy_logger.error_exception(exception, "deep chain")
+    tidy_logger.close()
+    node: dict = json.loads(next((tmp_path / "caps").iterdir()).read_text())["exception"]
+    depth: int = 0
+    while "cause" in node:
+        node, depth = node["cause"], depth + 1
+    assert depth == 4 and node["message"] == "error 5" and node["more"] == 6, "NDJSON file format: the exception chain must be capped at `max_exception_depth`."
+
+    with pytest.raises(ValueError):
+        TidyLogger(app_name="NdjsonApp", log_file_directory=tmp_path, file_format="xml")
+
+
+def test_throttling(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+
+    tidy_logger = TidyLogger(
+        app_name="ThrottlingApp", log_file_directory=tmp_path, print_log_file_path=False, console_level=logging.CRITICAL, throttle_rate=0.001, throttle_burst=3
+    )
+
+    rendered_exceptions: list[BaseException] = []
+    original_log_exception = tidy_logger._log_exception
+    monkeypatch.setattr(tidy_logger, "_log_exception", lambda ex, *args, **kwargs: rendered_exceptions.append(ex) or original_log_exception(ex, *args, **kwargs))
+
+    try:
+        raise ConnectionError("dependency is down")
+    except ConnectionError as ex:
+        for _ in range(100):
+            tidy_logger.error_exception(ex, "Request failed.")
+    tidy_logger.info("Other call site.")
+
+    stats: dict = tidy_logger.throttle_stats()
+    assert stats["allowed"] == 4 and stats["suppressed"] == 97, "Records beyond the burst of a call site must be suppressed."
+    assert len(rendered_exceptions) == 3, "The exception details of suppressed records must not be rendered."
+    tidy_logger.close()
+
+    log_text: str = next(tmp_path.iterdir()).read_text()
+    assert log_text.count("Request failed.") == 3, "Only the allowed records must be written."
+    assert "Suppressed 97 identical messages" in log_text, "The suppressed records must be summarized."
+    assert "Other call site." in log_text, "Other call sites must not be throttled."
+
+    # The suppressed records of an evicted call site are summarized when it is evicted
+    tidy_logger = TidyLogger(
+        app_name="ThrottlingEvictionApp",
+        log_file_directory=tmp_path / "eviction",
+        print_log_file_path=False,
+        console_level=logging.CRITICAL,
+        throttle_rate=0.001,
+        throttle_burst=1,
+        throttle_max_call_sites=1,
+    )
+    for _ in range(3):
+        tidy_logger.warning("Evicted call site.")
+    tidy_logger.warning("New call site.")
+    assert tidy_logger.throttle_stats()["evicted_call_sites"] == 1
+    tidy_logger.close()
+
+    log_text = next((tmp_path / "eviction").iterdir()).read_text()
+    assert log_text.count("Suppressed 2 identical messages") == 1, "The suppressed records of an evicted call site must be summarized once."
+    assert log_text.index("Suppressed 2 identical messages") < log_text.index("New call site."), "The summary must be logged on eviction."
+
+
+def test_sampling(tmp_path: Path):
+
+    class CountingArgument:
+        interpolation_count: int = 0
+
+        def __str__(self) -> str:
+            CountingArgument.interpolation_count += 1
+            return "argument"
+
+    tidy_logger = TidyLogger(
+        app_name="SamplingApp",
+        log_file_directory=tmp_path,
+        print_log_file_path=False,
+        console_level=logging.CRITICAL,
+        sample_rates={"DEBUG": 0.0, logging.INFO: 0.5},
+        sample_key="request_id",
+        tail_sampling=True,
+        tail_sampling_buffer_size=3,
+    )
+
+    for i in range(10):
+        tidy_logger.debug("Dropped %s %d", CountingArgument(), i)
+    assert CountingArgument.interpolation_count == 0, "The messages of dropped records must not be interpolated."
+
+    # Deterministic sampling: all the records of a request id are kept or dropped together
+    request_ids: list[str] = [f"request-{i}" for i in range(100)]
+    for request_id in request_ids:
+        for i in range(3):
+            tidy_logger.info("Sampled request %d.", i, extra={"request_id": request_id})
+
+    # Tail sampling: the held records of a request are written when a warning is logged for it
+    for i in range(5):
+        tidy_logger.debug("Step %d of the failed request.", i, extra={"request_id": "failed-request"})
+        tidy_logger.debug("Step %d of the successful request.", i, extra={"request_id": "successful-request"})
+    tidy_logger.warning("The request failed.", extra={"request_id": "failed-request"})
+
+    stats: dict = tidy_logger.sampling_stats()
+    tidy_logger.close()
+
+    log_text: str = next(tmp_path.iterdir()).read_text()
+    assert "Dropped" not in log_text, "Records with a rate of 0 must be dropped."
+    kept_request_count: int = sum(log_text.count(f"[SamplingApp]:\n   Sampled request {i}.") for i in range(3))
+    assert kept_request_count % 3 == 0 and 0 < kept_request_count < 300, "The records of a request id must be kept or dropped together."
+    assert stats["kept"] == kept_request_count + 1, "The kept records must be counted."
+    assert [f"Step {i} of the failed request." in log_text for i in range(5)] == [False, False, True, True, True], "The last held records of the failed request must be written."
+    assert log_text.index("Step 4 of the failed request.") < log_text.index("The request failed."), "The held records must be written before the flushing record."
+    assert "successful request" not in log_text, "The held records of the successful request must not be written."
+    # The dropped records of the other requests are held as well, until a warning is logged for them
+    assert stats["flushed"] == 3 and stats["held_contexts"] == 100 - kept_request_count // 3 + 1, "The held records and contexts must be counted."
+
+    # The levels are given by number or by registered name
+    assert SamplingFilter(logging.getLogger("SamplingApp"), level_rates={"WARNING": 0.5, 5: 0.25}).level_rates == {logging.WARNING: 0.5, 5: 0.25}
+    with pytest.raises(ValueError):
+        SamplingFilter(logging.getLogger("SamplingApp"), level_rates={"VERBOSE": 0.5})
+
+    # The records filtered concurrently are all counted
+    sampling_filter = SamplingFilter(logging.getLogger("SamplingApp"), level_rates={logging.INFO: 0.5})
+    record = logging.makeLogRecord({"levelno": logging.INFO})
+    threads: list[threading.Thread] = [threading.Thread(target=lambda: [sampling_filter.filter(record) for _ in range(10000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sampling_filter.kept_count + sampling_filter.dropped_count == 80000, "The kept and dropped records of concurrent threads must all be counted."
+
+
+def test_level_methods(tmp_path: Path):
+
+    tidy_logger = TidyLogger(app_name="LevelMethodsApp", log_file_directory=tmp_path, print_log_file_path=False, console_level=logging.CRITICAL, file_level=logging.WARNING)
+
+    tidy_logger.debug("Disabled debug message.")
+
+    tidy_logger.set_levels(file_level=logging.DEBUG)
+    tidy_logger.debug("Enabled debug message.")
+
+    tidy_logger.set_levels(file_level="ERROR")
+    tidy_logger.warning("Disabled warning message.")
+    tidy_logger.error("Enabled error message.")
+
+    # The levels changed through logging are followed as well
+    tidy_logger.logger.setLevel(logging.INFO)
+    tidy_logger.file_handler.setLevel(logging.INFO)
+    tidy_logger.info("Enabled info message.")
+    logging.disable(logging.ERROR)
+    try:
+        tidy_logger.error("Disabled error message.")
+        tidy_logger.error_exception(ValueError("disabled"), "Disabled error_exception message.")
+    finally:
+        logging.disable(logging.NOTSET)
+    tidy_logger.error("Enabled error message after logging.disable.")
+    tidy_logger.close()
+
+    log_text: str = next(tmp_path.iterdir()).read_text()
+    assert "Disabled" not in log_text, "Messages of disabled levels must not be logged."
+    assert all(f"Enabled {name}" in log_text for name in ("debug message.", "error message.", "info message.", "error message after")), "Messages of enabled levels must be logged."
+    # The caller is found in the test, not in TidyLogger or logging
+    assert "test_tidy_logger.py test_level_methods() (line: " in log_text, "The caller of the logging method must be in the record."
+
+
+def test_caller_lookup(tmp_path: Path):
+
+    records: list[logging.LogRecord] = []
+
+    class ListHandler(logging.Handler):
+        def emit(self, record: logging.LogRecord) -> None:
+            records.append(record)
+
+    tidy_logger = TidyLogger(app_name="CallerLookupApp", log_file_directory=tmp_path, print_log_file_path=False, caller_lookup="never")
+    tidy_logger.logger.addHandler(ListHandler())
+    tidy_logger.info("Message without caller.")
+    assert records[-1].funcName == "(unknown function)" and records[-1].lineno == 0, "The caller must not be looked up with 'never'."
+
+    # A TidyLogger of a logger that already has handlers does not change its caller lookup
+    TidyLogger(app_name="CallerLookupApp", print_log_file_path=False, caller_lookup="always").info("Message of the second TidyLogger.")
+    assert records[-1].funcName == "(unknown function)", "The caller lookup must only be set by the TidyLogger that creates the handlers."
+    tidy_logger.close()
+
+    # The default format uses the caller fields
+    tidy_logger = TidyLogger(app_name="CallerLookupApp", log_file_directory=tmp_path, print_log_file_path=False, caller_lookup="auto")
+    tidy_logger.logger.addHandler(ListHandler())
+    tidy_logger.info("Message with caller.")
+    assert (records[-1].filename, records[-1].funcName) == ("test_tidy_logger.py", "test_caller_lookup"), "The caller must be looked up if a format uses it."
+    tidy_logger.close()
+
+    with pytest.raises(ValueError):
+        TidyLogger(app_name="CallerLookupApp", print_log_file_path=False, caller_lookup="sometimes")
+
+
 def remove_log_files_and_empty_directories(file_path: Path) -> None:
     # Remove the log file
     if file_path.is_file():